@@ -1,12 +1,31 @@
 from django.contrib import admin
-from .models import MeasureFileModel
+from .models import MeasureFileModel, MeasureFileBlob
 from .models import ProbabilisticModel, DistributionModel, ParameterModel, \
     EnvironmentalContour, AdditionalContourOption, ContourPath, \
-    ExtremeEnvDesignCondition, EEDCScalar
+    ExtremeEnvDesignCondition, EEDCScalar, ComputeJob, StageTiming
+from .settings import STAGE_TIMING_PERCENTILES, STAGE_TIMING_WINDOW_IN_DAYS
+from .timing import stage_statistics
+
+
+class StageTimingAdmin(admin.ModelAdmin):
+    """
+    Lists the timings of stages and shows percentiles per stage.
+    """
+    list_display = ('stage', 'seconds', 'source', 'created')
+    list_filter = ('stage',)
+    change_list_template = 'admin/contour/stagetiming/change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {})
+        extra_context['percentiles'] = STAGE_TIMING_PERCENTILES
+        extra_context['window_in_days'] = STAGE_TIMING_WINDOW_IN_DAYS
+        extra_context['stage_statistics'] = stage_statistics()
+        return super().changelist_view(request, extra_context)
 
 
 # Register your models here.
 admin.site.register(MeasureFileModel),
+admin.site.register(MeasureFileBlob),
 admin.site.register(ProbabilisticModel),
 admin.site.register(DistributionModel),
 admin.site.register(ParameterModel),
@@ -14,4 +33,6 @@ admin.site.register(EnvironmentalContour),
 admin.site.register(AdditionalContourOption),
 admin.site.register(ContourPath),
 admin.site.register(ExtremeEnvDesignCondition),
-admin.site.register(EEDCScalar)
+admin.site.register(EEDCScalar),
+admin.site.register(ComputeJob),
+admin.site.register(StageTiming, StageTimingAdmin)
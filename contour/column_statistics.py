@@ -0,0 +1,347 @@
+"""
+Statistics of the columns of measurement files.
+
+When a measurement file is uploaded, the minimum, maximum, mean, variance and
+some quantiles of each column are computed together with a histogram of each
+column and a 2-D histogram of each pair of columns. They are stored as
+compact JSON in the MeasureFileModel such that forms can suggest settings,
+e.g. the limits of a highest density contour, and the measurement file's
+page can show the distributions without reading the data again.
+
+The statistics are computed from the memory-mapped columns (see
+measurement_data.py) in chunks of CSV_READ_CHUNK_SIZE rows such that the
+memory needed does not depend on the file size. The first pass computes the
+ranges and moments, the second pass the histograms, whose bins span the
+ranges. The quantiles are interpolated from fine histograms and are thus
+exact up to the width of their bins.
+"""
+import json
+from itertools import combinations
+
+import numpy as np
+
+from .measurement_data import load_columns
+from .settings import CSV_READ_CHUNK_SIZE, STATISTICS_N_BINS, \
+    STATISTICS_N_BINS_2D, STATISTICS_N_BINS_QUANTILES, STATISTICS_QUANTILES, \
+    HDC_DEFAULT_LIMIT_FACTOR, HDC_DEFAULT_N_STEPS, FIT_DEFAULT_N_INTERVALS
+from .timing import timed_stage
+
+
+def _histogram_range(column_statistics):
+    minimum = column_statistics['min']
+    maximum = column_statistics['max']
+    if minimum is None:
+        return 0.0, 1.0
+    if minimum == maximum:
+        # As numpy.histogram(), widen the range of constant values.
+        return minimum - 0.5, maximum + 0.5
+    return minimum, maximum
+
+
+def histogram_edges(column_statistics):
+    """
+    Returns the bin edges of a column's histogram.
+
+    Parameters
+    ----------
+    column_statistics : dict,
+        The statistics of the column, see compute_statistics().
+
+    Returns
+    -------
+    edges : numpy.ndarray,
+        The edges of the bins, one more than there are bins.
+    """
+    return np.linspace(*_histogram_range(column_statistics),
+                       num=len(column_statistics['histogram']) + 1)
+
+
+def _interpolate_quantiles(counts, column_statistics, levels):
+    edges = np.linspace(*_histogram_range(column_statistics),
+                        num=len(counts) + 1)
+    n = counts.sum()
+    if n == 0:
+        return [None] * len(levels)
+    cdf = np.concatenate([[0], np.cumsum(counts) / n])
+    # The range of constant values is widened, see _histogram_range().
+    values = np.clip(np.interp(levels, cdf, edges), column_statistics['min'],
+                     column_statistics['max'])
+    return [float(value) for value in values]
+
+
+@timed_stage('column_statistics')
+def compute_statistics(columns, chunk_size=CSV_READ_CHUNK_SIZE,
+                       n_bins=STATISTICS_N_BINS,
+                       n_bins_2d=STATISTICS_N_BINS_2D,
+                       n_bins_quantiles=STATISTICS_N_BINS_QUANTILES,
+                       quantiles=STATISTICS_QUANTILES):
+    """
+    Computes the statistics of a measurement file's columns.
+
+    Values, which are not finite, are ignored.
+
+    Parameters
+    ----------
+    columns : list of numpy.ndarray,
+        The columns, e.g. memory-mapped by measurement_data.load_columns().
+    chunk_size : int, optional
+        Number of rows, which are read at once. Defaults to
+        CSV_READ_CHUNK_SIZE.
+    n_bins : int, optional
+        Number of bins of the columns' histograms. Defaults to
+        STATISTICS_N_BINS.
+    n_bins_2d : int, optional
+        Number of bins per axis of the 2-D histograms. Defaults to
+        STATISTICS_N_BINS_2D.
+    n_bins_quantiles : int, optional
+        Number of bins of the histograms, from which the quantiles are
+        interpolated. Defaults to STATISTICS_N_BINS_QUANTILES.
+    quantiles : list of float, optional
+        The probabilities of the quantiles. Defaults to STATISTICS_QUANTILES.
+
+    Returns
+    -------
+    statistics : dict,
+        It has the keys 'n_rows', 'quantile_levels' (the probabilities of
+        the quantiles), 'columns' and 'histograms_2d'. 'columns' holds one
+        dict per column with the keys 'count' (of finite values), 'min',
+        'max', 'mean', 'variance' (the sample variance), 'quantiles' and
+        'histogram' (counts, see histogram_edges()). 'histograms_2d' holds
+        one dict per pair of columns with the keys 'columns' (the indices
+        [i, j], i < j) and 'counts' (n_bins_2d lists of n_bins_2d counts,
+        the first index refers to column i).
+    """
+    n_rows = len(columns[0]) if columns else 0
+
+    # First pass: ranges and moments. The means and the sums of squared
+    # deviations of the chunks are merged with Chan's formula.
+    moments = [{'count': 0, 'mean': 0.0, 'm2': 0.0, 'min': None, 'max': None}
+               for _ in columns]
+    for start in range(0, n_rows, chunk_size):
+        for column, moment in zip(columns, moments):
+            values = np.asarray(column[start:start + chunk_size])
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                continue
+            n_chunk = len(values)
+            mean_chunk = values.mean()
+            m2_chunk = ((values - mean_chunk) ** 2).sum()
+            n = moment['count'] + n_chunk
+            delta = mean_chunk - moment['mean']
+            moment['mean'] += delta * n_chunk / n
+            moment['m2'] += m2_chunk + delta ** 2 * moment['count'] * \
+                n_chunk / n
+            moment['count'] = n
+            minimum = float(values.min())
+            maximum = float(values.max())
+            moment['min'] = minimum if moment['min'] is None else \
+                min(moment['min'], minimum)
+            moment['max'] = maximum if moment['max'] is None else \
+                max(moment['max'], maximum)
+
+    # Second pass: histograms.
+    ranges = [_histogram_range(moment) for moment in moments]
+    histograms = [np.zeros(n_bins, dtype=np.int64) for _ in columns]
+    fine_histograms = [np.zeros(n_bins_quantiles, dtype=np.int64)
+                       for _ in columns]
+    pairs = list(combinations(range(len(columns)), 2))
+    histograms_2d = [np.zeros((n_bins_2d, n_bins_2d), dtype=np.int64)
+                     for _ in pairs]
+    for start in range(0, n_rows, chunk_size):
+        chunk = [np.asarray(column[start:start + chunk_size])
+                 for column in columns]
+        finite = [np.isfinite(values) for values in chunk]
+        for i, values in enumerate(chunk):
+            histograms[i] += np.histogram(values[finite[i]], bins=n_bins,
+                                          range=ranges[i])[0]
+            fine_histograms[i] += np.histogram(values[finite[i]],
+                                               bins=n_bins_quantiles,
+                                               range=ranges[i])[0]
+        for histogram_2d, (i, j) in zip(histograms_2d, pairs):
+            both_finite = finite[i] & finite[j]
+            counts = np.histogram2d(chunk[i][both_finite],
+                                    chunk[j][both_finite], bins=n_bins_2d,
+                                    range=[ranges[i], ranges[j]])[0]
+            histogram_2d += counts.astype(np.int64)
+
+    column_statistics = []
+    for i, moment in enumerate(moments):
+        count = moment['count']
+        column_statistics.append({
+            'count': count,
+            'min': moment['min'],
+            'max': moment['max'],
+            'mean': float(moment['mean']) if count else None,
+            'variance': float(moment['m2'] / (count - 1)) if count > 1
+            else None,
+            'quantiles': _interpolate_quantiles(fine_histograms[i], moment,
+                                                quantiles),
+            'histogram': histograms[i].tolist()})
+    return {'n_rows': n_rows,
+            'quantile_levels': list(quantiles),
+            'columns': column_statistics,
+            'histograms_2d': [{'columns': [i, j],
+                               'counts': histogram_2d.tolist()}
+                              for histogram_2d, (i, j) in zip(histograms_2d,
+                                                              pairs)]}
+
+
+def update_statistics(measure_file_model):
+    """
+    Computes the statistics of a measurement file and stores them in its
+    MeasureFileModel.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    statistics : dict,
+        See compute_statistics().
+    """
+    statistics = compute_statistics(load_columns(measure_file_model))
+    measure_file_model.statistics = json.dumps(statistics,
+                                               separators=(',', ':'))
+    measure_file_model.save(update_fields=['statistics'])
+    return statistics
+
+
+def read_statistics(measure_file_model):
+    """
+    Returns the statistics of a measurement file.
+
+    For files uploaded by older versions, the statistics are computed and
+    stored first.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    statistics : dict,
+        See compute_statistics().
+    """
+    if not measure_file_model.statistics:
+        return update_statistics(measure_file_model)
+    return json.loads(measure_file_model.statistics)
+
+
+def _round_significant(value, digits=2):
+    if value == 0:
+        return 0.0
+    return round(value, digits - 1 - int(np.floor(np.log10(abs(value)))))
+
+
+def _quantile(statistics, column_statistics, level):
+    return column_statistics['quantiles'][
+        statistics['quantile_levels'].index(level)]
+
+
+def hdc_defaults(statistics):
+    """
+    Suggests the grid of a highest density contour.
+
+    The grid spans from 0 to HDC_DEFAULT_LIMIT_FACTOR times the measured
+    maximum and has HDC_DEFAULT_N_STEPS steps per variable.
+
+    Parameters
+    ----------
+    statistics : dict,
+        The statistics of a measurement file, see compute_statistics().
+
+    Returns
+    -------
+    limits : list of tuple,
+        The lower and upper limit per variable, None if the column has no
+        finite values.
+    deltas : list of float,
+        The grid size per variable, None if the column has no finite values.
+    """
+    limits = []
+    deltas = []
+    for column_statistics in statistics['columns']:
+        if column_statistics['max'] is None or column_statistics['max'] <= 0:
+            limits.append(None)
+            deltas.append(None)
+            continue
+        # HDCForm accepts upper limits up to 10000.
+        upper = min(_round_significant(
+            column_statistics['max'] * HDC_DEFAULT_LIMIT_FACTOR), 10000)
+        limits.append((0.0, upper))
+        deltas.append(max(_round_significant(upper / HDC_DEFAULT_N_STEPS),
+                          0.01))
+    return limits, deltas
+
+
+def fit_interval_widths(statistics):
+    """
+    Suggests the widths of the intervals of a fit.
+
+    The range between the 1 % and the 99 % quantile of a variable is divided
+    in FIT_DEFAULT_N_INTERVALS intervals.
+
+    Parameters
+    ----------
+    statistics : dict,
+        The statistics of a measurement file, see compute_statistics().
+
+    Returns
+    -------
+    widths : list of float,
+        The width per variable, None if the quantiles are not stored or the
+        variable is constant.
+    """
+    widths = []
+    for column_statistics in statistics['columns']:
+        try:
+            lower = _quantile(statistics, column_statistics, 0.01)
+            upper = _quantile(statistics, column_statistics, 0.99)
+        except ValueError:
+            widths.append(None)
+            continue
+        if lower is None or upper <= lower:
+            widths.append(None)
+            continue
+        widths.append(max(_round_significant(
+            (upper - lower) / FIT_DEFAULT_N_INTERVALS), 0.0001))
+    return widths
+
+
+def statistics_table(statistics, var_names):
+    """
+    Prepares the statistics of a measurement file to be shown in a template.
+
+    Parameters
+    ----------
+    statistics : dict,
+        The statistics of a measurement file, see compute_statistics().
+    var_names : list of str,
+        Names of the variables.
+
+    Returns
+    -------
+    rows : list of dict,
+        One dict per variable with the keys 'name', 'min', 'max', 'mean',
+        'std' (the standard deviation), 'quantiles' (list of tuple of the
+        probability in percent and the quantile) and 'bars' (the heights of
+        the histogram's bars in percent of the highest bar).
+    """
+    rows = []
+    for name, column_statistics in zip(var_names, statistics['columns']):
+        histogram = column_statistics['histogram']
+        highest = max(histogram) if histogram and max(histogram) > 0 else 1
+        variance = column_statistics['variance']
+        rows.append({'name': name,
+                     'min': column_statistics['min'],
+                     'max': column_statistics['max'],
+                     'mean': column_statistics['mean'],
+                     'std': None if variance is None else variance ** 0.5,
+                     'quantiles': [(level * 100, quantile) for level, quantile
+                                   in zip(statistics['quantile_levels'],
+                                          column_statistics['quantiles'])],
+                     'bars': [100 * count / highest for count in histogram]})
+    return rows
@@ -2,31 +2,45 @@
 Interface between viroconweb and the package viroconcom.
 
 The package viroconcom handles the statistical computations and is imported
-in this module.
+in this module. Since viroconcom imports scipy and statsmodels, which are slow
+to import, it is imported when it is used for the first time and not when
+this module is imported.
 """
-import pandas as pd
+import hashlib
+import json
+import threading
+import warnings
+from collections import OrderedDict
+
+from django.db.models import Prefetch
 
 from .models import MeasureFileModel, ParameterModel, DistributionModel, \
     ProbabilisticModel
-from .settings import MAX_COMPUTING_TIME, NR_LINES_HEADER
+from .measurement_data import load_columns
+from .fit_cache import fit_cache_key, load_fit, save_fit
+from .settings import MAX_COMPUTING_TIME, USE_PARALLEL_FIT, FIT_N_WORKERS, \
+    MUL_DIST_CACHE_SIZE
+from .timing import timed_stage
 
-from viroconcom.fitting import Fit
-from viroconcom.contours import IFormContour, HighestDensityContour
-from viroconcom.params import ConstantParam, FunctionParam
-from viroconcom.distributions import (NormalDistribution,
-                                      LognormalDistribution,
-                                      WeibullDistribution,
-                                      KernelDensityDistribution,
-                                      MultivariateDistribution)
+# Built MultivariateDistribution objects of this process, least recently used
+# first: hash of the model's specification -> MultivariateDistribution.
+_mul_dist_cache = OrderedDict()
+_mul_dist_cache_lock = threading.Lock()
 
 
 class ComputeInterface:
     @staticmethod
-    def fit_curves(mfm_item: MeasureFileModel, fit_settings, var_number):
+    @timed_stage('viroconcom_fit')
+    def fit_curves(mfm_item: MeasureFileModel, fit_settings, var_number,
+                   timeout=MAX_COMPUTING_TIME, parallel=USE_PARALLEL_FIT,
+                   use_cache=True):
         """
         Interface to fit a probabilistic model to a measurement file with
         the viroconcom package.
 
+        Fits are cached: If the same data was fitted with the same settings
+        before, the cached fit is returned (see fit_cache.py).
+
         Parameters
         ----------
         mfm_item : MeasureFileModel,
@@ -36,21 +50,26 @@ class ComputeInterface:
             distribution, which should be fitted to the data, is specified.
         var_number : int,
             Number of random variables that the probabilistic model should have.
+        timeout : float, optional
+            The maximum time in seconds the fit is allowed to take.
+            Defaults to MAX_COMPUTING_TIME.
+        parallel : boolean, optional
+            If True, the single distribution fits are computed in parallel
+            with FIT_N_WORKERS processes (see parallel_fit.py) if the
+            installed viroconcom version is supported.
+            Defaults to USE_PARALLEL_FIT.
+        use_cache : boolean, optional
+            If False, the fit is computed even if it is cached, e.g. to
+            measure how long it takes. Defaults to True.
 
         Returns
         -------
-        fit : Fit,
+        fit : Fit or CachedFit,
             The fit contains the probabilistic model, which was fitted to the
             measurement data, as well as data describing how well the fit worked.
         """
-        data_path = mfm_item.measure_file.url
-        if data_path[0] == '/':
-            data_path = data_path[1:]
-        data = pd.read_csv(data_path, sep=';', header=NR_LINES_HEADER-1).as_matrix()
         dists = []
-        dates = []
         for i in range(0, var_number):
-            dates.append(data[:, i].tolist())
             if i == 0:
                 dists.append(
                     {'name': fit_settings['distribution_%s' % i],
@@ -96,12 +115,31 @@ class ComputeInterface:
                 dists[i].get('dependency')[0] = None
                 dists[i].get('functions')[0] = None
 
-        fit = Fit(dates, dists, timeout=MAX_COMPUTING_TIME)
+        # The key must be computed before the fit since Fit modifies dists.
+        key = fit_cache_key(mfm_item, dists)
+        dates = load_columns(mfm_item)[:var_number]
+        fit = load_fit(key, dates) if use_cache else None
+        if fit is None:
+            if parallel:
+                from .parallel_fit import ParallelFit, is_supported
+                parallel = is_supported()
+                if not parallel:
+                    warnings.warn('ParallelFit does not support the '
+                                  'installed viroconcom version, Fit is used '
+                                  'instead.')
+            if parallel:
+                fit = ParallelFit(dates, dists, timeout=timeout,
+                                  n_workers=FIT_N_WORKERS)
+            else:
+                from viroconcom.fitting import Fit
+                fit = Fit(dates, dists, timeout=timeout)
+            save_fit(key, fit)
         return fit
 
     @staticmethod
+    @timed_stage('viroconcom_iform')
     def iform(probabilistic_model: ProbabilisticModel, return_period, state_duration,
-              n_points):
+              n_points, timeout=MAX_COMPUTING_TIME):
         """
         Interface to viroconcom to compute an IFORM contour.
 
@@ -117,6 +155,9 @@ class ComputeInterface:
             in hours.
         n_points : int,
             Number of points along the contour that should be calculated.
+        timeout : float, optional
+            The maximum time in seconds the calculation is allowed to take.
+            Defaults to MAX_COMPUTING_TIME.
 
         Returns
         -------
@@ -128,18 +169,21 @@ class ComputeInterface:
             The values of the arrays are the coordinates in the corresponding
             dimension.
         """
+        from viroconcom.contours import IFormContour
+
         mul_dist = setup_mul_dist(probabilistic_model)
         contour = IFormContour(mul_var_distribution=mul_dist,
                                return_period=return_period,
                                state_duration=state_duration,
                                n_points=n_points,
-                               timeout=MAX_COMPUTING_TIME)
+                               timeout=timeout)
         contour_coordinates = contour.coordinates
         return contour_coordinates
 
     @staticmethod
+    @timed_stage('viroconcom_hdc')
     def hdc(probabilistic_model: ProbabilisticModel, return_period,
-            state_duration, limits, deltas):
+            state_duration, limits, deltas, timeout=MAX_COMPUTING_TIME):
         """
         Interface to viroconcom to compute an highest density contour (HDC).
 
@@ -162,6 +206,9 @@ class ComputeInterface:
             If a single float is supplied it is used for all dimensions.
             If a list of float is supplied it has to be of the same length
             as there are dimensions in mul_var_dist.
+        timeout : float, optional
+            The maximum time in seconds the calculation is allowed to take.
+            Defaults to MAX_COMPUTING_TIME.
 
         Returns
         -------
@@ -173,13 +220,15 @@ class ComputeInterface:
             The values of the arrays are the coordinates in the corresponding
             dimension.
         """
+        from viroconcom.contours import HighestDensityContour
+
         mul_dist = setup_mul_dist(probabilistic_model)
         contour = HighestDensityContour(mul_var_distribution=mul_dist,
                                         return_period=return_period,
                                         state_duration=state_duration,
                                         limits=limits,
                                         deltas=deltas,
-                                        timeout=MAX_COMPUTING_TIME)
+                                        timeout=timeout)
         contour_coordinates = contour.coordinates
         return contour_coordinates
 
@@ -200,7 +249,141 @@ def adjust(var):
 
 def setup_mul_dist(probabilistic_model: ProbabilisticModel):
     """
-    Generates a MultiVariateDistribution from a ProbabilisticModel.
+    Returns the MultivariateDistribution of a ProbabilisticModel.
+
+    The MultivariateDistribution is built from the model's specification
+    (see model_spec()). The built objects are cached per process and are
+    identified by the hash of the specification. Thus, a changed model gets a
+    new object. The returned object must not be modified.
+
+    Parameters
+    ----------
+    probabilistic_model : ProbabilisticModel,
+        The probabilistic model, which should be converted.
+
+    Returns
+    -------
+    mutivar_distribution : MultivariateDistribution,
+        The object, which can be used in the viroconcom package.
+    """
+    spec, spec_hash = load_model_spec(probabilistic_model)
+    with _mul_dist_cache_lock:
+        if spec_hash in _mul_dist_cache:
+            _mul_dist_cache.move_to_end(spec_hash)
+            return _mul_dist_cache[spec_hash]
+    mutivar_distribution = build_mul_dist(json.loads(spec))
+    with _mul_dist_cache_lock:
+        _mul_dist_cache[spec_hash] = mutivar_distribution
+        while len(_mul_dist_cache) > MUL_DIST_CACHE_SIZE:
+            _mul_dist_cache.popitem(last=False)
+    return mutivar_distribution
+
+
+def clear_mul_dist_cache():
+    """
+    Removes all MultivariateDistribution objects from this process' cache.
+    """
+    with _mul_dist_cache_lock:
+        _mul_dist_cache.clear()
+
+
+def _parameter_value(value):
+    # The value is rounded as it is stored by ParameterModel's DecimalFields
+    # such that a specification does not depend on whether it was created
+    # before or after the parameters were saved.
+    decimal_places = ParameterModel._meta.get_field('x0').decimal_places
+    return round(float(value), decimal_places)
+
+
+def model_spec(distribution_models, parameter_models):
+    """
+    Creates the specification of a probabilistic model.
+
+    The specification holds everything, which is needed to build the
+    model's MultivariateDistribution: the distributions and their parameters
+    with function names, dependencies and values as floats.
+
+    Parameters
+    ----------
+    distribution_models : list of DistributionModel,
+        The model's distributions.
+    parameter_models : list of list of ParameterModel,
+        The parameters (shape, location, scale) per distribution.
+
+    Returns
+    -------
+    spec : str,
+        The specification as canonical JSON, i.e. the same model always
+        gives the same string.
+    spec_hash : str,
+        The hex digest of the SHA-256 of the specification.
+    """
+    distributions = []
+    for distribution_model, distribution_parameters in zip(
+            distribution_models, parameter_models):
+        parameters = []
+        for param in distribution_parameters:
+            function = adjust(str(param.function))
+            if function is None:
+                values = [_parameter_value(param.x0)]
+            else:
+                values = [_parameter_value(param.x0),
+                          _parameter_value(param.x1),
+                          _parameter_value(param.x2)]
+            parameters.append({'name': param.name,
+                               'function': function,
+                               'dependency': adjust(str(param.dependency)),
+                               'values': values})
+        distributions.append({'distribution': distribution_model.distribution,
+                              'parameters': parameters})
+    spec = json.dumps({'distributions': distributions}, sort_keys=True,
+                      separators=(',', ':'))
+    return spec, hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+
+def load_model_spec(probabilistic_model: ProbabilisticModel):
+    """
+    Returns the specification of a probabilistic model.
+
+    Models, whose specification is not stored, e.g. models saved by older
+    versions or models whose parameters were changed, get their
+    specification from the distributions and parameters. It is stored then.
+
+    Parameters
+    ----------
+    probabilistic_model : ProbabilisticModel,
+        The probabilistic model.
+
+    Returns
+    -------
+    spec : str,
+        The specification, see model_spec().
+    spec_hash : str,
+        The hex digest of the SHA-256 of the specification.
+    """
+    if probabilistic_model.spec:
+        return probabilistic_model.spec, probabilistic_model.spec_hash
+    # The parameters of all distributions are loaded with a single query.
+    distributions_model = list(DistributionModel.objects.filter(
+        probabilistic_model=probabilistic_model).order_by(
+        'pk').prefetch_related(
+        Prefetch('parametermodel_set',
+                 queryset=ParameterModel.objects.order_by('pk'))))
+    spec, spec_hash = model_spec(
+        distributions_model,
+        [dist.parametermodel_set.all() for dist in distributions_model])
+    probabilistic_model.spec = spec
+    probabilistic_model.spec_hash = spec_hash
+    ProbabilisticModel.objects.filter(pk=probabilistic_model.pk).update(
+        spec=spec, spec_hash=spec_hash)
+    return spec, spec_hash
+
+
+@timed_stage('setup_mul_dist')
+def build_mul_dist(spec):
+    """
+    Generates a MultiVariateDistribution from a ProbabilisticModel's
+    specification.
 
     MultiVariateDistribution objects are used to perform the statistical
     computations in the viroconcom package. ProbabilisticModel objects are used
@@ -208,8 +391,8 @@ def setup_mul_dist(probabilistic_model: ProbabilisticModel):
 
     Parameters
     ----------
-    probabilistic_model : ProbabilisticModel,
-        The probabilistic model, which should be converted.
+    spec : dict,
+        The probabilistic model's specification, see model_spec().
 
     Returns
     -------
@@ -217,39 +400,43 @@ def setup_mul_dist(probabilistic_model: ProbabilisticModel):
         The object, which can be used in the viroconcom package.
 
     """
-    distributions_model = DistributionModel.objects.filter(
-        probabilistic_model=probabilistic_model)
+    from viroconcom.params import ConstantParam, FunctionParam
+    from viroconcom.distributions import (NormalDistribution,
+                                          LognormalDistribution,
+                                          WeibullDistribution,
+                                          KernelDensityDistribution,
+                                          MultivariateDistribution)
+
     distributions = []
     dependencies = []
 
-    for dist in distributions_model:
+    for dist in spec['distributions']:
         dependency = []
         parameters = []
-        parameters_model = ParameterModel.objects.filter(distribution=dist)
-        for param in parameters_model:
-            dependency.append(adjust(param.dependency))
+        for param in dist['parameters']:
+            dependency.append(param['dependency'])
 
-            if adjust(param.function) is not None:
+            if param['function'] is not None:
                 parameters.append(
-                    FunctionParam(float(param.x0), float(param.x1),
-                                  float(param.x2), param.function))
+                    FunctionParam(*param['values'], param['function']))
             else:
-                parameters.append(ConstantParam(float(param.x0)))
+                parameters.append(ConstantParam(param['values'][0]))
 
         dependencies.append(dependency)
 
-        if dist.distribution == 'Normal':
+        if dist['distribution'] == 'Normal':
             distributions.append(NormalDistribution(*parameters))
-        elif dist.distribution == 'Weibull':
+        elif dist['distribution'] == 'Weibull':
             distributions.append(WeibullDistribution(*parameters))
-        elif dist.distribution == 'Lognormal_SigmaMu':
+        elif dist['distribution'] == 'Lognormal_SigmaMu':
             distributions.append(
                 LognormalDistribution(sigma=parameters[0], mu=parameters[2]))
-        elif dist.distribution == 'KernelDensity':
+        elif dist['distribution'] == 'KernelDensity':
             distributions.append(KernelDensityDistribution(*parameters))
         else:
             raise KeyError(
-                '{} is not a matching distribution'.format(dist.distribution))
+                '{} is not a matching distribution'.format(
+                    dist['distribution']))
 
     mutivar_distribution = MultivariateDistribution(distributions, dependencies)
     return mutivar_distribution
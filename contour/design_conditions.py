@@ -0,0 +1,203 @@
+"""
+Exports the extreme environmental design conditions (EEDC) of a contour.
+
+The design conditions are the coordinates of the contour's points. They are
+exported as a semicolon-separated csv file (optionally gzip compressed), as
+a numpy .npy file or as a JSON file. The files are written in chunks such
+that large contours, e.g. highest density contours with many points, can be
+streamed to the client.
+"""
+import io
+import json
+import zlib
+
+import numpy as np
+
+from .settings import DESIGN_CONDITIONS_CHUNK_ROWS
+
+# The file formats and their content types.
+FILE_FORMATS = {'csv': 'text/csv',
+                'csv.gz': 'application/gzip',
+                'npy': 'application/octet-stream',
+                'json': 'application/json'}
+
+
+def design_conditions_array(contour_coordinates):
+    """
+    Stacks the points of all contour paths into one array.
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+        The format is defined by compute_interface.iform().
+
+    Returns
+    -------
+    design_conditions : numpy.ndarray,
+        Array of shape (number of points, number of dimensions). The points
+        of the paths follow each other.
+    """
+    if len(contour_coordinates) == 0:
+        return np.empty((0, 0))
+    return np.concatenate([np.column_stack(contour_path)
+                           for contour_path in contour_coordinates])
+
+
+def iter_csv(contour_coordinates, chunk_rows=DESIGN_CONDITIONS_CHUNK_ROWS):
+    """
+    Writes the design conditions as csv file.
+
+    One row is written per point, the values are separated by ';' and are
+    written with the shortest representation, which is read back exactly.
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+    chunk_rows : int, optional
+        Number of rows per chunk. Defaults to DESIGN_CONDITIONS_CHUNK_ROWS.
+
+    Yields
+    ------
+    chunk : bytes
+    """
+    design_conditions = design_conditions_array(contour_coordinates)
+    # repr() of a Python float is the shortest exact representation. It is
+    # faster than numpy.savetxt(), which formats numpy scalars.
+    row_format = ';'.join(['%r'] * design_conditions.shape[1]) + '\n'
+    for start in range(0, len(design_conditions), chunk_rows):
+        rows = design_conditions[start:start + chunk_rows].tolist()
+        yield ''.join([row_format % tuple(row) for row in rows]).encode(
+            'utf-8')
+
+
+def iter_csv_gz(contour_coordinates, chunk_rows=DESIGN_CONDITIONS_CHUNK_ROWS):
+    """
+    Writes the design conditions as gzip compressed csv file.
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+    chunk_rows : int, optional
+        Number of rows per chunk. Defaults to DESIGN_CONDITIONS_CHUNK_ROWS.
+
+    Yields
+    ------
+    chunk : bytes
+    """
+    # wbits=31 writes a gzip header and trailer.
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in iter_csv(contour_coordinates, chunk_rows):
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def iter_npy(contour_coordinates, chunk_rows=DESIGN_CONDITIONS_CHUNK_ROWS):
+    """
+    Writes the design conditions as .npy file.
+
+    The file holds a float64 array of shape (number of points, number of
+    dimensions), see design_conditions_array().
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+    chunk_rows : int, optional
+        Number of rows per chunk. Defaults to DESIGN_CONDITIONS_CHUNK_ROWS.
+
+    Yields
+    ------
+    chunk : bytes
+    """
+    design_conditions = np.ascontiguousarray(
+        design_conditions_array(contour_coordinates), dtype='<f8')
+    f = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        f, np.lib.format.header_data_from_array_1_0(design_conditions))
+    yield f.getvalue()
+    for start in range(0, len(design_conditions), chunk_rows):
+        yield design_conditions[start:start + chunk_rows].tobytes()
+
+
+def iter_json(contour_coordinates, chunk_rows=DESIGN_CONDITIONS_CHUNK_ROWS):
+    """
+    Writes the design conditions as JSON file.
+
+    The file holds a list of contour paths, each a list of one list of
+    values per dimension, i.e. the format of contour_coordinates.
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+    chunk_rows : int, optional
+        Number of values per chunk. Defaults to DESIGN_CONDITIONS_CHUNK_ROWS.
+
+    Yields
+    ------
+    chunk : bytes
+    """
+    yield b'['
+    for i, contour_path in enumerate(contour_coordinates):
+        yield b'[' if i == 0 else b', ['
+        for j, coordinates in enumerate(contour_path):
+            values = np.asarray(coordinates, dtype=float)
+            yield b'[' if j == 0 else b', ['
+            for start in range(0, len(values), chunk_rows):
+                chunk = json.dumps(values[start:start + chunk_rows].tolist())
+                # Remove the brackets of the chunk's list.
+                yield (chunk[1:-1] if start == 0 else
+                       ', ' + chunk[1:-1]).encode('utf-8')
+            yield b']'
+        yield b']'
+    yield b']'
+
+
+WRITERS = {'csv': iter_csv,
+           'csv.gz': iter_csv_gz,
+           'npy': iter_npy,
+           'json': iter_json}
+
+
+def iter_design_conditions(contour_coordinates, file_format):
+    """
+    Writes the design conditions in one of the FILE_FORMATS.
+
+    Parameters
+    ----------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates of the environmental contour.
+    file_format : str,
+        'csv', 'csv.gz', 'npy' or 'json'.
+
+    Returns
+    -------
+    chunks : iterator of bytes
+    """
+    return WRITERS[file_format](contour_coordinates)
+
+
+def read_csv(f):
+    """
+    Reads design conditions, which were written by iter_csv().
+
+    The paths of the contour are not separated in the csv file.
+    Consequently, all points are returned as a single path.
+
+    Parameters
+    ----------
+    f : file-like object,
+        The csv file.
+
+    Returns
+    -------
+    contour_coordinates : list of list of numpy.ndarray,
+        The coordinates in the format defined by compute_interface.iform().
+    """
+    design_conditions = np.loadtxt(f, delimiter=';', ndmin=2)
+    return [list(design_conditions.T)]
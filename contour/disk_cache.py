@@ -0,0 +1,112 @@
+"""
+A size limited cache on the local file system with least recently used (LRU)
+eviction.
+"""
+import os
+import tempfile
+
+
+class DiskLRUCache:
+    """
+    Stores byte strings as files in a directory.
+
+    The modification time of a file is used as its last access time: it is
+    updated on every hit. If the cache grows larger than max_size bytes,
+    the least recently used entries are deleted.
+
+    Writes are atomic, i.e. an entry is either complete or missing. Thus, the
+    cache can be shared between processes, e.g. web workers and the compute
+    worker.
+    """
+
+    def __init__(self, directory, max_size):
+        """
+        Parameters
+        ----------
+        directory : str,
+            Directory where the entries are stored. It is created if it does
+            not exist.
+        max_size : int,
+            Maximum size of all entries in bytes.
+        """
+        self.directory = directory
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Returns the value of an entry and marks it as recently used.
+
+        Parameters
+        ----------
+        key : str,
+            Key of the entry. Must be a valid file name, e.g. a hex digest.
+
+        Returns
+        -------
+        value : bytes or None,
+            The stored value or None if the cache holds no entry for the key.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            os.utime(path, None)
+        except FileNotFoundError:
+            # The entry does not exist or was evicted in the mean time.
+            return None
+        return value
+
+    def set(self, key, value):
+        """
+        Stores an entry and evicts old entries if the cache is too large.
+
+        Parameters
+        ----------
+        key : str,
+            Key of the entry. Must be a valid file name, e.g. a hex digest.
+        value : bytes,
+            The value, which should be stored.
+        """
+        if len(value) > self.max_size:
+            return
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory,
+                                                      prefix='.tmp')
+        try:
+            with os.fdopen(file_descriptor, 'wb') as f:
+                f.write(value)
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache is not larger
+        than max_size.
+        """
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith('.tmp') or not entry.is_file():
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -0,0 +1,407 @@
+"""
+Renders figures from plain data, optionally in worker processes.
+
+A figure is described by a render spec, a dict holding only plain data
+(arrays, numbers and strings). Consequently, specs can be stored and
+rendered later (see lazy_figures.py) or sent to worker processes. They are
+rendered to PNG images with matplotlib's Agg canvas. This module does not use
+pyplot and does not access the data base.
+
+Measured data with many points is drawn as density raster instead of a
+scatter plot: The points are counted in the cells of a grid, which is drawn
+as image. Thus, the time to render a figure does not grow with the number of
+points beyond the counting.
+
+matplotlib, scipy and shapely are slow to import. Consequently, they are
+imported when the first figure is rendered and not when this module is
+imported. Their backend is pinned by the environment variable MPLBACKEND,
+which matplotlib reads when it is imported.
+"""
+import multiprocessing
+import os
+import threading
+import warnings
+from io import BytesIO
+
+import numpy as np
+
+from .settings import FIGURE_RENDER_N_WORKERS, MATPLOTLIB_BACKEND, \
+    SCATTER_MAX_POINTS, DENSITY_RASTER_N_BINS
+
+os.environ['MPLBACKEND'] = MATPLOTLIB_BACKEND
+
+# Number of points, which are counted at once when a density raster is
+# computed.
+DENSITY_RASTER_CHUNK_SIZE = 1000000
+
+# The pool of worker processes, which render figures, see render_figures().
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _new_figure(**kwargs):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _to_png(fig):
+    f = BytesIO()
+    fig.savefig(f, format='png', bbox_inches='tight')
+    return f.getvalue()
+
+
+def density_grid(x, y, n_bins=DENSITY_RASTER_N_BINS,
+                 chunk_size=DENSITY_RASTER_CHUNK_SIZE):
+    """
+    Counts points in the cells of a regular grid.
+
+    The points are counted in chunks such that memory-mapped data is not
+    loaded at once. Points with a coordinate, which is not finite, are
+    ignored.
+
+    Parameters
+    ----------
+    x : array_like,
+        The points' first coordinates.
+    y : array_like,
+        The points' second coordinates.
+    n_bins : int, optional
+        Number of cells per axis. Defaults to DENSITY_RASTER_N_BINS.
+    chunk_size : int, optional
+        Number of points, which are counted at once.
+
+    Returns
+    -------
+    counts : numpy.ndarray,
+        Array of shape (n_bins, n_bins). The first index refers to x.
+    extent : tuple of float,
+        The grid's limits (x_min, x_max, y_min, y_max).
+    """
+    x_min = y_min = np.inf
+    x_max = y_max = -np.inf
+    chunks = [(start, start + chunk_size)
+              for start in range(0, len(x), chunk_size)]
+    for start, stop in chunks:
+        x_chunk = np.asarray(x[start:stop], dtype=float)
+        y_chunk = np.asarray(y[start:stop], dtype=float)
+        finite = np.isfinite(x_chunk) & np.isfinite(y_chunk)
+        if finite.any():
+            x_min = min(x_min, x_chunk[finite].min())
+            x_max = max(x_max, x_chunk[finite].max())
+            y_min = min(y_min, y_chunk[finite].min())
+            y_max = max(y_max, y_chunk[finite].max())
+    if x_min > x_max:
+        x_min, x_max, y_min, y_max = 0.0, 1.0, 0.0, 1.0
+    # Widen the range of constant values as numpy.histogram2d() does.
+    if x_min == x_max:
+        x_min, x_max = x_min - 0.5, x_max + 0.5
+    if y_min == y_max:
+        y_min, y_max = y_min - 0.5, y_max + 0.5
+
+    counts = np.zeros((n_bins, n_bins))
+    for start, stop in chunks:
+        x_chunk = np.asarray(x[start:stop], dtype=float)
+        y_chunk = np.asarray(y[start:stop], dtype=float)
+        finite = np.isfinite(x_chunk) & np.isfinite(y_chunk)
+        counts += np.histogram2d(x_chunk[finite], y_chunk[finite],
+                                 bins=n_bins,
+                                 range=[[x_min, x_max], [y_min, y_max]])[0]
+    return counts, (float(x_min), float(x_max), float(y_min), float(y_max))
+
+
+def _plot_points(ax, x, y, label=None, max_points=SCATTER_MAX_POINTS):
+    """
+    Plots measured data as scatter plot or, if there are more than
+    max_points points, as density raster.
+
+    Returns
+    -------
+    image : matplotlib.image.AxesImage or None,
+        The density raster, None if a scatter plot was drawn.
+    """
+    if len(x) <= max_points:
+        ax.scatter(x, y, s=5, c='k', label=label)
+        return None
+    from matplotlib.colors import LinearSegmentedColormap, LogNorm
+
+    counts, extent = density_grid(x, y)
+    # Empty cells are transparent. The lightest grey shows a single point.
+    cmap = LinearSegmentedColormap.from_list('density', ['#bbbbbb', 'k'])
+    image = ax.imshow(np.ma.masked_equal(counts.T, 0), origin='lower',
+                      extent=extent, aspect='auto', interpolation='nearest',
+                      cmap=cmap, norm=LogNorm(vmin=1,
+                                              vmax=max(counts.max(), 1)))
+    if label is not None:
+        # Images are not shown in legends.
+        ax.scatter([], [], s=5, c='k', label=label)
+    return image
+
+
+def render_pdf_with_raw_data(spec):
+    """
+    Renders a figure, which shows a fit of a distribution.
+
+    Parameters
+    ----------
+    spec : dict,
+        Render spec with the keys 'shape', 'loc', 'scale',
+        'distribution_type' ("Normal", "Weibull" or "Lognormal"),
+        'dist_points' (the data of the histogram), 'interval', 'var_name' and
+        'symbol_parent_var' (None if the distribution is not conditional).
+
+    Returns
+    -------
+    png : bytes
+    """
+    from scipy.stats import weibull_min, lognorm, norm
+
+    shape = spec['shape']
+    loc = spec['loc']
+    scale = spec['scale']
+    distribution_type = spec['distribution_type']
+    dist_points = spec['dist_points']
+    interval = spec['interval']
+    symbol_parent_var = spec['symbol_parent_var']
+
+    fig = _new_figure()
+    ax = fig.add_subplot(111)
+
+    if distribution_type == 'Normal':
+        x = np.linspace(norm.ppf(0.0001, loc, scale),
+                        norm.ppf(0.9999, loc, scale), 100)
+        y = norm.pdf(x, loc, scale)
+        text = distribution_type + ',' + \
+               ' μ=' + str(format(loc, '.3f')) + \
+               ' σ=' + str(format(scale, '.3f'))
+    elif distribution_type == 'Weibull':
+        x = np.linspace(weibull_min.ppf(0.0001, shape, loc, scale),
+                        weibull_min.ppf(0.9999, shape, loc, scale), 100)
+        y = weibull_min.pdf(x, shape, loc, scale)
+        text = distribution_type + ',' + \
+               ' α=' + str(format(scale, '.3f')) + \
+               ' β=' + str(format(shape, '.3f')) + \
+               ' γ=' + str(format(loc, '.3f'))
+    elif distribution_type == 'Lognormal':
+        x = np.linspace(lognorm.ppf(0.0001, shape, scale=scale),
+                        lognorm.ppf(0.9999, shape, scale=scale), 100)
+        y = lognorm.pdf(x, shape, scale=scale)
+
+        # The figure is rendered with the scale parameter, but the user
+        # should be presented the mu value. Consequently, the scale value must
+        # be converted.
+        text = distribution_type + ',' + \
+               ' μ=' + str(format(np.log(scale), '.3f')) + \
+               ' σ=' + str(format(shape, '.3f'))
+
+    else:
+        raise KeyError('No function match - {}'.format(distribution_type))
+
+    text = text + ' ('
+    if symbol_parent_var:
+        text = text + str(format(interval[0], '.3f')) + '≤' + \
+               symbol_parent_var + '<' + str(format(interval[1], '.3f')) + ', '
+    text = text + 'n=' + str(len(dist_points)) + ')'
+
+    ax.plot(x, y, 'r-', lw=5, alpha=0.6, label=distribution_type)
+    n_intervals_histogram = int(round(len(dist_points) / 50.0))
+    if n_intervals_histogram > 100:
+        n_intervals_histogram = 100
+    if n_intervals_histogram < 10:
+        n_intervals_histogram = 10
+
+    ax.hist(dist_points, n_intervals_histogram, density=True,
+            histtype='stepfilled', alpha=0.9, color='#54889c')
+    ax.grid(True)
+
+    ax.set_title(text)
+    ax.set_xlabel(spec['var_name'])
+    ax.set_ylabel('probability density [-]')
+    return _to_png(fig)
+
+
+def render_parameter_fit_overview(spec):
+    """
+    Renders a figure, which shows the fit of a dependence function.
+
+    Parameters
+    ----------
+    spec : dict,
+        Render spec with the keys 'x' and 'y' (the fitted function),
+        'param_at' and 'param_values' (the parameter values, which were fitted
+        per interval), 'x_label' and 'y_label'.
+
+    Returns
+    -------
+    png : bytes
+    """
+    fig = _new_figure()
+    ax = fig.add_subplot(111)
+    ax.plot(spec['x'], spec['y'], color='#54889c')
+    ax.scatter(spec['param_at'], spec['param_values'], color='#9C373A')
+    ax.grid(True)
+    ax.set_ylabel(spec['y_label'])
+    ax.set_xlabel(spec['x_label'])
+    return _to_png(fig)
+
+
+def render_contour(spec):
+    """
+    Renders a figure, which shows an environmental contour.
+
+    Parameters
+    ----------
+    spec : dict,
+        Render spec with the keys 'contour_coordinates' (see
+        compute_interface.iform()), 'var_names' and 'data' (the measured
+        data of the first two variables or None if the probabilistic model
+        was not fitted).
+
+    Returns
+    -------
+    png : bytes
+    """
+    from mpl_toolkits.mplot3d import Axes3D # Needed for projection='3d'
+    from descartes import PolygonPatch
+    from .plot_generic import alpha_shape
+    from .plot_generic import contour_path_to_points
+
+    contour_coordinates = spec['contour_coordinates']
+    var_names = spec['var_names']
+    fig = _new_figure()
+
+    if len(contour_coordinates[0]) == 2:
+        ax = fig.add_subplot(111)
+
+        # Plot raw data
+        if spec['data'] is not None:
+            _plot_points(ax, spec['data'][0], spec['data'][1],
+                         label='measured/simulated data')
+
+        # Plot the contour as a scatter plot and a line connecting the dots
+        alpha = .1
+        for i in range(len(contour_coordinates)):
+            ax.scatter(contour_coordinates[i][0], contour_coordinates[i][1],
+                       s=15, c='b',
+                       label='extreme env. design condition')
+            concave_hull, edge_points = alpha_shape(
+                contour_path_to_points(contour_coordinates[i]), alpha=alpha)
+            if concave_hull.geom_type not in ('Polygon', 'MultiPolygon'):
+                # E.g. if the points do not span an area.
+                warnings.warn('The alpha shape is not a polygon. '
+                              'Consequently no contour is plotted.',
+                              RuntimeWarning, stacklevel=2)
+                continue
+            patch_design_region = PolygonPatch(
+                concave_hull, fc='#999999', linestyle='None', fill=True,
+                zorder=-2, label='design region')
+            patch_environmental_contour = PolygonPatch(
+                concave_hull, ec='b', fill=False, zorder=-1,
+                label='environmental contour')
+            ax.add_patch(patch_design_region)
+            ax.add_patch(patch_environmental_contour)
+
+        ax.legend(loc='lower right')
+        ax.set_xlabel('{}'.format(var_names[0]))
+        ax.set_ylabel('{}'.format(var_names[1]))
+    elif len(contour_coordinates[0]) == 3:
+        ax = fig.add_subplot(1, 1, 1, projection='3d')
+        ax.scatter(contour_coordinates[0][0], contour_coordinates[0][1],
+                   contour_coordinates[0][2], marker='o', c='r')
+        ax.set_xlabel('{}'.format(var_names[0]))
+        ax.set_ylabel('{}'.format(var_names[1]))
+        ax.set_zlabel('{}'.format(var_names[2]))
+    else:
+        ax = fig.add_subplot(111)
+        fig.text(0.5, 0.5, '4-Dim plot is not supported')
+        warnings.warn("4-Dim plot or higher is not supported",
+                      DeprecationWarning, stacklevel=2)
+
+    ax.grid(True)
+    return _to_png(fig)
+
+
+def render_data_set_scatter(spec):
+    """
+    Renders a figure, which shows the data of a measurement file as scatter
+    plots.
+
+    All variables are plotted against the first variable, each in its own
+    subplot. Files with more than SCATTER_MAX_POINTS rows are drawn as
+    density rasters.
+
+    Parameters
+    ----------
+    spec : dict,
+        Render spec with the keys 'columns' (one array per variable),
+        'var_names' and 'title'.
+
+    Returns
+    -------
+    png : bytes
+    """
+    columns = spec['columns']
+    var_names = spec['var_names']
+    fig = _new_figure(figsize=(7.5, 5.5 * (len(var_names) - 1)))
+    for i in range(len(var_names) - 1):
+        ax = fig.add_subplot(len(var_names) - 1, 1, i + 1)
+        image = _plot_points(ax, columns[0], columns[i + 1])
+        if image is not None:
+            fig.colorbar(image, ax=ax, label='points per cell')
+        ax.set_xlabel('{}'.format(var_names[0]))
+        ax.set_ylabel('{}'.format(var_names[i + 1]))
+        if i == 0:
+            ax.set_title(spec['title'])
+    return _to_png(fig)
+
+
+RENDERERS = {'pdf_with_raw_data': render_pdf_with_raw_data,
+             'parameter_fit_overview': render_parameter_fit_overview,
+             'contour': render_contour,
+             'data_set_scatter': render_data_set_scatter}
+
+
+def render_figure(spec):
+    """
+    Renders a figure described by a render spec.
+
+    Parameters
+    ----------
+    spec : dict,
+        The render spec. Its key 'kind' selects the renderer, see RENDERERS.
+
+    Returns
+    -------
+    png : bytes
+    """
+    return RENDERERS[spec['kind']](spec)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = multiprocessing.Pool(processes=FIGURE_RENDER_N_WORKERS)
+        return _pool
+
+
+def render_figures(specs):
+    """
+    Renders multiple figures in a pool of FIGURE_RENDER_N_WORKERS worker
+    processes, which is created once per process.
+
+    Parameters
+    ----------
+    specs : list of dict,
+        The render specs.
+
+    Returns
+    -------
+    pngs : list of bytes,
+        The images in the same order as the specs.
+    """
+    if FIGURE_RENDER_N_WORKERS == 1 or len(specs) < 2:
+        return [render_figure(spec) for spec in specs]
+    return _get_pool().map(render_figure, specs)
@@ -0,0 +1,185 @@
+"""
+Content-addressed cache of fits.
+
+A fit is identified by the SHA-256 of the measurement file's content together
+with a canonical representation of the distribution descriptions, which are
+passed to viroconcom's Fit, and viroconcom's version. Consequently, refitting the same data with the
+same settings, e.g. after the probabilistic model was deleted or after the
+same file was uploaded again, does not compute the fit again.
+
+The cached fit holds the fitted parameters and the fit inspection data such
+that a new ProbabilisticModel and its figures can be created from it. The
+samples of the single fits are not stored as they add up to the whole data
+set. Instead, they are selected again from the memory-mapped columns (see
+measurement_data.py) when the fit is loaded.
+"""
+import copy
+import hashlib
+import json
+import pickle
+import warnings
+
+from viroconcom.version import __version__ as VIROCONCOM_VERSION
+
+from .disk_cache import DiskLRUCache
+from .measurement_data import read_manifest
+from .settings import FIT_CACHE_DIRECTORY, FIT_CACHE_MAX_SIZE_IN_MIB
+
+# Part of every key. Increase it if cached fits become invalid, e.g. because
+# the format of CachedFit changed. viroconcom's version is part of every key
+# as well.
+FIT_CACHE_FORMAT_VERSION = 2
+
+PARAM_NAMES = ('shape', 'loc', 'scale')
+
+_cache = DiskLRUCache(FIT_CACHE_DIRECTORY,
+                      FIT_CACHE_MAX_SIZE_IN_MIB * 1024 * 1024)
+
+
+def fit_cache_key(measure_file_model, dist_descriptions):
+    """
+    Computes the key of a fit.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file, which is fitted.
+    dist_descriptions : list of dict,
+        The distribution descriptions as passed to viroconcom's Fit. Fit
+        modifies them, thus the key must be computed before the fit.
+
+    Returns
+    -------
+    key : str,
+        The hex digest of the SHA-256 of the data's hash, the canonical
+        JSON representation of the distribution descriptions and the
+        versions.
+    """
+    canonical = json.dumps({'version': FIT_CACHE_FORMAT_VERSION,
+                            'viroconcom': VIROCONCOM_VERSION,
+                            'data': read_manifest(measure_file_model)['sha256'],
+                            'dists': dist_descriptions},
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class CachedFit:
+    """
+    The parts of a viroconcom Fit, which are needed to save and to plot it
+    (see persistence.save_fitted_prob_model() and plot.plot_fit()).
+
+    Attributes
+    ----------
+    mul_var_dist : MultivariateDistribution,
+        The fitted distribution.
+    dist_descriptions : list of dict,
+        The distribution descriptions as modified by the fit.
+    multiple_fit_inspection_data : list of FitInspectionData,
+        The parameters of the single fits per dimension. Their samples are
+        only set when the fit is loaded, see load_fit().
+    """
+    def __init__(self, mul_var_dist, dist_descriptions,
+                 multiple_fit_inspection_data):
+        self.mul_var_dist = mul_var_dist
+        self.dist_descriptions = dist_descriptions
+        self.multiple_fit_inspection_data = multiple_fit_inspection_data
+
+
+def _interval_width(fit, dim_index, param_index):
+    parent_index = fit.mul_var_dist.dependencies[dim_index][param_index]
+    return parent_index, fit.dist_descriptions[parent_index].get(
+        'width_of_intervals')
+
+
+def _select_samples(fit, columns):
+    """
+    Sets the samples of the single fits of a cached fit.
+
+    The samples are selected like in viroconcom's Fit: The samples of an
+    independent parameter are the whole column, the samples of a dependent
+    parameter are the rows whose parent value lies in the interval.
+    """
+    for dim_index, inspection_data in enumerate(
+            fit.multiple_fit_inspection_data):
+        column = columns[dim_index]
+        for param_index, param_name in enumerate(PARAM_NAMES):
+            n_fits = len(inspection_data.get_dependent_param_points(
+                param_name)[1])
+            interval_centers = getattr(inspection_data, param_name + '_at')
+            if interval_centers is None:
+                samples = [column] * n_fits
+            else:
+                parent_index, width = _interval_width(fit, dim_index,
+                                                      param_index)
+                parent = columns[parent_index]
+                samples = [column[(parent >= center - 0.5 * width) &
+                                  (parent < center + 0.5 * width)]
+                           for center in interval_centers]
+            setattr(inspection_data, param_name + '_samples', samples)
+
+
+def load_fit(key, columns):
+    """
+    Returns a cached fit.
+
+    Parameters
+    ----------
+    key : str,
+        See fit_cache_key().
+    columns : list of numpy.ndarray,
+        The fitted columns, e.g. memory-mapped by
+        measurement_data.load_columns(). The samples of the single fits are
+        selected from them.
+
+    Returns
+    -------
+    fit : CachedFit or None,
+        The cached fit or None if the cache holds no (readable) fit for the
+        key.
+    """
+    value = _cache.get(key)
+    if value is None:
+        return None
+    try:
+        fit = pickle.loads(value)
+        _select_samples(fit, columns)
+    # A corrupt entry is treated as a miss and overwritten by the next fit.
+    except Exception:
+        return None
+    return fit
+
+
+def save_fit(key, fit):
+    """
+    Stores a fit in the cache without the samples of its single fits.
+
+    Fits with intervals, which are not defined by their width, are not
+    stored since their samples cannot be selected again. If the fit cannot
+    be stored, e.g. because the disk is full, a warning is issued, such that
+    the computed fit can still be used.
+
+    Parameters
+    ----------
+    key : str,
+        See fit_cache_key().
+    fit : Fit,
+        The computed fit.
+    """
+    multiple_fit_inspection_data = []
+    for dim_index, inspection_data in enumerate(
+            fit.multiple_fit_inspection_data):
+        inspection_data = copy.copy(inspection_data)
+        for param_index, param_name in enumerate(PARAM_NAMES):
+            if getattr(inspection_data, param_name + '_at') is not None and \
+                    not _interval_width(fit, dim_index, param_index)[1]:
+                return
+            setattr(inspection_data, param_name + '_samples', [])
+        multiple_fit_inspection_data.append(inspection_data)
+    cached_fit = CachedFit(fit.mul_var_dist, fit.dist_descriptions,
+                           multiple_fit_inspection_data)
+    try:
+        _cache.set(key, pickle.dumps(cached_fit,
+                                     protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception as err:
+        warnings.warn('The fit could not be cached: ' + str(err),
+                      RuntimeWarning, stacklevel=2)
@@ -10,6 +10,16 @@ from .validators import validate_csv_upload
 SUB = {ord(c): ord(t) for c, t in zip(u"0123456789", u"₀₁₂₃₄₅₆₇₈₉")}
 
 
+def _suggested(values, i, default):
+    """
+    Returns the suggested value of the i-th variable as str, the default if
+    there is no suggestion.
+    """
+    if values is None or values[i] is None:
+        return str(default)
+    return str(values[i])
+
+
 class SecUserForm(ModelForm):
     class Meta:
         model = MeasureFileModel
@@ -34,8 +44,23 @@ class MeasureFileFitForm(forms.Form):
     title = forms.CharField(max_length=50, label='Title')
 
 
-    def __init__(self, variable_names, variable_count=2, *args, **kwargs):
+    def __init__(self, variable_names, variable_count=2,
+                 widths_of_intervals=None, *args, **kwargs):
+        """
+        Parameters
+        ----------
+        variable_names : list of str,
+            Names of the measured variables.
+        variable_count : int, optional
+            Number of variables.
+        widths_of_intervals : list of float, optional
+            Suggested width of intervals per variable (see
+            column_statistics.fit_interval_widths()). Variables without a
+            suggestion (None) default to a width of 2.
+        """
         super(MeasureFileFitForm, self).__init__(*args, **kwargs)
+        widths = [_suggested(widths_of_intervals, i, 2)
+                  for i in range(variable_count)]
 
         # First variable
         self.fields['_%s' % variable_names[0]] = forms.CharField(
@@ -55,7 +80,7 @@ class MeasureFileFitForm(forms.Form):
         self.fields['width_of_intervals_%s' % 0] = forms.DecimalField(
             decimal_places=4,
             min_value=0.0001,
-            widget=forms.NumberInput(attrs={'value': '2'}),
+            widget=forms.NumberInput(attrs={'value': widths[0]}),
             label='Width of intervals')
 
         # Additional variables
@@ -87,7 +112,7 @@ class MeasureFileFitForm(forms.Form):
                 self.fields['width_of_intervals_%s' % i] = forms.DecimalField(
                     decimal_places=4,
                     min_value=0.0001,
-                    widget=forms.NumberInput(attrs={'value': '2'}),
+                    widget=forms.NumberInput(attrs={'value': widths[i]}),
                     label='Width of intervals')
 
             self.fields['scale_dependency_%s' % i] = forms.ChoiceField(
@@ -310,9 +335,26 @@ class HDCForm(forms.Form):
     """
     Form for the settings to calculate a highest density contour (HDC).
     """
-    def __init__(self, var_names, *args, **kwargs):
+    def __init__(self, var_names, limits=None, deltas=None, *args, **kwargs):
+        """
+        Parameters
+        ----------
+        var_names : list of str,
+            Names of the variables.
+        limits : list of tuple, optional
+            Suggested lower and upper limit per variable (see
+            column_statistics.hdc_defaults()). Variables without a suggestion
+            (None) default to the limits 0 and 20.
+        deltas : list of float, optional
+            Suggested grid size per variable. Variables without a suggestion
+            (None) default to 0.5.
+        """
         super(HDCForm, self).__init__(*args, **kwargs)
         for i, name in enumerate(var_names):
+            if limits is None or limits[i] is None:
+                lower_limit, upper_limit = '0', '20'
+            else:
+                lower_limit, upper_limit = [str(limit) for limit in limits[i]]
             self.fields['limit_%s' % i + '_1'] = forms.DecimalField(
                 label=name + ' lower limit',
                 required=True,
@@ -320,7 +362,7 @@ class HDCForm(forms.Form):
                 min_value=0,
                 max_value=10000,
                 widget=forms.NumberInput(
-                    attrs={'value': '0',
+                    attrs={'value': lower_limit,
                            'class': 'contour_input_field'}))
             self.fields['limit_%s' % i + '_2'] = forms.DecimalField(
                 label=name + ' upper limit',
@@ -329,7 +371,7 @@ class HDCForm(forms.Form):
                 min_value=0.01,
                 max_value=10000,
                 widget=forms.NumberInput(
-                    attrs={'value': '20',
+                    attrs={'value': upper_limit,
                            'class': 'contour_input_field'}))
             self.fields['delta_%s' % i] = forms.DecimalField(
                 label=name + ' grid size ',
@@ -338,7 +380,7 @@ class HDCForm(forms.Form):
                  min_value=0.01,
                  max_value=1000,
                  widget=forms.NumberInput(
-                     attrs={'value': '0.5',
+                     attrs={'value': _suggested(deltas, i, 0.5),
                             'class': 'contour_input_field'}))
         pass
 
@@ -0,0 +1,400 @@
+"""
+Runs fits and contour calculations as background jobs.
+
+The views enqueue a ComputeJob and redirect the user to a status page. A
+worker process (python manage.py compute_worker) claims queued jobs from the
+data base and executes them. Jobs are claimed with row locking such that
+multiple workers can run in parallel without executing a job twice. If a
+worker stops while it executes a job, e.g. because it was killed, the job is
+queued again after COMPUTE_JOB_CLAIM_TIMEOUT seconds.
+
+The report of a contour is created by a job of its own, which is enqueued
+when the report is downloaded for the first time (see enqueue_report()).
+Thus, reports, which are never downloaded, are not created and the figures
+they show are not rendered.
+"""
+import json
+import time
+import warnings
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from . import plot
+from . import settings
+from .compute_interface import ComputeInterface
+from .design_conditions import read_csv
+from .media import open_media
+from .models import ComputeJob, EnvironmentalContour, \
+    AdditionalContourOption, DistributionModel
+from .persistence import save_fitted_prob_model, \
+    save_environmental_contour, load_contour_coordinates
+from .metrics import increment, observe
+from .timing import collect_timings, report_timings
+from .validators import validate_contour_coordinates
+from .settings import USE_COMPUTE_WORKER, MAX_COMPUTING_TIME, \
+    DO_SAVE_CONTOUR_COORDINATES_IN_DB, COMPUTE_JOB_CLAIM_TIMEOUT, \
+    COMPUTE_JOB_MAX_ATTEMPTS
+
+
+def enqueue_job(kind, user, parameters, measure_file_model=None,
+                probabilistic_model=None, environmental_contour=None):
+    """
+    Creates a ComputeJob.
+
+    If no worker is used (settings.USE_COMPUTE_WORKER is False), the job is
+    executed directly.
+
+    Parameters
+    ----------
+    kind : str,
+        ComputeJob.FIT, ComputeJob.IFORM, ComputeJob.HDC or
+        ComputeJob.REPORT.
+    user : User,
+        The user who requested the computation.
+    parameters : dict,
+        The job's input, e.g. the fit settings. Must be serializable with
+        DjangoJSONEncoder.
+    measure_file_model : MeasureFileModel, optional
+        The measurement file that should be fitted.
+    probabilistic_model : ProbabilisticModel, optional
+        The probabilistic model a contour should be calculated for.
+    environmental_contour : EnvironmentalContour, optional
+        The environmental contour a report should be created for.
+
+    Returns
+    -------
+    job : ComputeJob,
+        The created job.
+    """
+    job = ComputeJob(primary_user=user,
+                     kind=kind,
+                     parameters=json.dumps(parameters, cls=DjangoJSONEncoder),
+                     measure_file_model=measure_file_model,
+                     probabilistic_model=probabilistic_model,
+                     environmental_contour=environmental_contour)
+    job.save()
+    if not USE_COMPUTE_WORKER:
+        run_job(job, MAX_COMPUTING_TIME)
+    return job
+
+
+def enqueue_report(environmental_contour, user):
+    """
+    Enqueues the job, which creates the report of a contour, unless the
+    report exists or is being created.
+
+    Parameters
+    ----------
+    environmental_contour : EnvironmentalContour,
+        The contour, whose report is requested.
+    user : User,
+        The user who requested the report.
+
+    Returns
+    -------
+    job : ComputeJob or None,
+        The job, which creates the report, or None if the report exists.
+    """
+    if environmental_contour.latex_report:
+        return None
+    job = environmental_contour.computejob_set.filter(
+        kind=ComputeJob.REPORT,
+        status__in=[ComputeJob.QUEUED, ComputeJob.RUNNING]).first()
+    if job is None:
+        job = enqueue_job(
+            ComputeJob.REPORT, user, {},
+            probabilistic_model=environmental_contour.probabilistic_model,
+            environmental_contour=environmental_contour)
+    return job
+
+
+def claim_next_job():
+    """
+    Claims the oldest queued job and marks it as running.
+
+    Jobs, which are locked by another worker are skipped.
+
+    Returns
+    -------
+    job : ComputeJob or None,
+        The claimed job or None if the queue is empty.
+    """
+    with transaction.atomic():
+        job = ComputeJob.objects.select_for_update(skip_locked=True).filter(
+            status=ComputeJob.QUEUED).order_by('created', 'pk').first()
+        if job is None:
+            return None
+        job.status = ComputeJob.RUNNING
+        job.started = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=['status', 'started', 'attempts'])
+    return job
+
+
+def requeue_stale_jobs(claim_timeout=COMPUTE_JOB_CLAIM_TIMEOUT):
+    """
+    Queues running jobs again, which were claimed more than claim_timeout
+    seconds ago and are thus considered abandoned by their worker.
+
+    Jobs, which were claimed COMPUTE_JOB_MAX_ATTEMPTS times already, fail
+    instead, such that a job, which kills its worker, is not executed over
+    and over again.
+
+    Parameters
+    ----------
+    claim_timeout : float, optional
+        Seconds after which a running job is considered abandoned. Defaults
+        to COMPUTE_JOB_CLAIM_TIMEOUT.
+
+    Returns
+    -------
+    n_requeued : int,
+        Number of jobs, which were queued again.
+    n_failed : int,
+        Number of jobs, which failed.
+    """
+    now = timezone.now()
+    stale_jobs = ComputeJob.objects.filter(
+        status=ComputeJob.RUNNING,
+        started__lt=now - timedelta(seconds=claim_timeout))
+    n_failed = stale_jobs.filter(
+        attempts__gte=COMPUTE_JOB_MAX_ATTEMPTS).update(
+        status=ComputeJob.FAILED, finished=now,
+        error_message='The computation was aborted, because its worker '
+                      'stopped ' + str(COMPUTE_JOB_MAX_ATTEMPTS) + ' times.',
+        error_class='WorkerLostError')
+    n_requeued = stale_jobs.filter(
+        attempts__lt=COMPUTE_JOB_MAX_ATTEMPTS).update(
+        status=ComputeJob.QUEUED, started=None, stage='')
+    return n_requeued, n_failed
+
+
+def run_job(job, timeout):
+    """
+    Executes a job and saves its result or error.
+
+    Parameters
+    ----------
+    job : ComputeJob,
+        The job, which should be executed.
+    timeout : float,
+        The maximum time in seconds a fit or contour calculation is allowed to
+        take.
+
+    Returns
+    -------
+    job : ComputeJob,
+        The finished job, its status is either ComputeJob.DONE or
+        ComputeJob.FAILED.
+    """
+    if job.status != ComputeJob.RUNNING:
+        job.status = ComputeJob.RUNNING
+        job.started = timezone.now()
+        job.save(update_fields=['status', 'started'])
+    runners = {ComputeJob.FIT: _run_fit,
+               ComputeJob.IFORM: _run_iform,
+               ComputeJob.HDC: _run_hdc,
+               ComputeJob.REPORT: _run_report}
+    start = time.perf_counter()
+    with collect_timings() as timings:
+        try:
+            result = runners[job.kind](job, json.loads(job.parameters),
+                                       timeout)
+        # A job should never stop the worker. The error is shown to the user.
+        except Exception as err:
+            job.status = ComputeJob.FAILED
+            job.error_message = str(err)
+            job.error_class = err.__class__.__name__
+            if job.error_class == 'TimeoutError':
+                increment('viroconweb_compute_timeouts_total', kind=job.kind)
+        else:
+            job.status = ComputeJob.DONE
+            job.result = json.dumps(result, cls=DjangoJSONEncoder)
+    job.finished = timezone.now()
+    job.save()
+    # If the job was executed within a request, the request reports the
+    # timings.
+    if timings:
+        report_timings('job:' + job.kind, timings,
+                       time.perf_counter() - start, status=job.status)
+    return job
+
+
+def _set_stage(job, stage):
+    job.stage = stage
+    job.save(update_fields=['stage'])
+
+
+def _run_fit(job, parameters, timeout):
+    """
+    Fits a probabilistic model to a measurement file and plots the fit.
+    """
+    var_names = parameters['var_names']
+    var_symbols = parameters['var_symbols']
+    fit_settings = parameters['fit_settings']
+    _set_stage(job, 'fit')
+    start = time.perf_counter()
+    fit = ComputeInterface.fit_curves(mfm_item=job.measure_file_model,
+                                      fit_settings=fit_settings,
+                                      var_number=len(var_names),
+                                      timeout=timeout)
+    observe('viroconweb_fit_duration_seconds', time.perf_counter() - start,
+            dimensions=len(var_names))
+    _set_stage(job, 'plot')
+    prob_model = save_fitted_prob_model(fit,
+                                        fit_settings['title'],
+                                        var_names,
+                                        var_symbols,
+                                        job.primary_user,
+                                        job.measure_file_model)
+    directory = settings.PATH_MEDIA + settings.PATH_USER_GENERATED + \
+                str(job.primary_user) + '/prob_model/'
+    try:
+        plot.plot_fit(fit, var_names, var_symbols, directory, prob_model)
+    except BaseException:
+        # Otherwise the model would be shown to the user without its figures.
+        # The job does not refer to the model yet, thus it is not deleted
+        # with the model.
+        prob_model.delete()
+        raise
+    job.probabilistic_model = prob_model
+    job.save(update_fields=['probabilistic_model'])
+    return {'var_symbols': var_symbols}
+
+
+def _run_iform(job, parameters, timeout):
+    """
+    Calculates an IFORM contour.
+    """
+    _set_stage(job, 'contour')
+    with warnings.catch_warnings(record=True) as warn:
+        start = time.perf_counter()
+        contour_coordinates = ComputeInterface.iform(
+            job.probabilistic_model,
+            parameters['return_period'],
+            parameters['state_duration'],
+            parameters['n_steps'],
+            timeout=timeout)
+        observe('viroconweb_contour_duration_seconds',
+                time.perf_counter() - start, method='IFORM',
+                dimensions=len(contour_coordinates[0]))
+        validate_contour_coordinates(contour_coordinates)
+        environmental_contour = EnvironmentalContour(
+            primary_user=job.primary_user,
+            fitting_method="",
+            contour_method="Inverse first order reliability method (IFORM)",
+            return_period=parameters['return_period'],
+            state_duration=parameters['state_duration'],
+            probabilistic_model=job.probabilistic_model
+        )
+        # Save the environmental contour here that it gets a primary key.
+        environmental_contour.save()
+        additional_contour_options = [
+            AdditionalContourOption(
+                option_key="Number of points on the contour",
+                option_value=parameters['n_steps'],
+                environmental_contour=environmental_contour)
+        ]
+        save_environmental_contour(environmental_contour,
+                                   additional_contour_options,
+                                   contour_coordinates,
+                                   str(job.primary_user))
+    return _create_contour_files(job, parameters, environmental_contour,
+                                 contour_coordinates, warn)
+
+
+def _run_hdc(job, parameters, timeout):
+    """
+    Calculates a highest density contour.
+    """
+    limits = [tuple(limit) for limit in parameters['limits']]
+    deltas = parameters['deltas']
+    _set_stage(job, 'contour')
+    with warnings.catch_warnings(record=True) as warn:
+        start = time.perf_counter()
+        contour_coordinates = ComputeInterface.hdc(
+            job.probabilistic_model,
+            parameters['return_period'],
+            parameters['state_duration'],
+            limits,
+            deltas,
+            timeout=timeout)
+        observe('viroconweb_contour_duration_seconds',
+                time.perf_counter() - start, method='HDC',
+                dimensions=len(limits))
+        validate_contour_coordinates(contour_coordinates)
+        environmental_contour = EnvironmentalContour(
+            primary_user=job.primary_user,
+            fitting_method="",
+            contour_method="Highest density contour (HDC) method",
+            return_period=parameters['return_period'],
+            state_duration=parameters['state_duration'],
+            probabilistic_model=job.probabilistic_model
+        )
+        # Save the environmental contour here that it gets a primary key.
+        environmental_contour.save()
+        additional_contour_options = [
+            AdditionalContourOption(
+                option_key="Limits of the grid",
+                option_value=" ".join(map(str, limits)),
+                environmental_contour=environmental_contour),
+            AdditionalContourOption(
+                option_key=r"Grid cell size ($\Delta x_i$)",
+                option_value=" ".join(map(str, deltas)),
+                environmental_contour=environmental_contour)
+        ]
+        save_environmental_contour(environmental_contour,
+                                   additional_contour_options,
+                                   contour_coordinates,
+                                   str(job.primary_user))
+    return _create_contour_files(job, parameters, environmental_contour,
+                                 contour_coordinates, warn)
+
+
+def _create_contour_files(job, parameters, environmental_contour,
+                          contour_coordinates, warn):
+    """
+    Creates the files of a calculated contour and returns the job's result.
+    """
+    job.environmental_contour = environmental_contour
+    job.save(update_fields=['environmental_contour'])
+    plot.create_design_conditions_csv(contour_coordinates,
+                                      environmental_contour)
+    plot.plot_contour(contour_coordinates, str(job.primary_user),
+                      environmental_contour, parameters['var_names'])
+    result = {'warnings': [str(w.message) for w in warn]}
+    # Otherwise the coordinates are loaded from the data base.
+    if not DO_SAVE_CONTOUR_COORDINATES_IN_DB:
+        result['contour_coordinates'] = [[coordinates.tolist()
+                                          for coordinates in contour_path]
+                                         for contour_path in contour_coordinates]
+    return result
+
+
+def _run_report(job, parameters, timeout):
+    """
+    Creates the latex report of a contour and attaches it to the contour.
+    """
+    environmental_contour = job.environmental_contour
+    if environmental_contour is None:
+        # The contour was deleted in the mean time.
+        return {}
+    contour_coordinates = load_contour_coordinates(environmental_contour)
+    if not contour_coordinates:
+        # The coordinates were not saved in the data base.
+        csv_file = environmental_contour.design_conditions_csv
+        with open_media(csv_file.name, csv_file.storage) as f:
+            contour_coordinates = read_csv(f)
+    distribution_models = DistributionModel.objects.filter(
+        probabilistic_model=environmental_contour.probabilistic_model_id
+    ).order_by('pk')
+    _set_stage(job, 'report')
+    plot.create_latex_report(contour_coordinates,
+                             str(environmental_contour.primary_user),
+                             environmental_contour,
+                             [dist.name for dist in distribution_models],
+                             [dist.symbol for dist in distribution_models])
+    return {}
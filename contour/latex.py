@@ -0,0 +1,135 @@
+"""
+Compiles latex documents to pdf with pdflatex.
+
+Loading the packages of the preamble takes most of the time of a pdflatex
+run. Thus, a document's preamble is compiled once into a format file with
+the package mylatexformat. The format file is cached in
+LATEX_FORMAT_DIRECTORY and loaded by the following runs instead of the
+preamble. If the format file can not be built, e.g. because mylatexformat is
+not installed, the document is compiled with its preamble.
+
+pdflatex is only run a second time if the first run reports that references,
+e.g. the total number of pages, changed.
+"""
+import functools
+import hashlib
+import os
+import tempfile
+import time
+from subprocess import Popen, PIPE
+
+from .settings import LATEX_FORMAT_DIRECTORY
+from .metrics import observe
+from .timing import timed_stage
+
+# pdflatex writes one of these messages to its log if the document needs
+# another run.
+RERUN_MARKERS = (b'Rerun to get', b'There were undefined references',
+                 b'Label(s) may have changed')
+
+DOCUMENT_NAME = 'report'
+
+
+@functools.lru_cache(maxsize=None)
+def _pdflatex_version():
+    process = Popen(['pdflatex', '--version'], stdout=PIPE)
+    output, _ = process.communicate()
+    return output.split(b'\n')[0]
+
+
+def _run_pdflatex(arguments, output_directory, environment=None, cwd=None):
+    """
+    Runs pdflatex and returns whether it succeeded.
+    """
+    process = Popen(['pdflatex', '-interaction=nonstopmode',
+                     '-output-directory', output_directory] + arguments,
+                    cwd=cwd, stdin=PIPE, stdout=PIPE, env=environment)
+    process.communicate()
+    return process.returncode == 0
+
+
+def preamble_format(document):
+    """
+    Returns the name of the format file, which holds the document's
+    preamble, and builds the format file if it is not cached.
+
+    Parameters
+    ----------
+    document : bytes,
+        The latex document.
+
+    Returns
+    -------
+    format_name : str or None,
+        The name of the format file (without '.fmt') in
+        LATEX_FORMAT_DIRECTORY or None if it could not be built.
+    """
+    preamble = document.split(b'\\begin{document}')[0]
+    # A format file only works with the pdflatex version, which built it.
+    format_name = 'preamble_' + hashlib.sha256(
+        _pdflatex_version() + preamble).hexdigest()
+    format_path = os.path.join(LATEX_FORMAT_DIRECTORY, format_name + '.fmt')
+    if os.path.exists(format_path):
+        return format_name
+    os.makedirs(LATEX_FORMAT_DIRECTORY, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=LATEX_FORMAT_DIRECTORY) as tempdir:
+        with open(os.path.join(tempdir, 'preamble.tex'), 'wb') as f:
+            f.write(preamble + b'\\begin{document}\n\\end{document}\n')
+        is_built = _run_pdflatex(['-ini', '-jobname=' + format_name,
+                                  '&pdflatex', 'mylatexformat.ltx',
+                                  'preamble.tex'],
+                                 tempdir, cwd=tempdir)
+        built_path = os.path.join(tempdir, format_name + '.fmt')
+        if not is_built or not os.path.exists(built_path):
+            return None
+        # Other processes may build the same format at the same time.
+        os.replace(built_path, format_path)
+    return format_name
+
+
+@timed_stage('pdflatex')
+def compile_latex(document):
+    """
+    Compiles a latex document to pdf.
+
+    Parameters
+    ----------
+    document : bytes,
+        The latex document.
+
+    Returns
+    -------
+    pdf : bytes
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tempdir:
+        # pdflatex runs in the current directory such that relative paths of
+        # images are resolved as before.
+        document_path = os.path.join(tempdir, DOCUMENT_NAME + '.tex')
+        with open(document_path, 'wb') as f:
+            f.write(document)
+        arguments = ['--shell-escape', document_path]
+        environment = None
+        format_name = preamble_format(document)
+        if format_name is not None:
+            # The trailing separator keeps the default search path.
+            environment = dict(os.environ,
+                               TEXFORMATS=os.path.abspath(
+                                   LATEX_FORMAT_DIRECTORY) + os.pathsep)
+            arguments = ['-fmt=' + format_name] + arguments
+            if not _run_pdflatex(arguments, tempdir, environment):
+                # Compile the document with its preamble instead.
+                environment = None
+                arguments = arguments[1:]
+                _run_pdflatex(arguments, tempdir)
+        else:
+            _run_pdflatex(arguments, tempdir)
+        with open(os.path.join(tempdir, DOCUMENT_NAME + '.log'), 'rb') as f:
+            log = f.read()
+        if any(marker in log for marker in RERUN_MARKERS):
+            _run_pdflatex(arguments, tempdir, environment)
+        with open(os.path.join(tempdir, DOCUMENT_NAME + '.pdf'), 'rb') as f:
+            pdf = f.read()
+    observe('viroconweb_pdflatex_duration_seconds',
+            time.perf_counter() - start)
+    return pdf
@@ -0,0 +1,262 @@
+"""
+Renders fit and contour figures on first access and caches the images.
+
+Instead of rendering all images of a fit directly, a PlottedFigure is saved
+with a render spec (see figure_rendering.py). The spec holds the fitted
+parameters and a reference to the data, e.g. to the slice of the measurement
+file a distribution was fitted to, but not the data itself. The image is
+rendered when it is requested for the first time and is stored afterwards.
+
+The rendered images of a user are limited to
+MAX_RENDERED_FIGURES_SIZE_PER_USER_IN_MIB. If this size is exceeded, the
+least recently used images are deleted. They are rendered again on their next
+request.
+"""
+import json
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .figure_rendering import render_figure
+from .metrics import increment
+from .measurement_data import load_columns
+from .media import read_media
+from .models import MeasureFileModel, EnvironmentalContour, PlottedFigure
+from .persistence import load_contour_coordinates
+from .settings import MAX_RENDERED_FIGURES_SIZE_PER_USER_IN_MIB
+from .timing import timed_stage
+
+
+class _SpecEncoder(DjangoJSONEncoder):
+    """
+    Encodes render specs, which can contain numpy arrays and numbers.
+    """
+    def default(self, o):
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+        if isinstance(o, np.generic):
+            return o.item()
+        return super().default(o)
+
+
+def encode_spec(spec):
+    """
+    Serializes a render spec to a JSON string.
+
+    Parameters
+    ----------
+    spec : dict,
+        The render spec.
+
+    Returns
+    -------
+    text : str
+    """
+    return json.dumps(spec, cls=_SpecEncoder)
+
+
+def lazy_plotted_figure(spec, **fields):
+    """
+    Creates a PlottedFigure, which is rendered on first access.
+
+    The object is not saved such that multiple figures can be saved with
+    bulk_create().
+
+    Parameters
+    ----------
+    spec : dict,
+        The render spec. Data can be referenced with the keys 'samples_ref',
+        'contour_ref' and 'data_ref' (see resolve_spec()).
+    **fields
+        Fields of the PlottedFigure, e.g. probabilistic_model.
+
+    Returns
+    -------
+    plotted_figure : PlottedFigure
+    """
+    return PlottedFigure(render_spec=encode_spec(spec),
+                         file_name=spec['file_name'],
+                         **fields)
+
+
+def resolve_spec(spec):
+    """
+    Replaces the data references of a render spec by the data.
+
+    Parameters
+    ----------
+    spec : dict,
+        The render spec as saved in a PlottedFigure. It can hold the
+        following references:
+
+        'samples_ref' : dict with the keys 'measure_file_model' (primary key),
+        'column', 'parent_column' (None if the distribution is not
+        conditional) and 'lower' and 'upper' (the limits of the parent
+        variable's interval). It is resolved to 'dist_points'.
+
+        'contour_ref' : dict with the key 'environmental_contour' (primary
+        key). It is resolved to 'contour_coordinates'.
+
+        'data_ref' : dict with the key 'measure_file_model' (primary key or
+        None). It is resolved to 'data', the first two columns of the file.
+
+    Returns
+    -------
+    spec : dict,
+        A render spec, which can be passed to figure_rendering.render_figure().
+    """
+    spec = dict(spec)
+    samples_ref = spec.pop('samples_ref', None)
+    if samples_ref is not None:
+        columns = load_columns(MeasureFileModel.objects.get(
+            pk=samples_ref['measure_file_model']))
+        sample = columns[samples_ref['column']]
+        if samples_ref['parent_column'] is not None:
+            # Same interval definition as in viroconcom's Fit.
+            parent = columns[samples_ref['parent_column']]
+            mask = (parent >= samples_ref['lower']) & \
+                   (parent < samples_ref['upper'])
+            sample = sample[mask]
+        spec['dist_points'] = np.array(sample)
+    contour_ref = spec.pop('contour_ref', None)
+    if contour_ref is not None:
+        spec['contour_coordinates'] = load_contour_coordinates(
+            EnvironmentalContour.objects.get(
+                pk=contour_ref['environmental_contour']))
+    data_ref = spec.pop('data_ref', None)
+    if data_ref is not None:
+        if data_ref['measure_file_model'] is None:
+            spec['data'] = None
+        else:
+            columns = load_columns(MeasureFileModel.objects.get(
+                pk=data_ref['measure_file_model']))
+            spec['data'] = [columns[0], columns[1]]
+    return spec
+
+
+def figure_owner(plotted_figure):
+    """
+    Returns the user who owns a PlottedFigure.
+
+    Parameters
+    ----------
+    plotted_figure : PlottedFigure
+
+    Returns
+    -------
+    user : User
+    """
+    if plotted_figure.probabilistic_model_id:
+        return plotted_figure.probabilistic_model.primary_user
+    return plotted_figure.environmental_contour.primary_user
+
+
+@timed_stage('render_figure')
+def ensure_rendered(plotted_figure, evict=True):
+    """
+    Renders the image of a PlottedFigure if it is not stored.
+
+    Parameters
+    ----------
+    plotted_figure : PlottedFigure,
+        The figure. Figures without render spec are not changed.
+    evict : boolean, optional
+        If True, the least recently used images of the figure's owner are
+        deleted afterwards (see evict_rendered_figures()). Callers, which
+        need multiple images at once, pass False and evict afterwards.
+        Defaults to True.
+
+    Returns
+    -------
+    png : bytes or None,
+        The rendered image or None if the image was already stored.
+    """
+    if plotted_figure.image or plotted_figure.render_spec is None:
+        return None
+    spec = resolve_spec(json.loads(plotted_figure.render_spec))
+    png = render_figure(spec)
+    plotted_figure.image.save(plotted_figure.file_name, ContentFile(png),
+                              save=False)
+    plotted_figure.image_size = len(png)
+    plotted_figure.last_accessed = timezone.now()
+    plotted_figure.save(update_fields=['image', 'image_size',
+                                       'last_accessed'])
+    increment('viroconweb_figures_rendered_total')
+    increment('viroconweb_media_written_bytes_total', len(png),
+              kind='figure')
+    if evict:
+        evict_rendered_figures(figure_owner(plotted_figure),
+                               keep=plotted_figure.pk)
+    return png
+
+
+def read_image(plotted_figure):
+    """
+    Returns the image of a PlottedFigure and renders it if necessary.
+
+    Parameters
+    ----------
+    plotted_figure : PlottedFigure
+
+    Returns
+    -------
+    png : bytes
+    """
+    png = ensure_rendered(plotted_figure)
+    if png is not None:
+        return png
+    try:
+        png = read_media(plotted_figure.image.name,
+                         plotted_figure.image.storage)
+    except (IOError, OSError):
+        # The image can be missing, e.g. if the server's file system is
+        # ephemeral. Then it is rendered again.
+        if plotted_figure.render_spec is None:
+            raise
+        plotted_figure.image = None
+        return ensure_rendered(plotted_figure)
+    if plotted_figure.render_spec is not None:
+        plotted_figure.last_accessed = timezone.now()
+        plotted_figure.save(update_fields=['last_accessed'])
+    return png
+
+
+def evict_rendered_figures(user, keep=None,
+                           max_size=MAX_RENDERED_FIGURES_SIZE_PER_USER_IN_MIB
+                                    * 1024 * 1024):
+    """
+    Deletes the least recently used images of a user until the images are
+    not larger than max_size.
+
+    Only images, which can be rendered again (i.e. which have a render spec),
+    are deleted.
+
+    Parameters
+    ----------
+    user : User,
+        The user whose images should be limited.
+    keep : int, optional
+        Primary key of a PlottedFigure, which should not be deleted, e.g.
+        because it is about to be shown.
+    max_size : int, optional
+        Maximum size of all rendered images of the user in bytes.
+        Defaults to MAX_RENDERED_FIGURES_SIZE_PER_USER_IN_MIB.
+    """
+    rendered_figures = PlottedFigure.objects.filter(
+        Q(probabilistic_model__primary_user=user) |
+        Q(environmental_contour__primary_user=user),
+        render_spec__isnull=False,
+        image_size__isnull=False).order_by('-last_accessed', '-pk')
+    kept_size = 0
+    for plotted_figure in rendered_figures:
+        if kept_size + plotted_figure.image_size <= max_size or \
+                plotted_figure.pk == keep:
+            kept_size += plotted_figure.image_size
+            continue
+        plotted_figure.image.delete(save=False)
+        plotted_figure.image = None
+        plotted_figure.image_size = None
+        plotted_figure.save(update_fields=['image', 'image_size'])
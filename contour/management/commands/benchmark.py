@@ -0,0 +1,365 @@
+"""
+Times the fit, contour and report pipeline on synthetic data sets.
+
+For every combination of data set size (BENCHMARK_N_ROWS) and number of
+dimensions (BENCHMARK_N_DIMENSIONS) a measurement file is generated,
+uploaded, fitted, and an IFORM and a highest density contour are calculated
+for the fitted model. The results can be written as JSON and compared with
+the results of an earlier run, e.g. of another commit, to catch regressions.
+"""
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from contour import plot
+from contour import settings
+from contour.compute_interface import ComputeInterface
+from contour.lazy_figures import ensure_rendered
+from contour.measurement_data import write_columnar_cache, load_columns
+from contour.models import MeasureFileModel, EnvironmentalContour, \
+    AdditionalContourOption, PlottedFigure
+from contour.persistence import save_fitted_prob_model, \
+    save_environmental_contour
+from contour.validators import validate_csv_upload
+from user.models import User
+
+VAR_NAMES = ['significant wave height [m]', 'peak period [s]',
+             'wind speed [m/s]', 'current speed [m/s]']
+VAR_SYMBOLS = ['Hs', 'Tp', 'V', 'U']
+
+# Number of rows of the synthetic measurement file, which are generated and
+# written at once.
+CSV_CHUNK_ROWS = 1000000
+
+
+def write_synthetic_csv(f, n_rows, n_dimensions, seed=0):
+    """
+    Writes a synthetic measurement file.
+
+    The first variable follows a Weibull distribution, the other variables
+    follow lognormal distributions, which depend on the first variable.
+
+    Parameters
+    ----------
+    f : file-like object,
+        The file, opened in text mode.
+    n_rows : int,
+        Number of data rows.
+    n_dimensions : int,
+        Number of variables, 2 to 4.
+    seed : int, optional
+        Seed of the random numbers. Defaults to 0.
+    """
+    random_state = np.random.RandomState(seed)
+    f.write(';'.join(VAR_NAMES[:n_dimensions]) + '\n')
+    f.write(';'.join(VAR_SYMBOLS[:n_dimensions]) + '\n')
+    for start in range(0, n_rows, CSV_CHUNK_ROWS):
+        n = min(CSV_CHUNK_ROWS, n_rows - start)
+        first = 0.1 + 2.8 * random_state.weibull(1.5, n)
+        columns = [first]
+        for i in range(1, n_dimensions):
+            sigma = 0.05 + 0.2 * np.exp(-0.3 * first)
+            mu = 0.5 + 0.2 * i + 0.6 * np.sqrt(first)
+            columns.append(random_state.lognormal(mu, sigma))
+        np.savetxt(f, np.column_stack(columns), fmt='%.4f', delimiter=';')
+
+
+def fit_settings(n_dimensions):
+    """
+    Returns the fit settings for a synthetic measurement file.
+
+    The settings have the same format as the ones of the fit form.
+
+    Parameters
+    ----------
+    n_dimensions : int,
+        Number of variables.
+
+    Returns
+    -------
+    fit_settings : dict
+    """
+    settings_ = {'title': 'benchmark',
+                 'distribution_0': 'Weibull',
+                 'width_of_intervals_0': '0.5'}
+    for i in range(1, n_dimensions):
+        settings_['distribution_%s' % i] = 'Lognormal_SigmaMu'
+        settings_['width_of_intervals_%s' % i] = '0.5'
+        settings_['shape_dependency_%s' % i] = '0exp3'
+        settings_['location_dependency_%s' % i] = '!None'
+        settings_['scale_dependency_%s' % i] = '0power3'
+    return settings_
+
+
+def _timed(stages, stage, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    stages.append({'stage': stage,
+                   'seconds': time.perf_counter() - start})
+    return result
+
+
+def run_pipeline(user, n_rows, n_dimensions, timeout=None, seed=0):
+    """
+    Runs the pipeline on a synthetic data set and times its stages.
+
+    Parameters
+    ----------
+    user : User,
+        The user, who owns the created objects.
+    n_rows : int,
+        Number of rows of the synthetic measurement file.
+    n_dimensions : int,
+        Number of variables, 2 to 4.
+    timeout : float, optional
+        The maximum time in seconds a fit or contour calculation is allowed
+        to take. Defaults to None, i.e. no limit.
+    seed : int, optional
+        Seed of the synthetic data. Defaults to 0.
+
+    Returns
+    -------
+    stages : list of dict,
+        One dict with the keys 'stage' and 'seconds' per stage. 'seconds' is
+        None if the stage was skipped.
+    """
+    stages = []
+    var_names = VAR_NAMES[:n_dimensions]
+    var_symbols = VAR_SYMBOLS[:n_dimensions]
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, 'benchmark.csv')
+        with open(path, 'w') as f:
+            write_synthetic_csv(f, n_rows, n_dimensions, seed)
+        with open(path, 'rb') as f:
+            _timed(stages, 'validate_csv_upload', validate_csv_upload,
+                   File(f, name='benchmark.csv'))
+        measure_file_model = MeasureFileModel(primary_user=user,
+                                              title='benchmark')
+        measure_file_model.save()
+        with open(path, 'rb') as f:
+            measure_file_model.measure_file.save('benchmark.csv', File(f))
+    _timed(stages, 'write_columnar_cache', write_columnar_cache,
+           measure_file_model)
+
+    fit = _timed(stages, 'fit_curves', ComputeInterface.fit_curves,
+                 mfm_item=measure_file_model,
+                 fit_settings=fit_settings(n_dimensions),
+                 var_number=n_dimensions,
+                 timeout=timeout,
+                 use_cache=False)
+    probabilistic_model = _timed(stages, 'save_fitted_prob_model',
+                                 save_fitted_prob_model, fit, 'benchmark',
+                                 var_names, var_symbols, user,
+                                 measure_file_model)
+    directory = settings.PATH_MEDIA + settings.PATH_USER_GENERATED + \
+        str(user) + '/prob_model/'
+    _timed(stages, 'plot_fit', plot.plot_fit, fit, var_names, var_symbols,
+           directory, probabilistic_model)
+    plotted_figures = PlottedFigure.objects.filter(
+        probabilistic_model=probabilistic_model)
+    _timed(stages, 'render_fit_figures',
+           lambda: [ensure_rendered(pf) for pf in plotted_figures])
+
+    contour_coordinates = _timed(
+        stages, 'iform', ComputeInterface.iform, probabilistic_model, 1.0,
+        3.0, settings.BENCHMARK_IFORM_N_STEPS, timeout=timeout)
+    limits = [(0, 2 * column.max())
+              for column in load_columns(measure_file_model)]
+    n_cells = round(settings.BENCHMARK_HDC_N_CELLS ** (1 / n_dimensions))
+    deltas = [(upper - lower) / n_cells for lower, upper in limits]
+    _timed(stages, 'hdc', ComputeInterface.hdc, probabilistic_model, 1.0,
+           3.0, limits, deltas, timeout=timeout)
+
+    environmental_contour = EnvironmentalContour(
+        primary_user=user,
+        fitting_method="",
+        contour_method="Inverse first order reliability method (IFORM)",
+        return_period=1.0,
+        state_duration=3.0,
+        probabilistic_model=probabilistic_model)
+    environmental_contour.save()
+    additional_contour_options = [
+        AdditionalContourOption(
+            option_key="Number of points on the contour",
+            option_value=settings.BENCHMARK_IFORM_N_STEPS,
+            environmental_contour=environmental_contour)]
+    _timed(stages, 'save_environmental_contour', save_environmental_contour,
+           environmental_contour, additional_contour_options,
+           contour_coordinates, str(user))
+    plotted_figure = _timed(stages, 'plot_contour', plot.plot_contour,
+                            contour_coordinates, str(user),
+                            environmental_contour, var_names)
+    _timed(stages, 'render_contour', ensure_rendered, plotted_figure)
+    if shutil.which('pdflatex') is None:
+        stages.append({'stage': 'create_latex_report', 'seconds': None})
+    else:
+        _timed(stages, 'create_latex_report', plot.create_latex_report,
+               contour_coordinates, str(user), environmental_contour,
+               var_names, var_symbols)
+    return stages
+
+
+def _git_commit():
+    try:
+        process = subprocess.run(['git', 'rev-parse', 'HEAD'],
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+    except OSError:
+        return None
+    if process.returncode != 0:
+        return None
+    return process.stdout.strip()
+
+
+def run_benchmark(n_rows=settings.BENCHMARK_N_ROWS,
+                  n_dimensions=settings.BENCHMARK_N_DIMENSIONS,
+                  timeout=None, seed=0):
+    """
+    Runs the pipeline for all data set sizes and numbers of dimensions.
+
+    The objects are created for the user BENCHMARK_USER_NAME, who is deleted
+    afterwards together with the objects and their files.
+
+    Parameters
+    ----------
+    n_rows : list of int, optional
+        Sizes of the data sets. Defaults to BENCHMARK_N_ROWS.
+    n_dimensions : list of int, optional
+        Numbers of dimensions. Defaults to BENCHMARK_N_DIMENSIONS.
+    timeout : float, optional
+        The maximum time in seconds a fit or contour calculation is allowed
+        to take. Defaults to None, i.e. no limit.
+    seed : int, optional
+        Seed of the synthetic data. Defaults to 0.
+
+    Returns
+    -------
+    run : dict,
+        Has the keys 'commit', 'created', 'python', 'numpy' and 'results'.
+        'results' holds one dict per data set with the keys 'n_rows',
+        'n_dimensions' and 'stages' (see run_pipeline()).
+    """
+    if User.objects.filter(username=settings.BENCHMARK_USER_NAME).exists():
+        raise CommandError('The user "{}" exists already. The benchmark '
+                           'would delete it.'.format(
+                               settings.BENCHMARK_USER_NAME))
+    user = User.objects.create_user(username=settings.BENCHMARK_USER_NAME)
+    results = []
+    try:
+        for rows in n_rows:
+            for dimensions in n_dimensions:
+                stages = run_pipeline(user, rows, dimensions, timeout, seed)
+                results.append({'n_rows': rows,
+                                'n_dimensions': dimensions,
+                                'stages': stages})
+    finally:
+        user.delete()
+        shutil.rmtree(settings.PATH_MEDIA + settings.PATH_USER_GENERATED +
+                      settings.BENCHMARK_USER_NAME, ignore_errors=True)
+    return {'commit': _git_commit(),
+            'created': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'results': results}
+
+
+def find_regressions(run, baseline,
+                     tolerance=settings.BENCHMARK_REGRESSION_TOLERANCE):
+    """
+    Compares a benchmark run with a baseline run.
+
+    Parameters
+    ----------
+    run : dict,
+        The benchmark run, see run_benchmark().
+    baseline : dict,
+        An earlier benchmark run.
+    tolerance : float, optional
+        A stage is reported if it took more than (1 + tolerance) times as
+        long as in the baseline. Defaults to BENCHMARK_REGRESSION_TOLERANCE.
+
+    Returns
+    -------
+    regressions : list of dict,
+        One dict per slower stage with the keys 'n_rows', 'n_dimensions',
+        'stage', 'seconds' and 'baseline_seconds'.
+    """
+    baseline_seconds = {}
+    for result in baseline['results']:
+        for stage in result['stages']:
+            baseline_seconds[(result['n_rows'], result['n_dimensions'],
+                              stage['stage'])] = stage['seconds']
+    regressions = []
+    for result in run['results']:
+        for stage in result['stages']:
+            key = (result['n_rows'], result['n_dimensions'], stage['stage'])
+            seconds = baseline_seconds.get(key)
+            if seconds is None or stage['seconds'] is None:
+                continue
+            if stage['seconds'] > (1 + tolerance) * seconds:
+                regressions.append({'n_rows': result['n_rows'],
+                                    'n_dimensions': result['n_dimensions'],
+                                    'stage': stage['stage'],
+                                    'seconds': stage['seconds'],
+                                    'baseline_seconds': seconds})
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Times the fit, contour and report pipeline on synthetic data.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+',
+                            default=settings.BENCHMARK_N_ROWS,
+                            help='Sizes of the data sets. Defaults to '
+                                 'BENCHMARK_N_ROWS.')
+        parser.add_argument('--dimensions', type=int, nargs='+',
+                            default=settings.BENCHMARK_N_DIMENSIONS,
+                            choices=[2, 3, 4],
+                            help='Numbers of dimensions. Defaults to '
+                                 'BENCHMARK_N_DIMENSIONS.')
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='Maximum time of a fit or contour '
+                                 'calculation in seconds.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the synthetic data.')
+        parser.add_argument('--output',
+                            help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline',
+                            help='JSON file of an earlier run. The command '
+                                 'fails if a stage got slower.')
+
+    def handle(self, *args, **options):
+        run = run_benchmark(options['rows'], options['dimensions'],
+                            options['timeout'], options['seed'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(run, f, indent=2)
+        for result in run['results']:
+            self.stdout.write('{} rows, {} dimensions'.format(
+                result['n_rows'], result['n_dimensions']))
+            for stage in result['stages']:
+                if stage['seconds'] is None:
+                    self.stdout.write('  {}: skipped'.format(stage['stage']))
+                else:
+                    self.stdout.write('  {}: {:.3f} s'.format(
+                        stage['stage'], stage['seconds']))
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = find_regressions(run, baseline)
+            if regressions:
+                raise CommandError('\n'.join(
+                    '{stage} ({n_rows} rows, {n_dimensions} dimensions): '
+                    '{seconds:.3f} s instead of {baseline_seconds:.3f} s'
+                    .format(**regression) for regression in regressions))
@@ -0,0 +1,44 @@
+"""
+Worker, which executes queued fits and contour calculations.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from contour.jobs import claim_next_job, run_job, requeue_stale_jobs
+from contour.settings import MAX_COMPUTING_TIME_QUEUED, \
+    COMPUTE_WORKER_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = 'Executes queued fits and contour calculations (ComputeJobs).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Stop when the queue is empty.')
+        parser.add_argument('--sleep', type=float,
+                            default=COMPUTE_WORKER_POLL_INTERVAL,
+                            help='Seconds to wait if the queue is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            # Long running workers must not keep stale data base connections.
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                # Jobs of workers, which stopped, are queued again.
+                n_requeued, n_failed = requeue_stale_jobs()
+                if n_requeued or n_failed:
+                    self.stdout.write(
+                        'Queued {} abandoned jobs again, {} failed.'.format(
+                            n_requeued, n_failed))
+                    continue
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            self.stdout.write('Running job {} ({}).'.format(job.pk, job.kind))
+            job = run_job(job, MAX_COMPUTING_TIME_QUEUED)
+            self.stdout.write('Job {} finished with status {}.'.format(
+                job.pk, job.status))
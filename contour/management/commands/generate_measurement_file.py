@@ -0,0 +1,39 @@
+"""
+Writes a synthetic measurement file, which is sampled from a probabilistic
+model, e.g. to test the app with large inputs.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from contour.models import ProbabilisticModel
+from contour.settings import SYNTHETIC_DATA_BATCH_SIZE
+from contour.synthetic_data import write_measurement_file
+
+
+class Command(BaseCommand):
+    help = 'Samples a measurement file from a stored probabilistic model.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('probabilistic_model', type=int,
+                            help='Primary key of the probabilistic model.')
+        parser.add_argument('n_samples', type=int,
+                            help='Number of samples, i.e. data rows.')
+        parser.add_argument('output', help='Path of the csv file.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random numbers.')
+        parser.add_argument('--batch-size', type=int,
+                            default=SYNTHETIC_DATA_BATCH_SIZE,
+                            help='Number of samples, which are drawn at '
+                                 'once. Defaults to '
+                                 'SYNTHETIC_DATA_BATCH_SIZE.')
+
+    def handle(self, *args, **options):
+        try:
+            probabilistic_model = ProbabilisticModel.objects.get(
+                pk=options['probabilistic_model'])
+        except ProbabilisticModel.DoesNotExist:
+            raise CommandError('Probabilistic model {} does not exist.'.format(
+                options['probabilistic_model']))
+        with open(options['output'], 'w') as f:
+            write_measurement_file(f, probabilistic_model,
+                                   options['n_samples'], options['seed'],
+                                   options['batch_size'])
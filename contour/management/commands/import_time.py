@@ -0,0 +1,96 @@
+"""
+Measures how long it takes to import modules, e.g. when a web worker boots.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contour.settings import IMPORT_TIME_MODULES, HEAVY_MODULES
+
+# Runs in a fresh interpreter such that no module is imported already.
+MEASURE_SCRIPT = '''
+import importlib
+import json
+import sys
+import time
+
+import django
+django.setup()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({'seconds': seconds,
+                  'heavy_modules': [name for name in sys.argv[2:]
+                                    if name in sys.modules]}))
+'''
+
+
+def measure_import_time(module, heavy_modules=HEAVY_MODULES):
+    """
+    Imports a module in a new Python process and measures the time it takes.
+
+    Django is set up before the measurement starts.
+
+    Parameters
+    ----------
+    module : str,
+        The module's name, e.g. 'contour.views'.
+    heavy_modules : list of str, optional
+        Modules, which are checked whether they were imported as well.
+        Defaults to HEAVY_MODULES.
+
+    Returns
+    -------
+    measurement : dict,
+        Has the keys 'seconds' (the import time) and 'heavy_modules' (the
+        heavy modules, which were imported).
+    """
+    environment = dict(os.environ)
+    environment.setdefault('DJANGO_SETTINGS_MODULE', 'viroconweb.settings')
+    process = subprocess.run(
+        [sys.executable, '-c', MEASURE_SCRIPT, module] + list(heavy_modules),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=environment,
+        universal_newlines=True)
+    if process.returncode != 0:
+        raise CommandError('Importing {} failed:\n{}'.format(
+            module, process.stderr))
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+class Command(BaseCommand):
+    help = 'Measures the import time of the modules a web worker loads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modules', nargs='*', default=IMPORT_TIME_MODULES,
+                            help='Modules to import. Defaults to '
+                                 'IMPORT_TIME_MODULES.')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Number of measurements per module. The '
+                                 'median is reported.')
+        parser.add_argument('--json', action='store_true',
+                            help='Write the results as JSON, e.g. to track '
+                                 'them over time.')
+
+    def handle(self, *args, **options):
+        results = []
+        for module in options['modules']:
+            measurements = [measure_import_time(module)
+                            for _ in range(options['repeat'])]
+            results.append({
+                'module': module,
+                'seconds': statistics.median(
+                    [m['seconds'] for m in measurements]),
+                'heavy_modules': measurements[0]['heavy_modules']})
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write('{}: {:.3f} s'.format(result['module'],
+                                                     result['seconds']))
+            if result['heavy_modules']:
+                self.stdout.write('  imports heavy modules: {}'.format(
+                    ', '.join(result['heavy_modules'])))
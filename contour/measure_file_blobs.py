@@ -0,0 +1,201 @@
+"""
+Content-addressed storage of measurement files.
+
+Users often upload the same file multiple times, e.g. a hindcast under
+different titles. Consequently, each content is stored only once as
+MeasureFileBlob, whose file is named by the content's SHA-256. The hash is
+computed while the upload is read. MeasureFileModels with the same content
+refer to the same blob, which counts them. The blob is deleted together with
+its last MeasureFileModel.
+
+Data derived from the content is shared as well: The columnar cache (see
+measurement_data.py) is stored per blob, and the metadata and statistics of a
+MeasureFileModel are copied from another MeasureFileModel with the same
+content. Fits are cached by the content's hash anyway (see fit_cache.py).
+"""
+import hashlib
+import os
+import shutil
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import MeasureFileBlob, MeasureFileModel
+from .settings import MEASURE_FILE_BLOB_CACHE_DIRECTORY
+
+# The fields of a MeasureFileModel, which only depend on the file's content.
+DERIVED_FIELDS = ('var_names', 'var_symbols', 'n_rows', 'n_columns',
+                  'column_dtypes', 'statistics')
+
+
+def blob_cache_directory(sha256):
+    """
+    Returns the directory of the data derived from a content, e.g. of the
+    columnar cache.
+
+    Parameters
+    ----------
+    sha256 : str,
+        The hex digest of the content.
+
+    Returns
+    -------
+    directory : str
+    """
+    return MEASURE_FILE_BLOB_CACHE_DIRECTORY + sha256
+
+
+def upload_sha256(uploaded_file):
+    """
+    Computes the SHA-256 and the size of an uploaded file.
+
+    The file is read in chunks, such that the memory needed does not depend
+    on the file size.
+
+    Parameters
+    ----------
+    uploaded_file : File,
+        The uploaded file, e.g. an UploadedFile.
+
+    Returns
+    -------
+    sha256 : str,
+        The hex digest.
+    size : int,
+        The size in bytes.
+    """
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in uploaded_file.chunks():
+        sha256.update(chunk)
+        size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def store_measure_file(uploaded_file):
+    """
+    Stores the content of an uploaded measurement file unless it is stored
+    already.
+
+    The reference count of the returned blob includes the MeasureFileModel,
+    which is going to refer to it. Thus, the model should be saved in the
+    same transaction, see save_measure_file_model().
+
+    Parameters
+    ----------
+    uploaded_file : File,
+        The uploaded file, e.g. an UploadedFile.
+
+    Returns
+    -------
+    blob : MeasureFileBlob,
+        The stored content.
+    created : bool,
+        True if the content was not stored before.
+    """
+    sha256, size = upload_sha256(uploaded_file)
+    while True:
+        if MeasureFileBlob.objects.filter(sha256=sha256).update(
+                refcount=F('refcount') + 1):
+            return MeasureFileBlob.objects.get(sha256=sha256), False
+        blob = MeasureFileBlob(sha256=sha256, size=size)
+        blob.file.save(os.path.basename(uploaded_file.name), uploaded_file,
+                       save=False)
+        try:
+            with transaction.atomic():
+                blob.save()
+            return blob, True
+        except IntegrityError:
+            # Another upload stored the same content in the mean time.
+            blob.file.delete(save=False)
+
+
+def save_measure_file_model(measure_file_model, uploaded_file):
+    """
+    Stores the content of an uploaded measurement file and saves the
+    MeasureFileModel, which refers to it.
+
+    The blob's reference count is incremented and the model is saved in one
+    transaction. Thus, if saving the model fails, the count is not
+    incremented and a content, which was stored for this upload, is deleted.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The unsaved measurement file model. Its blob and file are set here.
+    uploaded_file : File,
+        The uploaded file, e.g. an UploadedFile.
+
+    Returns
+    -------
+    created : bool,
+        True if the content was not stored before.
+    """
+    stored_blob = None
+    try:
+        with transaction.atomic():
+            blob, created = store_measure_file(uploaded_file)
+            if created:
+                stored_blob = blob
+            measure_file_model.blob = blob
+            measure_file_model.measure_file = blob.file.name
+            measure_file_model.save()
+    except BaseException:
+        # The blob's row was rolled back, but not its file.
+        if stored_blob is not None:
+            stored_blob.file.delete(save=False)
+        raise
+    return created
+
+
+def copy_derived_data(measure_file_model):
+    """
+    Copies the metadata and the statistics from another MeasureFileModel
+    with the same content.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model, which refers to a blob.
+
+    Returns
+    -------
+    copied : bool,
+        False if no other MeasureFileModel with the same content has
+        statistics.
+    """
+    values = MeasureFileModel.objects.filter(
+        blob_id=measure_file_model.blob_id).exclude(
+        pk=measure_file_model.pk).exclude(statistics='').values(
+        *DERIVED_FIELDS).first()
+    if values is None:
+        return False
+    for field, value in values.items():
+        setattr(measure_file_model, field, value)
+    measure_file_model.save(update_fields=DERIVED_FIELDS)
+    return True
+
+
+def release_blob(blob_pk):
+    """
+    Decrements the reference count of a blob and deletes the blob, its file
+    and its derived data if it is not referred to anymore.
+
+    Parameters
+    ----------
+    blob_pk : int,
+        Primary key of the MeasureFileBlob.
+    """
+    MeasureFileBlob.objects.filter(pk=blob_pk).update(
+        refcount=F('refcount') - 1)
+    blob = MeasureFileBlob.objects.filter(pk=blob_pk,
+                                          refcount__lte=0).first()
+    if blob is None:
+        return
+    # The row is only deleted if no upload referred to the blob in the mean
+    # time. Later uploads of the same content store it again.
+    n_deleted = MeasureFileBlob.objects.filter(pk=blob_pk,
+                                               refcount__lte=0).delete()[0]
+    if n_deleted:
+        blob.file.delete(save=False)
+        shutil.rmtree(blob_cache_directory(blob.sha256), ignore_errors=True)
@@ -0,0 +1,469 @@
+"""
+Binary columnar cache of measurement files.
+
+Parsing a large measurement file (csv) is slow. Consequently, when a
+measurement file is uploaded, each of its columns is written once as a
+float64 .npy file together with a small manifest, which holds the header.
+Fits and plots memory-map these files instead of parsing the csv file again.
+
+The manifest also holds the SHA-256 of the csv file, which identifies the
+measured data, e.g. for the fit cache (see fit_cache.py). Files, which are
+stored once per content (see measure_file_blobs.py), share their columnar
+cache.
+
+The header, the numbers of rows and columns and the columns' data types are
+also stored in the MeasureFileModel such that views read them from the data
+base instead of opening the file. A column's data type is 'int64' if none of
+its values has a decimal separator and 'float64' otherwise. Its values are
+stored as float64 in both cases.
+
+The csv file stays the source of record. If the columnar cache is missing,
+e.g. because the server's file system is ephemeral, it is rebuilt from the
+csv file on first access.
+
+pandas is slow to import and only needed to parse the csv file. Thus, it is
+imported by the functions, which parse the csv file.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from . import settings
+from .measure_file_blobs import blob_cache_directory
+from .media import open_media, read_media_head
+from .settings import NR_LINES_HEADER, HEADER_READ_SIZE, CSV_READ_CHUNK_SIZE, \
+    COLUMNAR_CACHE_DIRECTORY_NAME, COLUMNAR_CACHE_MANIFEST_NAME
+
+# Memory-mapped columns are always stored as little-endian float64.
+COLUMN_DTYPE = '<f8'
+
+# Number of bytes, which are read at once when a file is hashed.
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def open_measure_file(measure_file_model):
+    """
+    Opens a measurement file through the media access layer (see media.py).
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    f : file-like object,
+        The csv file opened in binary mode.
+    """
+    field_file = measure_file_model.measure_file
+    return open_media(field_file.name, field_file.storage)
+
+
+def columnar_cache_directory(measure_file_model):
+    """
+    Returns the directory where the columnar cache of a measurement file is
+    stored.
+
+    If the file's content is shared (see measure_file_blobs.py), the
+    directory belongs to the content and gets deleted together with it.
+    Otherwise, the directory is located in the measurement file's static
+    directory such that it gets deleted together with the MeasureFileModel.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    directory : str
+    """
+    if measure_file_model.blob_id is not None:
+        directory = blob_cache_directory(measure_file_model.blob.sha256)
+    elif measure_file_model.path_of_statics:
+        directory = measure_file_model.path_of_statics
+    else:
+        directory = settings.PATH_MEDIA + \
+                    settings.PATH_USER_GENERATED + \
+                    str(measure_file_model.primary_user) + \
+                    '/measurement/' + str(measure_file_model.pk)
+    return directory + '/' + COLUMNAR_CACHE_DIRECTORY_NAME
+
+
+def read_header(data_path):
+    """
+    Reads the variable names and symbols from the header of a measurement file.
+
+    Parameters
+    ----------
+    data_path : str or file-like object,
+        Path of the measurement file or the opened file.
+
+    Returns
+    -------
+    var_names : list of str,
+        Names of the variables, e.g. ['significant wave height [m]', ...].
+    var_symbols : list of str,
+        Symbols of the variables, e.g. ['Hs', ...].
+    """
+    import pandas as pd
+
+    header = pd.read_csv(data_path, sep=';', header=None,
+                         nrows=NR_LINES_HEADER, dtype=str)
+    var_names = header.iloc[0].tolist()
+    var_symbols = header.iloc[1].tolist()
+    return var_names, var_symbols
+
+
+def file_sha256(measure_file_model, chunk_size=HASH_CHUNK_SIZE):
+    """
+    Computes the SHA-256 of a measurement file's content.
+
+    The file is read through the media access layer, i.e. from the local file
+    system or from the local copy of a file on S3, in chunks of chunk_size
+    bytes.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+    chunk_size : int, optional
+        Number of bytes read at once.
+
+    Returns
+    -------
+    sha256 : str,
+        The hex digest.
+    """
+    sha256 = hashlib.sha256()
+    with open_measure_file(measure_file_model) as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def content_sha256(measure_file_model):
+    """
+    Returns the SHA-256 of a measurement file's content.
+
+    The hash of a shared content was computed at upload. Otherwise, it is
+    computed from the file (see file_sha256()).
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    sha256 : str,
+        The hex digest.
+    """
+    if measure_file_model.blob_id is not None:
+        return measure_file_model.blob.sha256
+    return file_sha256(measure_file_model)
+
+
+def _replace_directory(source, destination):
+    """
+    Moves a directory to the place of another directory.
+
+    A directory can only be renamed to the name of an empty one. Thus, an
+    existing destination is moved aside first and deleted afterwards.
+    Meanwhile, the destination does not exist, but it never holds a mixture
+    of old and new files.
+
+    Parameters
+    ----------
+    source : str,
+        The directory, which should be moved.
+    destination : str,
+        The directory, which should be replaced.
+    """
+    while True:
+        try:
+            os.replace(source, destination)
+            return
+        except OSError:
+            if not os.path.isdir(destination):
+                raise
+        old = tempfile.mkdtemp(dir=os.path.dirname(destination),
+                               prefix='.old-')
+        try:
+            os.replace(destination, old)
+        except FileNotFoundError:
+            # Another process moved the destination aside in the mean time.
+            pass
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _parse_values(chunk):
+    """
+    Converts a chunk of a measurement file's body to float64 values.
+
+    The validator (see validators.validate_csv_upload()) accepts a comma and
+    a point as decimal separator, even mixed within a file. Thus, the values
+    are read as strings and commas are replaced before the conversion.
+    """
+    return chunk.replace(',', '.', regex=True).values.astype(np.float64)
+
+
+def _has_decimal_separator(chunk):
+    """
+    Returns for each column of a chunk of a measurement file's body whether
+    one of its values has a decimal separator. The validator only accepts
+    digits and a single separator, thus the other columns hold integers.
+    """
+    return np.array([chunk[column].str.contains(r'[\.,]').any()
+                     for column in chunk.columns], dtype=bool)
+
+
+def write_columnar_cache(measure_file_model):
+    """
+    Converts a measurement file to one float64 .npy file per column.
+
+    The csv file is parsed in chunks of CSV_READ_CHUNK_SIZE rows, such that
+    the memory needed for the conversion does not depend on the file size.
+    The cache is written to a temporary directory, which replaces the
+    existing cache when it is complete. Thus, concurrent readers never see
+    partially written files.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model, which should be converted.
+
+    Returns
+    -------
+    manifest : dict,
+        Describes the columnar cache. It has the keys 'var_names',
+        'var_symbols', 'n_rows', 'dtype', 'columns' (file names of the
+        .npy files), 'column_dtypes' (data types of the csv file's columns)
+        and 'sha256' (of the csv file).
+    """
+    cache_directory = columnar_cache_directory(measure_file_model)
+    parent_directory = os.path.dirname(cache_directory)
+    if not os.path.exists(parent_directory):
+        os.makedirs(parent_directory, exist_ok=True)
+    directory = tempfile.mkdtemp(dir=parent_directory, prefix='.new-')
+    try:
+        manifest = _write_columns(measure_file_model, directory)
+        _replace_directory(directory, cache_directory)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    save_metadata(measure_file_model, manifest)
+    return manifest
+
+
+def _write_columns(measure_file_model, directory):
+    """
+    Writes the columns and the manifest of a measurement file's columnar
+    cache to a directory, see write_columnar_cache().
+    """
+    import pandas as pd
+
+    data_file = open_measure_file(measure_file_model)
+    var_names, var_symbols = read_header(data_file)
+    data_file.seek(0)
+    n_columns = len(var_names)
+
+    # The rows are first appended as raw float64 values to temporary files.
+    # When the number of rows is known, the .npy header is written and the
+    # raw values are copied behind it.
+    n_rows = 0
+    is_integer = np.ones(n_columns, dtype=bool)
+    with tempfile.TemporaryDirectory(dir=directory) as tempdir:
+        raw_files = [open(os.path.join(tempdir, str(i)), 'wb')
+                     for i in range(n_columns)]
+        try:
+            # For some reason here the header parameter must be the number of
+            # lines of the header - 1, see issue #20.
+            reader = pd.read_csv(data_file, sep=';',
+                                 header=NR_LINES_HEADER-1,
+                                 dtype=str,
+                                 chunksize=CSV_READ_CHUNK_SIZE)
+            for chunk in reader:
+                values = _parse_values(chunk)
+                is_integer &= ~_has_decimal_separator(chunk)
+                for i in range(n_columns):
+                    raw_files[i].write(
+                        np.ascontiguousarray(
+                            values[:, i], dtype=COLUMN_DTYPE).tobytes())
+                n_rows += values.shape[0]
+        finally:
+            data_file.close()
+            for raw_file in raw_files:
+                raw_file.close()
+
+        column_files = []
+        for i in range(n_columns):
+            column_file = 'column_' + str(i).zfill(2) + '.npy'
+            with open(os.path.join(directory, column_file), 'wb') as npy, \
+                    open(os.path.join(tempdir, str(i)), 'rb') as raw:
+                np.lib.format.write_array_header_1_0(
+                    npy, {'descr': COLUMN_DTYPE,
+                          'fortran_order': False,
+                          'shape': (n_rows, )})
+                shutil.copyfileobj(raw, npy)
+            column_files.append(column_file)
+
+    manifest = {'var_names': var_names,
+                'var_symbols': var_symbols,
+                'n_rows': n_rows,
+                'dtype': COLUMN_DTYPE,
+                'columns': column_files,
+                'column_dtypes': ['int64' if integer else 'float64'
+                                  for integer in is_integer],
+                'sha256': content_sha256(measure_file_model)}
+    with open(os.path.join(directory, COLUMNAR_CACHE_MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def save_metadata(measure_file_model, manifest):
+    """
+    Stores the metadata of a measurement file in its MeasureFileModel.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+    manifest : dict,
+        The manifest of the file's columnar cache, see write_columnar_cache().
+    """
+    measure_file_model.var_names = json.dumps(manifest['var_names'])
+    measure_file_model.var_symbols = json.dumps(manifest['var_symbols'])
+    measure_file_model.n_rows = manifest['n_rows']
+    measure_file_model.n_columns = len(manifest['columns'])
+    measure_file_model.column_dtypes = json.dumps(manifest['column_dtypes'])
+    measure_file_model.save(update_fields=['var_names', 'var_symbols',
+                                           'n_rows', 'n_columns',
+                                           'column_dtypes'])
+
+
+def parse_header(head):
+    """
+    Parses the header of a measurement file.
+
+    Parameters
+    ----------
+    head : bytes,
+        The beginning of the file, which holds at least the header.
+
+    Returns
+    -------
+    var_names : list of str,
+        Names of the variables, e.g. ['significant wave height [m]', ...].
+    var_symbols : list of str,
+        Symbols of the variables, e.g. ['Hs', ...].
+    """
+    lines = head.decode('utf-8', errors='replace').splitlines()
+    rows = list(csv.reader(lines[:NR_LINES_HEADER], delimiter=';'))
+    return rows[0], rows[1]
+
+
+def read_metadata(measure_file_model):
+    """
+    Returns the variable names and symbols of a measurement file.
+
+    They are read from the MeasureFileModel. For files uploaded by older
+    versions, the metadata is taken from the columnar cache's manifest if the
+    cache exists. Otherwise, only the beginning of the file is read (see
+    media.read_media_head()) and the header is stored. The number of rows and
+    the columns' data types are then stored when the cache is built.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    var_names : list of str,
+        Names of the variables, e.g. ['significant wave height [m]', ...].
+    var_symbols : list of str,
+        Symbols of the variables, e.g. ['Hs', ...].
+    """
+    if not measure_file_model.var_names or measure_file_model.n_rows is None:
+        manifest = _read_cached_manifest(measure_file_model)
+    else:
+        manifest = None
+    if manifest is not None:
+        save_metadata(measure_file_model, manifest)
+    elif not measure_file_model.var_names:
+        field_file = measure_file_model.measure_file
+        var_names, var_symbols = parse_header(read_media_head(
+            field_file.name, HEADER_READ_SIZE, field_file.storage))
+        measure_file_model.var_names = json.dumps(var_names)
+        measure_file_model.var_symbols = json.dumps(var_symbols)
+        measure_file_model.n_columns = len(var_names)
+        measure_file_model.save(update_fields=['var_names', 'var_symbols',
+                                               'n_columns'])
+    return (json.loads(measure_file_model.var_names),
+            json.loads(measure_file_model.var_symbols))
+
+
+def read_manifest(measure_file_model):
+    """
+    Reads the manifest of a measurement file's columnar cache.
+
+    The cache is (re)built from the csv file if it does not exist or if it
+    was written by an older version, which did not store all keys.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    manifest : dict,
+        See write_columnar_cache().
+    """
+    manifest = _read_cached_manifest(measure_file_model)
+    if manifest is None:
+        return write_columnar_cache(measure_file_model)
+    return manifest
+
+
+def _read_cached_manifest(measure_file_model):
+    """
+    Reads the manifest of a measurement file's columnar cache without
+    building the cache. Returns None if the cache does not exist or if it was
+    written by an older version, which did not store all keys.
+    """
+    manifest_path = os.path.join(columnar_cache_directory(measure_file_model),
+                                 COLUMNAR_CACHE_MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+    if 'sha256' not in manifest or 'column_dtypes' not in manifest:
+        return None
+    return manifest
+
+
+def load_columns(measure_file_model):
+    """
+    Returns the columns of a measurement file as memory-mapped arrays.
+
+    Parameters
+    ----------
+    measure_file_model : MeasureFileModel,
+        The measurement file model.
+
+    Returns
+    -------
+    columns : list of numpy.ndarray,
+        One read-only, memory-mapped float64 array per variable.
+    """
+    manifest = read_manifest(measure_file_model)
+    directory = columnar_cache_directory(measure_file_model)
+    return [np.load(os.path.join(directory, column_file), mmap_mode='r')
+            for column_file in manifest['columns']]
@@ -0,0 +1,219 @@
+"""
+Reads media files, e.g. measurement files and figures, through Django's
+storage API.
+
+Files of a local storage are read from the file system. Files of a remote
+storage, e.g. Amazon S3, are downloaded once and then kept in a size limited
+cache on the local file system (see disk_cache.py). Thus, repeated fits,
+plots and reports of the same file do not download it again. Stored files
+are not changed under the same name (a storage gives a new file an unused
+name), consequently the storage and the name identify the content. The
+SHA-256 of a file is cached with it and a cached file is only used if its
+content still matches the hash.
+
+RemoteFileSystemStorage is a storage on the local file system, which
+behaves like a remote storage. It is used to test the cache without network
+access.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.storage import default_storage, FileSystemStorage, \
+    Storage
+
+from .disk_cache import DiskLRUCache
+from .settings import MEDIA_CACHE_DIRECTORY, MEDIA_CACHE_MAX_SIZE_IN_MIB
+from .timing import stage
+
+_cache = DiskLRUCache(MEDIA_CACHE_DIRECTORY,
+                      MEDIA_CACHE_MAX_SIZE_IN_MIB * 1024 * 1024)
+
+
+def _local_path(name, storage):
+    # Remote storages do not support absolute paths.
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def _cache_key(name, storage):
+    # The bucket and the location distinguish storages of the same class,
+    # e.g. two buckets on Amazon S3.
+    identity = ':'.join([type(storage).__module__ + '.' +
+                         type(storage).__name__,
+                         str(getattr(storage, 'bucket_name', '')),
+                         str(getattr(storage, 'location', '')),
+                         name])
+    return hashlib.sha256(identity.encode('utf-8')).hexdigest()
+
+
+def read_media(name, storage=None, sha256=None):
+    """
+    Reads a media file.
+
+    Parameters
+    ----------
+    name : str,
+        The file's name in the storage, e.g. FieldFile.name.
+    storage : Storage, optional
+        The storage, e.g. FieldFile.storage. Defaults to default_storage.
+    sha256 : str, optional
+        The expected SHA-256 of the file's content. If it is given, a cached
+        copy is only used if it matches and a downloaded file, which does
+        not match, raises an IOError.
+
+    Returns
+    -------
+    content : bytes
+    """
+    storage = storage or default_storage
+    if _local_path(name, storage) is not None:
+        with storage.open(name, 'rb') as f:
+            return f.read()
+    key = _cache_key(name, storage)
+    content = _cache.get(key)
+    cached_sha256 = _cache.get(key + '.sha256')
+    if content is not None and cached_sha256 is not None:
+        content_sha256 = hashlib.sha256(content).hexdigest()
+        if content_sha256 == cached_sha256.decode('ascii') and \
+                sha256 in (None, content_sha256):
+            return content
+    with stage('media_download'):
+        with storage.open(name, 'rb') as f:
+            content = f.read()
+    content_sha256 = hashlib.sha256(content).hexdigest()
+    if sha256 is not None and content_sha256 != sha256:
+        raise IOError('The content of the media file ' + name + ' does not '
+                      'match its SHA-256.')
+    _cache.set(key + '.sha256', content_sha256.encode('ascii'))
+    _cache.set(key, content)
+    return content
+
+
+def open_media(name, storage=None, sha256=None):
+    """
+    Opens a media file for reading.
+
+    Parameters
+    ----------
+    name : str,
+        The file's name in the storage, e.g. FieldFile.name.
+    storage : Storage, optional
+        The storage, e.g. FieldFile.storage. Defaults to default_storage.
+    sha256 : str, optional
+        The expected SHA-256 of the file's content, see read_media().
+
+    Returns
+    -------
+    f : file-like object,
+        The file opened in binary mode. It can be used as context manager.
+    """
+    storage = storage or default_storage
+    if _local_path(name, storage) is not None and sha256 is None:
+        return storage.open(name, 'rb')
+    return io.BytesIO(read_media(name, storage, sha256))
+
+
+def read_media_head(name, n_bytes, storage=None):
+    """
+    Reads the beginning of a media file without downloading the whole file.
+
+    Parameters
+    ----------
+    name : str,
+        The file's name in the storage, e.g. FieldFile.name.
+    n_bytes : int,
+        Number of bytes, which are read. Less bytes are returned if the file
+        is shorter.
+    storage : Storage, optional
+        The storage, e.g. FieldFile.storage. Defaults to default_storage.
+
+    Returns
+    -------
+    head : bytes
+    """
+    storage = storage or default_storage
+    if _local_path(name, storage) is None:
+        content = _cache.get(_cache_key(name, storage))
+        if content is not None:
+            return content[:n_bytes]
+        if hasattr(storage, 'bucket'):
+            # Files of django-storages' S3Boto3Storage are downloaded
+            # completely when they are opened. A ranged request only
+            # transfers the requested bytes.
+            key = storage._normalize_name(storage._clean_name(name))
+            with stage('media_download'):
+                response = storage.bucket.Object(key).get(
+                    Range='bytes=0-{}'.format(n_bytes - 1))
+                return response['Body'].read()
+    with storage.open(name, 'rb') as f:
+        return f.read(n_bytes)
+
+
+def local_media_path(name, path, storage=None):
+    """
+    Returns a path on the local file system, where a media file can be read.
+
+    Files of a local storage are not copied. Files of a remote storage are
+    written to the given path, e.g. for pdflatex, which needs local files.
+
+    Parameters
+    ----------
+    name : str,
+        The file's name in the storage, e.g. FieldFile.name.
+    path : str,
+        The path the file is written to if the storage is remote.
+    storage : Storage, optional
+        The storage, e.g. FieldFile.storage. Defaults to default_storage.
+
+    Returns
+    -------
+    path : str
+    """
+    storage = storage or default_storage
+    local_path = _local_path(name, storage)
+    if local_path is not None:
+        return local_path
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(read_media(name, storage))
+    return path
+
+
+class RemoteFileSystemStorage(Storage):
+    """
+    A storage on the local file system, which does not provide absolute
+    paths like a remote storage, e.g. Amazon S3.
+    """
+
+    def __init__(self, location=None, base_url=None):
+        self._storage = FileSystemStorage(location, base_url)
+
+    @property
+    def location(self):
+        return self._storage.location
+
+    def _open(self, name, mode='rb'):
+        return self._storage._open(name, mode)
+
+    def _save(self, name, content):
+        return self._storage._save(name, content)
+
+    def delete(self, name):
+        self._storage.delete(name)
+
+    def exists(self, name):
+        return self._storage.exists(name)
+
+    def listdir(self, path):
+        return self._storage.listdir(path)
+
+    def size(self, name):
+        return self._storage.size(name)
+
+    def url(self, name):
+        return self._storage.url(name)
@@ -0,0 +1,218 @@
+"""
+Collects metrics and exports them in the Prometheus text format.
+
+The metrics are counters and histograms, e.g. of the duration of fits and
+contour calculations. Their values are stored in the data base (MetricValue)
+such that the values of all web and worker processes are aggregated without
+an external service. The view views.metrics serves them at /metrics.
+
+A histogram stores one row per bucket, which counts the observations in the
+bucket, and one row with the sum of the observations. The cumulative bucket
+counts and the number of observations are computed when the metrics are
+exported.
+"""
+from collections import OrderedDict
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+
+from .models import MetricValue, ComputeJob
+from .settings import COLLECT_METRICS, METRICS_DURATION_BUCKETS, \
+    METRICS_QUERY_COUNT_BUCKETS
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+# The exported metrics: name -> (type, help, buckets of histograms).
+METRICS = OrderedDict([
+    ('viroconweb_fit_duration_seconds',
+     (HISTOGRAM, 'Duration of fits.', METRICS_DURATION_BUCKETS)),
+    ('viroconweb_contour_duration_seconds',
+     (HISTOGRAM, 'Duration of contour calculations.',
+      METRICS_DURATION_BUCKETS)),
+    ('viroconweb_compute_timeouts_total',
+     (COUNTER, 'Fits and contour calculations, which took too long.', None)),
+    ('viroconweb_figures_rendered_total',
+     (COUNTER, 'Rendered figures.', None)),
+    ('viroconweb_media_written_bytes_total',
+     (COUNTER, 'Bytes written to the media storage.', None)),
+    ('viroconweb_pdflatex_duration_seconds',
+     (HISTOGRAM, 'Duration of compiling a latex report.',
+      METRICS_DURATION_BUCKETS)),
+    ('viroconweb_requests_total',
+     (COUNTER, 'Handled requests.', None)),
+    ('viroconweb_db_queries_per_request',
+     (HISTOGRAM, 'Data base queries per request.',
+      METRICS_QUERY_COUNT_BUCKETS)),
+    ('viroconweb_compute_jobs',
+     (GAUGE, 'Compute jobs by status.', None)),
+])
+
+
+def format_labels(labels):
+    """
+    Formats labels as in the Prometheus text format.
+
+    Parameters
+    ----------
+    labels : dict,
+        The labels' names and values.
+
+    Returns
+    -------
+    text : str,
+        E.g. 'dimensions="2",method="IFORM"', sorted by name.
+    """
+    parts = []
+    for name in sorted(labels):
+        value = str(labels[name]).replace('\\', '\\\\').replace(
+            '"', '\\"').replace('\n', '\\n')
+        parts.append('{}="{}"'.format(name, value))
+    return ','.join(parts)
+
+
+def _add(name, labels, amount, le=''):
+    updated = MetricValue.objects.filter(name=name, labels=labels,
+                                         le=le).update(
+        value=F('value') + amount)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            MetricValue.objects.create(name=name, labels=labels, le=le,
+                                       value=amount)
+    except IntegrityError:
+        # Another process created the row in the mean time.
+        MetricValue.objects.filter(name=name, labels=labels, le=le).update(
+            value=F('value') + amount)
+
+
+def increment(name, amount=1, **labels):
+    """
+    Increments a counter.
+
+    Parameters
+    ----------
+    name : str,
+        The counter's name, see METRICS.
+    amount : float, optional
+        Defaults to 1.
+    **labels
+        The labels of the counter, e.g. kind='fit'.
+    """
+    if COLLECT_METRICS:
+        _add(name, format_labels(labels), amount)
+
+
+def observe(name, value, **labels):
+    """
+    Adds an observation to a histogram.
+
+    Parameters
+    ----------
+    name : str,
+        The histogram's name, see METRICS.
+    value : float,
+        The observed value, e.g. a duration in seconds.
+    **labels
+        The labels of the histogram, e.g. method='IFORM'.
+    """
+    if not COLLECT_METRICS:
+        return
+    buckets = METRICS[name][2]
+    le = '+Inf'
+    for bound in buckets:
+        if value <= bound:
+            le = repr(float(bound))
+            break
+    formatted_labels = format_labels(labels)
+    _add(name + '_bucket', formatted_labels, 1, le)
+    _add(name + '_sum', formatted_labels, value)
+
+
+def _join_labels(*labels):
+    return ','.join(label for label in labels if label)
+
+
+def _line(name, labels, value):
+    if labels:
+        return '{}{{{}}} {}'.format(name, labels, repr(float(value)))
+    return '{} {}'.format(name, repr(float(value)))
+
+
+def render_metrics():
+    """
+    Exports the metrics in the Prometheus text format.
+
+    Returns
+    -------
+    text : str
+    """
+    values = {}
+    for metric_value in MetricValue.objects.all():
+        values.setdefault(metric_value.name, []).append(metric_value)
+    # Gauges are computed when they are exported.
+    values['viroconweb_compute_jobs'] = [
+        MetricValue(name='viroconweb_compute_jobs',
+                    labels=format_labels({'status': row['status']}),
+                    value=row['n'])
+        for row in ComputeJob.objects.values('status').annotate(
+            n=Count('pk')).order_by('status')]
+
+    lines = []
+    for name, (metric_type, help_text, buckets) in METRICS.items():
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        if metric_type != HISTOGRAM:
+            for metric_value in sorted(values.get(name, []),
+                                       key=lambda v: v.labels):
+                lines.append(_line(name, metric_value.labels,
+                                   metric_value.value))
+            continue
+        counts = {}
+        for metric_value in values.get(name + '_bucket', []):
+            counts.setdefault(metric_value.labels, {})[metric_value.le] = \
+                metric_value.value
+        sums = {metric_value.labels: metric_value.value
+                for metric_value in values.get(name + '_sum', [])}
+        for labels in sorted(counts):
+            cumulative = 0
+            for le in [repr(float(bound)) for bound in buckets] + ['+Inf']:
+                cumulative += counts[labels].get(le, 0)
+                lines.append(_line(name + '_bucket',
+                                   _join_labels(labels, 'le="{}"'.format(le)),
+                                   cumulative))
+            lines.append(_line(name + '_sum', labels, sums.get(labels, 0)))
+            lines.append(_line(name + '_count', labels, cumulative))
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Counts the requests and their data base queries per view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not COLLECT_METRICS:
+            return self.get_response(request)
+        # Queries are only logged by Django if DEBUG is True or if the
+        # cursor is forced to be a debug cursor (as in
+        # django.test.utils.CaptureQueriesContext).
+        force_debug_cursor = connection.force_debug_cursor
+        connection.force_debug_cursor = True
+        n_queries_before = len(connection.queries_log)
+        try:
+            response = self.get_response(request)
+        finally:
+            connection.force_debug_cursor = force_debug_cursor
+        n_queries = len(connection.queries_log) - n_queries_before
+        resolver_match = getattr(request, 'resolver_match', None)
+        view = resolver_match.view_name if resolver_match else 'unresolved'
+        increment('viroconweb_requests_total', view=view,
+                  status=response.status_code)
+        observe('viroconweb_db_queries_per_request', n_queries, view=view)
+        return response
@@ -2,9 +2,8 @@
 # Generated by Django 1.11.11 on 2018-04-02 13:45
 from __future__ import unicode_literals
 
+from django.contrib.auth.hashers import make_password
 from django.db import migrations
-from user.models import User
-from contour.models import ProbabilisticModel, DistributionModel, ParameterModel
 import contour.settings as contour_settings
 
 
@@ -23,9 +22,13 @@ def load_data(apps, schema_editor):
         writing-migrations/
         Also see: https://docs.djangoproject.com/en/2.0/ref/schema-editor
     """
-    # Do not use the historic version of User since it cannot not use the
-    # set_password method in that case
-    #User = apps.get_model('user', 'User')
+    # Use the historic versions of the models such that the migration works
+    # with the fields, which existed at this point. They have no
+    # set_password method, hence the password is hashed with make_password.
+    User = apps.get_model('user', 'User')
+    ProbabilisticModel = apps.get_model('contour', 'ProbabilisticModel')
+    DistributionModel = apps.get_model('contour', 'DistributionModel')
+    ParameterModel = apps.get_model('contour', 'ParameterModel')
 
     # Seed data base with two users, the first user will get two prob. models
     user = User(
@@ -34,11 +37,10 @@ def load_data(apps, schema_editor):
         first_name='Max',
         last_name='Mustermann',
         organisation='Musterfirma',
-        type_of_use='commercial'
+        type_of_use='commercial',
+        password=make_password('Musterpasswort2018'),
     )
     user.save()
-    user.set_password('Musterpasswort2018')
-    user.save()
     user2 = User(
         username='sabine_mustermann',
         email='sabine.mustermann@gmail.com',
@@ -46,10 +48,9 @@ def load_data(apps, schema_editor):
         last_name='Mustermann',
         organisation='Musterfirma',
         type_of_use='academic',
+        password=make_password('Musterpasswort2018'),
     )
     user2.save()
-    user2.set_password('Musterpasswort2018')
-    user2.save()
 
     # First probabilistic model and its dependent models (distr., param.)
     probabilistic_model = ProbabilisticModel(
@@ -59,7 +60,7 @@ def load_data(apps, schema_editor):
     )
     probabilistic_model.save()
     path = contour_settings.PATH_MEDIA + \
-           contour_settings.PATH_USER_GENERATED + str(user) + \
+           contour_settings.PATH_USER_GENERATED + user.username + \
            '/prob_model/' + str(probabilistic_model.pk)
     probabilistic_model.path_of_statics = path
     probabilistic_model.save(update_fields=['path_of_statics'])
@@ -126,7 +127,7 @@ def load_data(apps, schema_editor):
     )
     probabilistic_model.save()
     path = contour_settings.PATH_MEDIA + \
-           contour_settings.PATH_USER_GENERATED + str(user) + \
+           contour_settings.PATH_USER_GENERATED + user.username + \
            '/prob_model/' + str(probabilistic_model.pk)
     probabilistic_model.path_of_statics = path
     probabilistic_model.save(update_fields=['path_of_statics'])
@@ -218,6 +219,7 @@ def load_data(apps, schema_editor):
 class Migration(migrations.Migration):
     dependencies = [
         ('contour', '0003_auto_20180307_1652'),
+        ('user', '0003_auto_20180222_1924'),
     ]
 
     operations = [
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 09:12
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contour', '0013_auto_20180605_1423'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ComputeJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('fit', 'Fit'), ('iform', 'IFORM contour'), ('hdc', 'Highest density contour')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('stage', models.CharField(default='', max_length=20)),
+                ('parameters', models.TextField(default='{}')),
+                ('result', models.TextField(default=None, null=True)),
+                ('error_message', models.TextField(default=None, null=True)),
+                ('error_class', models.CharField(default=None, max_length=50, null=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started', models.DateTimeField(default=None, null=True)),
+                ('finished', models.DateTimeField(default=None, null=True)),
+                ('environmental_contour', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='contour.EnvironmentalContour')),
+                ('measure_file_model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='contour.MeasureFileModel')),
+                ('primary_user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='compute_jobs', to=settings.AUTH_USER_MODEL)),
+                ('probabilistic_model', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='contour.ProbabilisticModel')),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 10:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0014_computejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contourpath',
+            name='coordinates',
+            field=models.BinaryField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='contourpath',
+            name='dtype',
+            field=models.CharField(default='<f8', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='contourpath',
+            name='n_dimensions',
+            field=models.PositiveIntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='contourpath',
+            name='n_points',
+            field=models.PositiveIntegerField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 11:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0015_contourpath_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plottedfigure',
+            name='file_name',
+            field=models.CharField(default=None, max_length=120, null=True),
+        ),
+        migrations.AddField(
+            model_name='plottedfigure',
+            name='image_size',
+            field=models.PositiveIntegerField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='plottedfigure',
+            name='last_accessed',
+            field=models.DateTimeField(default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='plottedfigure',
+            name='render_spec',
+            field=models.TextField(default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 14:05
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0016_plottedfigure_render_spec'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='computejob',
+            name='kind',
+            field=models.CharField(choices=[('fit', 'Fit'), ('iform', 'IFORM contour'), ('hdc', 'Highest density contour'), ('report', 'Contour report')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 17:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0020_probabilisticmodel_spec_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='probabilisticmodel',
+            name='spec',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 17:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0021_probabilisticmodel_spec'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='column_dtypes',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='n_columns',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='n_rows',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='var_names',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='var_symbols',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
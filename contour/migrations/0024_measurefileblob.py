@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.11 on 2026-10-18 19:25
+from __future__ import unicode_literals
+
+import contour.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contour', '0023_measurefilemodel_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasureFileBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=120, upload_to=contour.models.blob_path)),
+                ('size', models.BigIntegerField()),
+                ('refcount', models.IntegerField(default=1)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='measurefilemodel',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='measure_file_models', to='contour.MeasureFileBlob'),
+        ),
+    ]
@@ -90,6 +90,49 @@ def random_hash_string():
     return hash_string
 
 
+def blob_path(instance, filename):
+    """
+    Creates the path where to store the content of a measurement file.
+
+    The path is:
+    MEDIA_ROOT/<PATH_MEASUREMENT_BLOBS>/<first two characters of the
+    sha256>/<sha256>.csv
+
+    Parameters
+    ----------
+    instance : MeasureFileBlob,
+        The stored content.
+    filename : str,
+        Name of the uploaded file. It is not used as the path only depends
+        on the content.
+
+    Returns
+    -------
+    path : str
+    """
+    return '{0}{1}/{2}.csv'.format(settings.PATH_MEASUREMENT_BLOBS,
+                                   instance.sha256[:2], instance.sha256)
+
+
+class MeasureFileBlob(models.Model):
+    """
+    Model for the content of measurement files.
+
+    Each content is stored once. MeasureFileModels with the same content
+    share a MeasureFileBlob, which counts them (see measure_file_blobs.py).
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_path,
+                            max_length=MAX_LENGTH_FILE_NAME)
+    size = models.BigIntegerField()
+    # Number of MeasureFileModels, which refer to the content.
+    refcount = models.IntegerField(default=1)
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '{} ({} references)'.format(self.sha256, self.refcount)
+
+
 class MeasureFileModel(models.Model):
     """
     Model for a file containing measurement data.
@@ -113,6 +156,25 @@ class MeasureFileModel(models.Model):
         null=True,
         default=None)
     path_of_statics = models.CharField(default=None, max_length=240, null=True)
+    # The stored content. measure_file then refers to the content's file.
+    # Files uploaded by older versions have their own file and no blob.
+    blob = models.ForeignKey(MeasureFileBlob, on_delete=models.PROTECT,
+                             null=True, blank=True,
+                             related_name='measure_file_models')
+    # Metadata of the file, which is stored when the file is converted to the
+    # columnar cache (see measurement_data.py): the variable names and
+    # symbols and the columns' data types as JSON lists and the numbers of
+    # rows and columns. Files uploaded by older versions have no metadata
+    # until it is read.
+    var_names = models.TextField(default='', blank=True)
+    var_symbols = models.TextField(default='', blank=True)
+    n_rows = models.IntegerField(null=True, blank=True)
+    n_columns = models.IntegerField(null=True, blank=True)
+    column_dtypes = models.TextField(default='', blank=True)
+    # Statistics of the columns, e.g. histograms, as JSON (see
+    # column_statistics.py). Files uploaded by older versions have no
+    # statistics until they are computed.
+    statistics = models.TextField(default='', blank=True)
 
     @staticmethod
     def url_str():
@@ -141,6 +203,13 @@ class ProbabilisticModel(models.Model):
     measure_file_model = models.ForeignKey(MeasureFileModel,
                                            on_delete=models.CASCADE,
                                            null=True)
+    # Canonical JSON specification of the distributions and parameters, from
+    # which the MultivariateDistribution is built, and its SHA-256 (see
+    # compute_interface.model_spec()). Both are emptied if a distribution or
+    # parameter is saved or deleted (see signals.py) and are created again
+    # when the model is used.
+    spec = models.TextField(default='', blank=True)
+    spec_hash = models.CharField(default='', blank=True, max_length=64)
 
     @staticmethod
     def url_str():
@@ -273,6 +342,26 @@ class EnvironmentalContour(models.Model):
         path = path + "/" + settings.LATEX_REPORT_NAME
         return path
 
+    def report_status(self):
+        """
+        Returns the status of the contour's report, which is created in the
+        background when it is requested for the first time (see jobs.py).
+
+        Returns
+        -------
+        status : str,
+            'ready', 'failed', 'pending' or 'missing' (not requested yet).
+        """
+        if self.latex_report:
+            return 'ready'
+        job = self.computejob_set.filter(kind=ComputeJob.REPORT).order_by(
+            '-created').first()
+        if job is None:
+            return 'missing'
+        if job.status == ComputeJob.FAILED:
+            return 'failed'
+        return 'pending'
+
     @staticmethod
     def url_str():
         return "environmental_contour"
@@ -304,17 +393,28 @@ class ContourPath(models.Model):
     One or multiple ContourPath instances can be associated to an
     EnvironmentalContour instance.
 
-    The points of the path have their own model (ExtremeEnvDesignCondition)
-    and are connected via the ContourPath primary key.
+    The coordinates of the path's points are stored as a single binary array
+    (little-endian float64) with the shape (n_dimensions, n_points), see
+    persistence.encode_contour_path() and persistence.decode_contour_path().
+
+    Contours that were saved by older versions hold no binary array. Their
+    points have their own model (ExtremeEnvDesignCondition) and are connected
+    via the ContourPath primary key.
     """
     environmental_contour = models.ForeignKey(EnvironmentalContour,
                                               on_delete=models.CASCADE)
+    coordinates = models.BinaryField(default=None, null=True)
+    n_dimensions = models.PositiveIntegerField(default=None, null=True)
+    n_points = models.PositiveIntegerField(default=None, null=True)
+    dtype = models.CharField(default='<f8', max_length=10)
 
 
 class ExtremeEnvDesignCondition(models.Model):
     """
     Model for a single extreme environmental design conditions.
 
+    This model is only used by contours, which were saved by older versions.
+    New contours store their coordinates in ContourPath.coordinates.
 
     Multiple ExtremeEnvDesignCondition instances make up a ContourPath instance.
 
@@ -342,6 +442,12 @@ class PlottedFigure(models.Model):
     By having a class with an ImageField a ProbabilisticModel or an
     EnvironmentalContour instance can have multiple images associated to it
     using a many-to-one relation.
+
+    Figures can be rendered lazily: Then the PlottedFigure holds a render spec
+    (a JSON string, see lazy_figures.py) and the image is rendered when it is
+    requested for the first time. Rendered images may be deleted again to
+    limit the disk space a user needs; they are rendered again on the next
+    request.
     """
     image = models.ImageField(
         upload_to=media_directory_path,
@@ -375,3 +481,116 @@ class PlottedFigure(models.Model):
         null=True,
         on_delete=models.CASCADE
     )
+
+    render_spec = models.TextField(default=None, null=True)
+    file_name = models.CharField(default=None, max_length=120, null=True)
+    image_size = models.PositiveIntegerField(default=None, null=True)
+    last_accessed = models.DateTimeField(default=None, null=True)
+
+    def figure_name(self):
+        """
+        Returns the name of the figure's image, also if the image has not been
+        rendered yet.
+        """
+        if self.file_name:
+            return self.file_name
+        return self.image.name
+
+
+class ComputeJob(models.Model):
+    """
+    Model for a fit or a contour calculation, which is run in the background.
+
+    Fits and contour calculations can take longer than a web request should
+    take. Consequently, the views create a ComputeJob, which is claimed and
+    executed by a worker process (python manage.py compute_worker), and the
+    user is redirected to a status page.
+
+    The job's input is stored as a JSON string in 'parameters' together with
+    the measurement file or the probabilistic model it is based on. When the
+    job is done, the fitted probabilistic model or the environmental contour is
+    linked to it and additional data needed to show the result is stored as a
+    JSON string in 'result'.
+    """
+    FIT = 'fit'
+    IFORM = 'iform'
+    HDC = 'hdc'
+    REPORT = 'report'
+    KINDS = ((FIT, 'Fit'),
+             (IFORM, 'IFORM contour'),
+             (HDC, 'Highest density contour'),
+             (REPORT, 'Contour report'))
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((QUEUED, 'Queued'),
+                (RUNNING, 'Running'),
+                (DONE, 'Done'),
+                (FAILED, 'Failed'))
+    primary_user = models.ForeignKey(User, null=True,
+                                     related_name="compute_jobs")
+    kind = models.CharField(choices=KINDS, max_length=10)
+    status = models.CharField(choices=STATUSES, default=QUEUED, max_length=10)
+    # The stage is e.g. 'fit', 'plot', 'contour' or 'report'.
+    stage = models.CharField(default='', max_length=20)
+    parameters = models.TextField(default='{}')
+    result = models.TextField(default=None, null=True)
+    error_message = models.TextField(default=None, null=True)
+    error_class = models.CharField(default=None, max_length=50, null=True)
+    created = models.DateTimeField(default=timezone.now)
+    started = models.DateTimeField(default=None, null=True)
+    finished = models.DateTimeField(default=None, null=True)
+    # Number of times a worker claimed the job (see jobs.claim_next_job()).
+    attempts = models.PositiveSmallIntegerField(default=0)
+    measure_file_model = models.ForeignKey(MeasureFileModel,
+                                           on_delete=models.CASCADE,
+                                           null=True)
+    probabilistic_model = models.ForeignKey(ProbabilisticModel,
+                                            on_delete=models.CASCADE,
+                                            null=True)
+    environmental_contour = models.ForeignKey(EnvironmentalContour,
+                                              on_delete=models.SET_NULL,
+                                              null=True)
+
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class MetricValue(models.Model):
+    """
+    Model for the value of a metric, which is exported at /metrics (see
+    metrics.py).
+
+    All web and worker processes add to the same rows. Thus, the values are
+    aggregated over the processes.
+    """
+    name = models.CharField(max_length=100)
+    # The labels in the Prometheus text format, e.g. 'method="IFORM"'.
+    labels = models.CharField(default='', max_length=200)
+    # The upper bound of a histogram's bucket, '' for other metrics.
+    le = models.CharField(default='', max_length=20)
+    value = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('name', 'labels', 'le')
+
+    def __str__(self):
+        return '{}{{{}}} {}'.format(self.name, self.labels, self.value)
+
+
+class StageTiming(models.Model):
+    """
+    Model for the duration of a stage of a request or a job, e.g. of the
+    contour calculation or of pdflatex (see timing.py).
+
+    Stages, which ran multiple times in a request, are summed up.
+    """
+    stage = models.CharField(max_length=50, db_index=True)
+    seconds = models.FloatField()
+    # The request's path or the job's kind, e.g. 'job:iform'.
+    source = models.CharField(max_length=200)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return '{}: {:.3f} s'.format(self.stage, self.seconds)
@@ -0,0 +1,425 @@
+"""
+Fits a probabilistic model with a pool of processes.
+
+viroconcom's Fit fits the distributions of all intervals of a dimension one
+after another. These fits are independent of each other. Here, every single
+distribution fit, i.e. per dimension and per interval, is a task of a
+multiprocessing.Pool. The dependence functions are fitted afterwards in the
+main process, which is fast.
+
+Each process creates at most one pool, which is reused by all its fits. If a
+fit takes longer than its timeout, the pool's worker processes are
+terminated such that they do not keep computing fits, which nobody waits
+for, and a new pool is created by the next fit.
+
+The samples are shared with the worker processes as memory-mapped .npy files
+in a temporary directory (sorted by the variable the dimension depends on),
+such that a task only holds the start and the end index of its interval and
+no data is copied between the processes.
+
+ParallelFit follows the steps of Fit._get_distribution() and uses some of
+viroconcom's private helpers. Thus, it is only used with the viroconcom
+version it was checked against, see is_supported().
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import warnings
+from multiprocessing import TimeoutError
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+from viroconcom.fitting import Fit, BasicFit, FitInspectionData, _bounds
+from viroconcom.version import __version__ as VIROCONCOM_VERSION
+from viroconcom.params import ConstantParam, FunctionParam
+from viroconcom.settings import SHAPE_STRING, LOCATION_STRING, SCALE_STRING
+from viroconcom.distributions import (WeibullDistribution,
+                                      LognormalDistribution,
+                                      NormalDistribution,
+                                      KernelDensityDistribution,
+                                      MultivariateDistribution)
+
+# Same value as in viroconcom's Fit.
+MIN_DATA_POINTS_FOR_FIT = 10
+
+PARAM_STRINGS = (SHAPE_STRING, LOCATION_STRING, SCALE_STRING)
+
+# The viroconcom version, whose Fit ParallelFit reproduces. Check the results
+# against Fit (see tests/test_parallel_fit.py) before it is changed.
+SUPPORTED_VIROCONCOM_VERSION = '1.1.8'
+
+_pool = None
+_pool_size = None
+_pool_lock = threading.Lock()
+
+
+def is_supported():
+    """
+    Returns True if the installed viroconcom version is the one ParallelFit
+    reproduces.
+    """
+    return VIROCONCOM_VERSION == SUPPORTED_VIROCONCOM_VERSION
+
+
+def _get_pool(n_workers):
+    """
+    Returns the process's pool and creates it if needed.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None and _pool_size != n_workers:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
+        if _pool is None:
+            _pool = multiprocessing.Pool(processes=n_workers)
+            _pool_size = n_workers
+        return _pool
+
+
+def terminate_pool():
+    """
+    Terminates the worker processes of the process's pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
+
+
+def _fit_interval(path, start, stop, name):
+    """
+    Fits a distribution to a slice of a memory-mapped sample.
+
+    This function runs in a worker process.
+    """
+    sample = np.array(np.load(path, mmap_mode='r')[start:stop])
+    return Fit._fit_distribution(sample, name)
+
+
+class ParallelFit(Fit):
+    """
+    Fit, which computes the single distribution fits in parallel.
+
+    The attributes are the same as of viroconcom's Fit, i.e. a ParallelFit
+    can be used wherever a Fit is used.
+    """
+
+    def __init__(self, samples, dist_descriptions, timeout=None,
+                 n_workers=None):
+        """
+        Parameters
+        ----------
+        samples : list of numpy.ndarray,
+            One array per dimension, see Fit.
+        dist_descriptions : list of dict,
+            One description per dimension, see Fit.
+        timeout : float, optional
+            The maximum time in seconds the fit is allowed to take.
+        n_workers : int, optional
+            Number of worker processes of the pool. Defaults to the number of
+            CPUs.
+
+        Raises
+        ------
+        TimeoutError
+            If the fit takes longer than timeout.
+        """
+        self.dist_descriptions = dist_descriptions
+
+        list_number_of_intervals = []
+        list_width_of_intervals = []
+        for dist_description in dist_descriptions:
+            list_number_of_intervals.append(
+                dist_description.get('number_of_intervals'))
+            list_width_of_intervals.append(
+                dist_description.get('width_of_intervals'))
+        for dist_description in dist_descriptions:
+            dist_description['list_number_of_intervals'] = \
+                list_number_of_intervals
+            dist_description['list_width_of_intervals'] = \
+                list_width_of_intervals
+
+        if timeout is not None:
+            deadline = time.monotonic() + timeout
+        directory = tempfile.mkdtemp(prefix='parallel_fit_')
+        pool = _get_pool(n_workers)
+        try:
+            plans = [self._submit_dimension(pool, directory, dimension,
+                                            samples)
+                     for dimension in range(len(samples))]
+            tasks = [task for plan in plans for task in plan['tasks']]
+            for task in tasks:
+                if timeout is None:
+                    task.wait()
+                else:
+                    task.wait(max(deadline - time.monotonic(), 0))
+                if not task.ready():
+                    terminate_pool()
+                    raise TimeoutError(
+                        "The calculation takes too long. It takes longer "
+                        "than the given value for a timeout, which is "
+                        "'{} seconds'.".format(timeout))
+            results = [self._collect_dimension(dimension, plan)
+                       for dimension, plan in enumerate(plans)]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        distributions = []
+        dependencies = []
+        self.multiple_fit_inspection_data = []
+        for distribution, dependency, used_number_of_intervals, \
+                fit_inspection_data in results:
+            distributions.append(distribution)
+            dependencies.append(dependency)
+            self.multiple_fit_inspection_data.append(fit_inspection_data)
+            for dep_index, dep in enumerate(dependency):
+                if dep is not None:
+                    self.dist_descriptions[dep]['used_number_of_intervals'] = \
+                        used_number_of_intervals[dep_index]
+        for fit_inspection_data in self.multiple_fit_inspection_data:
+            if not fit_inspection_data.used_number_of_intervals:
+                fit_inspection_data.used_number_of_intervals = 1
+
+        self.mul_var_dist = MultivariateDistribution(distributions,
+                                                     dependencies)
+
+    @staticmethod
+    def _interval_centers(dependent_sample, number_of_intervals, bin_width):
+        """
+        Returns the interval centers and width as computed by
+        Fit._get_fitting_values.
+        """
+        if number_of_intervals:
+            interval_centers, interval_width = np.linspace(
+                np.min(dependent_sample), np.max(dependent_sample),
+                num=number_of_intervals, endpoint=False, retstep=True)
+            interval_centers += 0.5 * interval_width
+        elif bin_width:
+            interval_width = bin_width
+            interval_centers = np.arange(
+                0.5 * interval_width,
+                np.max(dependent_sample) + 0.5 * interval_width,
+                interval_width)
+        else:
+            raise RuntimeError(
+                "Either the parameters number_of_intervals or bin_width has "
+                "to be specified, otherwise the intervals are not specified. "
+                "Exiting.")
+        if len(interval_centers) < 3:
+            raise RuntimeError("Your settings resulted in " +
+                               str(len(interval_centers)) +
+                               " intervals. However, at least 3 intervals are "
+                               "required. Consider changing the interval width "
+                               "setting.")
+        return interval_centers, interval_width
+
+    def _submit_dimension(self, pool, directory, dimension, samples):
+        """
+        Submits all distribution fits of a dimension.
+
+        Returns
+        -------
+        plan : dict,
+            Holds the submitted tasks and the information needed to assemble
+            the dimension's distribution from their results.
+        """
+        dist_description = self.dist_descriptions[dimension]
+        name = dist_description.get('name', 'Weibull')
+        dependency = dist_description.get('dependency', (None, None, None))
+        sample = np.asarray(samples[dimension], dtype=np.float64)
+        plan = {'name': name,
+                'dependency': dependency,
+                'functions': dist_description.get(
+                    'functions', ('polynomial', 'polynomial', 'polynomial')),
+                'tasks': [],
+                'groups': {}}
+
+        if name == 'KernelDensity' and any(dep is not None
+                                           for dep in dependency):
+            raise NotImplementedError("KernelDensity can not be conditional.")
+
+        if name == 'KernelDensity' or None in dependency:
+            path = os.path.join(directory, '{}.npy'.format(dimension))
+            np.save(path, sample)
+            plan['independent'] = (pool.apply_async(
+                _fit_interval, (path, 0, len(sample), name)), sample)
+            plan['tasks'].append(plan['independent'][0])
+
+        for dep in set(dep for dep in dependency if dep is not None):
+            number_of_intervals = \
+                dist_description['list_number_of_intervals'][dep]
+            bin_width = dist_description['list_width_of_intervals'][dep]
+            dependent_sample = np.asarray(samples[dep], dtype=np.float64)
+            interval_centers, interval_width = self._interval_centers(
+                dependent_sample, number_of_intervals, bin_width)
+
+            # Sort the sample by the variable it depends on such that each
+            # interval is a contiguous slice.
+            order = np.argsort(dependent_sample, kind='mergesort')
+            sorted_dependent = dependent_sample[order]
+            sorted_sample = sample[order]
+            path = os.path.join(directory,
+                                '{}_given_{}.npy'.format(dimension, dep))
+            np.save(path, sorted_sample)
+
+            starts = np.searchsorted(
+                sorted_dependent, interval_centers - 0.5 * interval_width,
+                side='left')
+            stops = np.searchsorted(
+                sorted_dependent, interval_centers + 0.5 * interval_width,
+                side='left')
+            intervals = []
+            for center, start, stop in zip(interval_centers, starts, stops):
+                if stop - start >= MIN_DATA_POINTS_FOR_FIT:
+                    task = pool.apply_async(_fit_interval,
+                                            (path, int(start), int(stop),
+                                             name))
+                    plan['tasks'].append(task)
+                else:
+                    task = None
+                intervals.append((center, task, sorted_sample[start:stop]))
+            plan['groups'][dep] = intervals
+        return plan
+
+    def _collect_dimension(self, dimension, plan):
+        """
+        Assembles a dimension's distribution from the results of its fits.
+
+        The steps are the same as in Fit._get_distribution.
+        """
+        name = plan['name']
+        dependency = plan['dependency']
+        functions = plan['functions']
+        fit_inspection_data = FitInspectionData()
+        used_number_of_intervals = [None, None, None]
+
+        if name == 'KernelDensity':
+            task, _ = plan['independent']
+            return KernelDensityDistribution(task.get()), dependency, \
+                used_number_of_intervals, fit_inspection_data
+
+        params = [None, None, None]
+        if None in dependency:
+            task, sample = plan['independent']
+            current_params = task.get()
+            basic_fit = BasicFit(*current_params, sample)
+            for i in range(len(dependency)):
+                if dependency[i] is None:
+                    fit_inspection_data.append_basic_fit(PARAM_STRINGS[i],
+                                                         basic_fit)
+                    if i == 2 and name == 'Lognormal_SigmaMu':
+                        params[i] = ConstantParam(
+                            np.log(current_params[i](0)))
+                    else:
+                        params[i] = current_params[i]
+
+        for dep, intervals in plan['groups'].items():
+            interval_centers = []
+            multiple_basic_fit = []
+            for center, task, samples_in_interval in intervals:
+                if task is None:
+                    warnings.warn(
+                        "'Due to the restriction of MIN_DATA_POINTS_FOR_FIT='{}' "
+                        "there is not enough data (n='{}') for the interval "
+                        "centered at '{}' in dimension '{}'. This step is "
+                        "skipped. Consider analyzing your data or reducing the "
+                        "number of intervals.".format(
+                            MIN_DATA_POINTS_FOR_FIT, len(samples_in_interval),
+                            center, dep),
+                        RuntimeWarning, stacklevel=2)
+                    continue
+                try:
+                    current_params = task.get()
+                except ValueError:
+                    warnings.warn(
+                        "There is not enough data for step '{}' in dimension "
+                        "'{}'. This step is skipped. Consider analyzing your "
+                        "data or reducing the number of intervals.".format(
+                            center, dep),
+                        RuntimeWarning, stacklevel=2)
+                    continue
+                interval_centers.append(center)
+                multiple_basic_fit.append(
+                    BasicFit(*current_params, samples_in_interval))
+            interval_centers = np.array(interval_centers)
+
+            for i in range(len(dependency)):
+                if dependency[i] != dep:
+                    continue
+                for basic_fit in multiple_basic_fit:
+                    fit_inspection_data.append_basic_fit(PARAM_STRINGS[i],
+                                                         basic_fit)
+                if i == 0:
+                    fit_inspection_data.shape_at = interval_centers
+                elif i == 1:
+                    fit_inspection_data.loc_at = interval_centers
+                elif i == 2:
+                    fit_inspection_data.scale_at = interval_centers
+                used_number_of_intervals[i] = len(interval_centers)
+
+                if i == 2 and name == 'Lognormal_SigmaMu':
+                    fit_points = [np.log(basic_fit.scale)
+                                  for basic_fit in multiple_basic_fit]
+                else:
+                    fit_points = [[basic_fit.shape,
+                                   basic_fit.loc,
+                                   basic_fit.scale][i]
+                                  for basic_fit in multiple_basic_fit]
+                params[i] = FunctionParam(
+                    *self._fit_function(functions[i], interval_centers,
+                                        fit_points, name, i, dimension),
+                    functions[i])
+
+        distribution = None
+        if name == 'Weibull':
+            distribution = WeibullDistribution(*params)
+        elif name == 'Lognormal_SigmaMu':
+            distribution = LognormalDistribution(sigma=params[0], mu=params[2])
+        elif name == 'Lognormal':
+            distribution = LognormalDistribution(*params)
+        elif name == 'Normal':
+            distribution = NormalDistribution(*params)
+        return distribution, dependency, used_number_of_intervals, \
+            fit_inspection_data
+
+    @staticmethod
+    def _fit_function(function_name, interval_centers, fit_points, name, index,
+                      dimension):
+        """
+        Fits a dependence function like Fit._get_distribution does and
+        returns its parameters.
+        """
+        function = Fit._get_function(function_name)
+        try:
+            param_popt, _ = curve_fit(function, interval_centers, fit_points,
+                                      bounds=_bounds)
+        except RuntimeError:
+            if index == 0 and name == 'Lognormal_SigmaMu':
+                param_name = "sigma"
+            elif index == 2 and name == 'Lognormal_SigmaMu':
+                param_name = "mu"
+            else:
+                param_name = PARAM_STRINGS[index]
+            warnings.warn(
+                "Optimal Parameters not found for parameter '{}' in dimension "
+                "'{}'. Maybe switch the given function for a better fit. "
+                "Trying again with a higher number of calls to function "
+                "'{}'.".format(param_name, dimension, function_name),
+                RuntimeWarning, stacklevel=2)
+            try:
+                param_popt, _ = curve_fit(function, interval_centers,
+                                          fit_points, bounds=_bounds,
+                                          maxfev=int(1e6))
+            except RuntimeError:
+                raise RuntimeError(
+                    "Can't fit curve for parameter '{}' in dimension '{}'. "
+                    "Number of iterations exceeded.".format(param_name,
+                                                            dimension))
+        return param_popt
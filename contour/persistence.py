@@ -0,0 +1,349 @@
+"""
+Saves computed results, e.g. fitted probabilistic models and environmental
+contours, to the data base.
+"""
+from collections import OrderedDict
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from viroconcom import params
+
+from . import settings
+from .models import ProbabilisticModel, DistributionModel, ParameterModel, \
+    AdditionalContourOption, ContourPath, EEDCScalar
+from .settings import DO_SAVE_CONTOUR_COORDINATES_IN_DB
+from .compute_interface import model_spec
+from .timing import timed_stage
+
+
+def save_probabilistic_model(probabilistic_model, distribution_models,
+                             parameter_models, validate=True):
+    """
+    Saves a probabilistic model with its distributions and parameters.
+
+    All parameters are validated before anything is written. Then, all rows
+    are written within a single transaction with one query per model class.
+    Thus, either the whole model is saved or nothing is saved.
+
+    Parameters
+    ----------
+    probabilistic_model : ProbabilisticModel,
+        The unsaved probabilistic model.
+    distribution_models : list of DistributionModel,
+        The unsaved distributions, one per variable. Their probabilistic
+        model is set here.
+    parameter_models : list of list of ParameterModel,
+        The unsaved parameters, one list per distribution. Their distribution
+        is set here.
+    validate : boolean, optional
+        If True, ParameterModel.clean() is called for every parameter.
+        Defaults to True.
+
+    Returns
+    -------
+    probabilistic_model : ProbabilisticModel,
+        The saved probabilistic model.
+    distribution_models : list of DistributionModel,
+        The saved distributions.
+    parameter_models : list of list of ParameterModel,
+        The saved parameters.
+
+    Raises
+    ------
+    ValidationError
+        If a parameter is not valid. The error holds the messages of all
+        invalid parameters and no row is written.
+    """
+    for distribution_model, distribution_parameters in zip(
+            distribution_models, parameter_models):
+        distribution_model.probabilistic_model = probabilistic_model
+        for parameter_model in distribution_parameters:
+            parameter_model.distribution = distribution_model
+    if validate:
+        errors = []
+        for distribution_parameters in parameter_models:
+            for parameter_model in distribution_parameters:
+                try:
+                    parameter_model.clean()
+                except ValidationError as e:
+                    errors.extend(e.messages)
+        if errors:
+            raise ValidationError(errors)
+
+    probabilistic_model.spec, probabilistic_model.spec_hash = model_spec(
+        distribution_models, parameter_models)
+    with transaction.atomic():
+        probabilistic_model.save()
+        for distribution_model in distribution_models:
+            # The foreign key is assigned again as the probabilistic model
+            # has a primary key only now.
+            distribution_model.probabilistic_model = probabilistic_model
+        DistributionModel.objects.bulk_create(distribution_models)
+        # Only some data base backends set the primary keys in bulk_create().
+        # The rows were inserted in order, thus their keys are ascending.
+        distribution_pks = DistributionModel.objects.filter(
+            probabilistic_model=probabilistic_model).order_by(
+            'pk').values_list('pk', flat=True)
+        all_parameter_models = []
+        for distribution_model, pk, distribution_parameters in zip(
+                distribution_models, distribution_pks, parameter_models):
+            distribution_model.pk = pk
+            for parameter_model in distribution_parameters:
+                parameter_model.distribution = distribution_model
+                all_parameter_models.append(parameter_model)
+        ParameterModel.objects.bulk_create(all_parameter_models)
+        parameter_pks = ParameterModel.objects.filter(
+            distribution__probabilistic_model=probabilistic_model).order_by(
+            'pk').values_list('pk', flat=True)
+        for parameter_model, pk in zip(all_parameter_models, parameter_pks):
+            parameter_model.pk = pk
+    return probabilistic_model, distribution_models, parameter_models
+
+
+def save_fitted_prob_model(fit, model_title, var_names, var_symbols, user,
+                           measure_file):
+    """
+    Saves a probabilistic model which was fitted to measurement data.
+
+    Parameters
+    ----------
+    fit : Fit,
+        Calculated fit results of a measurement file.
+    model_title : str,
+        Title of the probabilistic model.
+    var_names : list of str,
+        Names of the variables.
+    var_symbols : list of str,
+        Names of the symbols of the probabilistic model's variables.
+    user : str,
+        Name of a user.
+    measure_file : MeasureFileModel,
+        MeasureFileModel object linked to the probabilistic model.
+
+    Returns
+    -------
+    ProbabilisticModel
+        ProbabilisticModel that was fitted to the measurement file.
+
+    """
+    probabilistic_model = ProbabilisticModel(primary_user=user,
+                                             collection_name=model_title,
+                                             measure_file_model=measure_file)
+    distribution_models = []
+    parameter_models = []
+    for i, dist in enumerate(fit.mul_var_dist.distributions):
+        dependency = fit.mul_var_dist.dependencies[i]
+        if dist.name == 'Lognormal':
+            dist_name = 'Lognormal_SigmaMu'
+            scale = dist.mu
+        else:
+            dist_name = dist.name
+            scale = dist.scale
+        distribution_model = DistributionModel(name=var_names[i],
+                                               symbol=var_symbols[i],
+                                               distribution=dist_name)
+        distribution_models.append(distribution_model)
+        parameter_models.append([
+            create_parameter_model(dist.shape, distribution_model,
+                                   dependency[0], 'shape'),
+            create_parameter_model(dist.loc, distribution_model,
+                                   dependency[1], 'loc'),
+            create_parameter_model(scale, distribution_model,
+                                   dependency[2], 'scale')])
+
+    # Fitted parameters are not validated as ParameterModel.clean() is meant
+    # for entered values, e.g. a fitted power function can have x0 = 0.
+    probabilistic_model, _, _ = save_probabilistic_model(
+        probabilistic_model, distribution_models, parameter_models,
+        validate=False)
+    return probabilistic_model
+
+
+@timed_stage('save_environmental_contour')
+def save_environmental_contour(environmental_contour,
+                               additional_contour_options,
+                               contour_coordinates,
+                               user):
+    """
+    Saves an EnvironmentalContour object and its depending models to the data
+    base.
+
+
+    Parameters
+    ----------
+    environmental_contour : EnvironmentalContour,
+        The environmental contour obect that should be saved.
+    additional_contour_options : list of AdditionalContourOption,
+        Options, whch are specific to the contour and are not general
+        environmental contour options.
+    contour_coordinates : list of list of numpy.ndarray,
+        Contains the coordinates of points on the contour.
+        The outer list contains can hold multiple contour paths if the
+        distribution is multimodal. The inner list contains multiple
+        numpy arrays of the same length, one per dimension.
+        The values of the arrays are the coordinates in the corresponding
+        dimension.
+    user : str,
+        The user who should own the environmental contour.
+
+    Returns
+    -------
+    EnvironmentalContour,
+        The saved environmental contour object.
+    """
+    # Only save the object if it has not been saved yet.
+    if environmental_contour.pk is None:
+        environmental_contour.save()
+    path = settings.PATH_MEDIA + \
+           settings.PATH_USER_GENERATED + \
+           user + \
+           '/contour/' + str(environmental_contour.pk)
+    environmental_contour.path_of_statics = path
+    environmental_contour.save(
+        update_fields=['path_of_statics'])
+    for additional_contour_option in additional_contour_options:
+        # It is necessary to create a new AdditionalContourObject because the
+        # original object was created with an environmental contour, which has
+        # been saved yet and consequently does not have a primary key.
+        additional_contour_option_w_pk = AdditionalContourOption(
+            option_key=additional_contour_option.option_key,
+            option_value=additional_contour_option.option_value,
+            environmental_contour=environmental_contour)
+        additional_contour_option_w_pk.save()
+    # The coordinates are stored as one binary array per contour path, which
+    # are written with a single query.
+    if DO_SAVE_CONTOUR_COORDINATES_IN_DB:
+        contour_paths = []
+        for contour_path_coordinates in contour_coordinates:
+            coordinates, (n_dimensions, n_points), dtype = \
+                encode_contour_path(contour_path_coordinates)
+            contour_paths.append(
+                ContourPath(environmental_contour=environmental_contour,
+                            coordinates=coordinates,
+                            n_dimensions=n_dimensions,
+                            n_points=n_points,
+                            dtype=dtype))
+        ContourPath.objects.bulk_create(contour_paths)
+    return environmental_contour
+
+
+def encode_contour_path(contour_path_coordinates):
+    """
+    Encodes the coordinates of a contour path as a binary array.
+
+    Parameters
+    ----------
+    contour_path_coordinates : list of numpy.ndarray,
+        One array per dimension, all of the same length.
+
+    Returns
+    -------
+    coordinates : bytes,
+        The coordinates as little-endian float64 values in C order, i.e.
+        dimension by dimension.
+    shape : tuple of int,
+        The shape of the array, i.e. (n_dimensions, n_points).
+    dtype : str,
+        The array's data type, '<f8'.
+    """
+    array = np.ascontiguousarray(contour_path_coordinates, dtype='<f8')
+    return array.tobytes(), array.shape, array.dtype.str
+
+
+def decode_contour_path(contour_path):
+    """
+    Decodes the coordinates of a contour path.
+
+    Parameters
+    ----------
+    contour_path : ContourPath,
+        The saved contour path.
+
+    Returns
+    -------
+    contour_path_coordinates : list of numpy.ndarray,
+        One (read-only) array per dimension.
+    """
+    array = np.frombuffer(bytes(contour_path.coordinates),
+                          dtype=contour_path.dtype).reshape(
+        (contour_path.n_dimensions, contour_path.n_points))
+    return list(array)
+
+
+def load_contour_coordinates(environmental_contour):
+    """
+    Loads the coordinates of an environmental contour from the data base.
+
+    Contours, which were saved by older versions and store one row per
+    scalar (EEDCScalar), are supported, too.
+
+    Parameters
+    ----------
+    environmental_contour : EnvironmentalContour,
+        The saved environmental contour.
+
+    Returns
+    -------
+    contour_coordinates : list of list of numpy.ndarray,
+        The format is the same as used by save_environmental_contour(). The
+        list is empty if the coordinates were not saved.
+    """
+    contour_coordinates = []
+    contour_paths = ContourPath.objects.filter(
+        environmental_contour=environmental_contour).order_by('pk')
+    for contour_path in contour_paths:
+        if contour_path.coordinates is not None:
+            contour_coordinates.append(decode_contour_path(contour_path))
+        else:
+            values = EEDCScalar.objects.filter(
+                EEDC__contour_path=contour_path).order_by(
+                'EEDC__pk', 'pk').values_list('EEDC__pk', 'x')
+            eedcs = OrderedDict()
+            for eedc_pk, x in values:
+                eedcs.setdefault(eedc_pk, []).append(float(x))
+            contour_coordinates.append(
+                [np.array(eedc_values) for eedc_values in eedcs.values()])
+    return contour_coordinates
+
+
+def create_parameter_model(parameter, distribution_model, dependency, name):
+    """
+    Creates the (unsaved) model of a fitted parameter.
+
+    Parameters
+    ----------
+    parameter : ConstantParam or FunctionParam
+        ConstantParam is a float value. FunctionParam contains a whole function
+        like power function or exponential.
+    distribution_model : DistributionModel
+        The parameter will be linked to this DistributionModel.
+    dependency : int
+        The dimension the dependency is based on.
+    name : str
+        Name of the parameter ('shape', 'loc' or 'scale')
+
+    Returns
+    -------
+    parameter_model : ParameterModel
+    """
+    if type(parameter) == params.ConstantParam:
+        return ParameterModel(function='None',
+                              x0=parameter(0),
+                              dependency='!',
+                              distribution=distribution_model,
+                              name=name)
+    elif type(parameter) == params.FunctionParam:
+        return ParameterModel(function=parameter.func_name,
+                              x0=parameter.a,
+                              x1=parameter.b,
+                              x2=parameter.c,
+                              dependency=dependency,
+                              distribution=distribution_model,
+                              name=name)
+    else:
+        return ParameterModel(function='None',
+                              x0=0,
+                              dependency='!',
+                              distribution=distribution_model,
+                              name=name)
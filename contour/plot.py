@@ -1,72 +1,34 @@
 """
 Plots measurement files, distributions and contours.
 """
-import pandas as pd
 import numpy as np
 import os
-import tempfile
 import warnings
 
-from scipy.stats import weibull_min
-from scipy.stats import lognorm
-from scipy.stats import norm
 from django.template.loader import get_template
-from subprocess import Popen, PIPE
-from io import BytesIO, StringIO
 from django.core.files.base import ContentFile
-from urllib import request
-from viroconweb.settings import USE_S3
-from viroconcom.distributions import ParametricDistribution
-from .settings import NR_LINES_HEADER, VIROCON_CITATION
+from .settings import VIROCON_CITATION
 from viroconweb.settings import VERSION as VIROCONWEB_VERSION
 from viroconcom.version import __version__ as VIROCONCOM_VERSION
 
-# There is a problem with using matplotlib on a server (with Heroku and Travis).
-#
-# The standard solution to fix it is to use:
-#   import matplotlib
-#   matplotlib.use('Agg')
-#   import matplotlib.pyplot as plt
-# see https://stackoverflow.com/questions/41319082/import-matplotlib-failing-
-# with-no-module-named-tkinter-on-heroku
-#
-# However this does not work. Consequently we use another solution, which is
-# inspired by https://stackoverflow.com/questions/3285193/how-to-switch-backends
-# -in-matplotlib-python
-import matplotlib
-
-all_backends = matplotlib.rcsetup.all_backends
-backend_worked = False
-for gui in all_backends:
-    try:
-        print("Testing", gui)
-        matplotlib.use(gui, warn=False, force=True)
-        from matplotlib import pyplot as plt
-
-        backend_worked = True
-        break
-    except:
-        continue
-print("Using", matplotlib.get_backend())
-if backend_worked == False or matplotlib.get_backend() == 'TkAgg':
-    from matplotlib import pyplot as plt
-
-    plt.switch_backend('agg')
-    print("Switched backend and now using", matplotlib.get_backend())
-
-from mpl_toolkits.mplot3d import axes3d, Axes3D # Needed for projection='3d'
-from descartes import PolygonPatch
-from .plot_generic import alpha_shape
-from .plot_generic import convert_ndarray_list_to_multipoint
+from .figure_rendering import render_figure, render_figures
+from .lazy_figures import lazy_plotted_figure, ensure_rendered, \
+    figure_owner, evict_rendered_figures
+from .latex import compile_latex
+from .design_conditions import iter_csv
+from .timing import timed_stage
+from .metrics import increment
 
 from . import settings
+from .measurement_data import load_columns
+from .media import local_media_path
 
 from .models import ProbabilisticModel, DistributionModel, ParameterModel, \
     AdditionalContourOption, PlottedFigure
 from .compute_interface import setup_mul_dist
 
 
-def plot_pdf_with_raw_data(dim_index,
+def pdf_with_raw_data_spec(dim_index,
                            parent_index,
                            low_index,
                            shape,
@@ -77,9 +39,9 @@ def plot_pdf_with_raw_data(dim_index,
                            interval,
                            var_name,
                            symbol_parent_var,
-                           probabilistic_model):
+                           samples_slice=None):
     """
-    Creates and saves an image, which shows a fit of a distribution.
+    Creates the render spec of an image, which shows a fit of a distribution.
 
     Parameters
     ----------
@@ -108,62 +70,17 @@ def plot_pdf_with_raw_data(dim_index,
         The name of a single variable of the probabilistic model.
     symbol_parent_var : str,
         Symbol of the variable on which the conditional variable is based.
-    probabilistic_model : ProbabilisticModel,
-        Probabilistic model which has the particular pdf.
-    """
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
-
-    if distribution_type == 'Normal':
-        x = np.linspace(norm.ppf(0.0001, loc, scale),
-                        norm.ppf(0.9999, loc, scale), 100)
-        y = norm.pdf(x, loc, scale)
-        text = distribution_type + ',' + \
-               ' μ=' + str(format(loc, '.3f')) + \
-               ' σ=' + str(format(scale, '.3f'))
-    elif distribution_type == 'Weibull':
-        x = np.linspace(weibull_min.ppf(0.0001, shape, loc, scale),
-                        weibull_min.ppf(0.9999, shape, loc, scale), 100)
-        y = weibull_min.pdf(x, shape, loc, scale)
-        text = distribution_type + ',' + \
-               ' α=' + str(format(scale, '.3f')) + \
-               ' β=' + str(format(shape, '.3f')) + \
-               ' γ=' + str(format(loc, '.3f'))
-    elif distribution_type == 'Lognormal':
-        x = np.linspace(lognorm.ppf(0.0001, shape, scale=scale),
-                        lognorm.ppf(0.9999, shape, scale=scale), 100)
-        y = lognorm.pdf(x, shape, scale=scale)
-
-        # plot_pdf_with_raw_data works with the scale parameter, but the user
-        # should be presented the mu value. Consequently, the scale value must
-        # be converted.
-        text = distribution_type + ',' + \
-               ' μ=' + str(format(np.log(scale), '.3f')) + \
-               ' σ=' + str(format(shape, '.3f'))
+    samples_slice : dict, optional
+        Describes where dist_points are located in the measurement file with
+        the keys 'column', 'parent_column' and, if parent_column is not None,
+        'lower' and 'upper'. It is used to render the image lazily, see
+        lazy_figures.resolve_spec(). Defaults to None.
 
-    else:
-        raise KeyError('No function match - {}'.format(distribution_type))
-
-    text = text + ' ('
-    if symbol_parent_var:
-        text = text + str(format(interval[0], '.3f')) + '≤' + \
-               symbol_parent_var + '<' + str(format(interval[1], '.3f')) + ', '
-    text = text + 'n=' + str(len(dist_points)) + ')'
-
-    ax.plot(x, y, 'r-', lw=5, alpha=0.6, label=distribution_type)
-    n_intervals_histogram = int(round(len(dist_points) / 50.0))
-    if n_intervals_histogram > 100:
-        n_intervals_histogram = 100
-    if n_intervals_histogram < 10:
-        n_intervals_histogram = 10
-
-    ax.hist(dist_points, n_intervals_histogram, density=True,
-            histtype='stepfilled', alpha=0.9, color='#54889c')
-    ax.grid(True)
-
-    plt.title(text)
-    plt.xlabel(var_name)
-    plt.ylabel('probability density [-]')
+    Returns
+    -------
+    spec : dict,
+        The render spec, see figure_rendering.render_pdf_with_raw_data().
+    """
     dim_index_2_digits = str(dim_index).zfill(2)
     parent_index_2_digits = str(parent_index).zfill(2)
     low_index_2_digits = str(low_index).zfill(2)
@@ -171,33 +88,32 @@ def plot_pdf_with_raw_data(dim_index,
     # The convention for image name is like this: 'fit_01_00_02.png' means
     # a plot of the second variable (01) which is conditional on the first
     # variable (00) and this is the third (02) fit
-    # For the following block thanks to: https://stackoverflow.com/questions/
-    # 20580179/saving-a-matplotlib-graph-as-an-image-field-in-database
-    f = BytesIO()
-    plt.savefig(f, bbox_inches='tight')
-    plt.close(fig)
-    content_file = ContentFile(f.getvalue())
-
-    dists_models = DistributionModel.objects.filter(
-        probabilistic_model=probabilistic_model)
-    plotted_figure = PlottedFigure(probabilistic_model=probabilistic_model,
-                                   distribution_model=dists_models[dim_index])
     file_name = 'fit_' + dim_index_2_digits + '_' + parent_index_2_digits + \
                 '_' + low_index_2_digits + '.png'
-    plotted_figure.image.save(file_name, content_file)
-    plotted_figure.save()
-
-
-def plot_parameter_fit_overview(dim_index,
+    return {'kind': 'pdf_with_raw_data',
+            'file_name': file_name,
+            'dim_index': dim_index,
+            'param_name': None,
+            'shape': shape,
+            'loc': loc,
+            'scale': scale,
+            'distribution_type': distribution_type,
+            'dist_points': np.asarray(dist_points),
+            'interval': interval,
+            'var_name': var_name,
+            'symbol_parent_var': symbol_parent_var,
+            'samples_slice': samples_slice}
+
+
+def parameter_fit_overview_spec(dim_index,
                                 parent_var_name,
                                 para_name,
                                 param_at,
                                 param_values,
                                 fit_func,
-                                dist_name,
-                                probabilistic_model):
+                                dist_name):
     """
-    Plots an image which shows the fit of a function.
+    Creates the render spec of an image, which shows the fit of a function.
 
     Parameters
     ----------
@@ -215,74 +131,46 @@ def plot_parameter_fit_overview(dim_index,
         e.g. shape, loc or scale.
     fit_func : FunctionParam,
         The fit function e.g. power function, exponential
-    directory : str,
-        The directory where the figure will be saved.
     dist_name : str,
         Name of the distribution, e.g. "Lognormal".
-    probabilistic_model : ProbabilisticModel
-        Probabilistic model that was created based on this fit.
-    """
 
-    y_text = assign_parameter_name(dist_name, para_name)
-
-    fig = plt.figure()
-    ax = fig.add_subplot(111)
-
-    x = np.linspace(min(param_at) - 2, max(param_at) + 2,
-                    100)
-    y = []
-    param_values_for_plot = []
+    Returns
+    -------
+    spec : dict,
+        The render spec, see figure_rendering.render_parameter_fit_overview().
+    """
+    x = np.linspace(min(param_at) - 2, max(param_at) + 2, 100)
+    y = np.asarray(fit_func(x), dtype=float)
 
     if dist_name == 'Lognormal' and para_name == 'scale':
-        for i in range(len(param_values)):
-            # We are not allowed to alter the param_values object since
-            # it is an attribute of a BasicFit, which we shall not change.
-            param_values_for_plot.append(np.log(param_values[i]))
-        for x1 in x:
-            y.append(np.log(fit_func(x1)))
+        # We are not allowed to alter the param_values object since
+        # it is an attribute of a BasicFit, which we shall not change.
+        param_values_for_plot = np.log(param_values)
+        y = np.log(y)
     else:
-        param_values_for_plot = param_values
-        for x1 in x:
-            y.append(fit_func(x1))
-
-    ax.plot(x, y, color='#54889c')
-
-    ax.scatter(param_at, param_values_for_plot, color='#9C373A')
-    ax.grid(True)
-    plt.ylabel(y_text)
-    plt.xlabel(parent_var_name)
-
-    # For the following block thanks to: https://stackoverflow.com/questions/
-    # 20580179/saving-a-matplotlib-graph-as-an-image-field-in-database
-    f = BytesIO()
-    plt.savefig(f, bbox_inches='tight')
-    plt.close(fig)
-    content_file = ContentFile(f.getvalue())
-
-    dists_models = DistributionModel.objects.filter(
-        probabilistic_model=probabilistic_model)
-    param_models = ParameterModel.objects.filter(
-        distribution=dists_models[dim_index])
-    param_model = param_models.get(name=para_name)
-    plotted_figure = PlottedFigure(probabilistic_model=probabilistic_model,
-                                   distribution_model=dists_models[dim_index],
-                                   parameter_model=param_model)
-    file_name = 'fit_' + str(dim_index) + para_name + '.png'
-
-    plotted_figure.image.save(file_name, content_file)
-    plotted_figure.save()
-
-
-def plot_var_dependent(fit,
-                       param_name,
-                       dim_index,
-                       var_names,
-                       var_symbols,
-                       probabilistic_model,
-                       do_dependent_plot=True):
+        param_values_for_plot = np.asarray(param_values)
+
+    return {'kind': 'parameter_fit_overview',
+            'file_name': 'fit_' + str(dim_index) + para_name + '.png',
+            'dim_index': dim_index,
+            'param_name': para_name,
+            'x': x,
+            'y': y,
+            'param_at': np.asarray(param_at),
+            'param_values': param_values_for_plot,
+            'x_label': parent_var_name,
+            'y_label': assign_parameter_name(dist_name, para_name)}
+
+
+def var_dependent_specs(fit,
+                        param_name,
+                        dim_index,
+                        var_names,
+                        var_symbols,
+                        do_dependent_plot=True):
     """
-    Plots the fitted distribution for each interval and the resulting fit
-    function for a parameter like shape, loc or scale.
+    Creates the render specs of the fitted distribution for each interval and
+    of the resulting fit function for a parameter like shape, loc or scale.
 
     Parameters
     ----------
@@ -296,13 +184,16 @@ def plot_var_dependent(fit,
         Variable names of all distributions.
     var_symbols : list of str,
         Variable symbols of all distributions.
-    probabilistic_model : ProbabilisticModel,
-        Probabilistic model that was created based on that fit.
     do_dependent_plot : Boolean, optional
         True: Probability density functions will be plotted.
         False: Probability density functions will not be plotted.
         Defaults to True.
+
+    Returns
+    -------
+    specs : list of dict
     """
+    from viroconcom.distributions import ParametricDistribution
 
     fit_inspection_data = fit.multiple_fit_inspection_data[dim_index]
     distribution = fit.mul_var_dist.distributions[dim_index]
@@ -323,15 +214,13 @@ def plot_var_dependent(fit,
     dim_index_of_parent = dependency_tuple[ParametricDistribution.param_name_to_index(param_name)]
     parent_var_name = var_names[dim_index_of_parent]
 
-    plot_parameter_fit_overview(dim_index,
-                                parent_var_name,
-                                param_name,
-                                param_at,
-                                param_value,
-                                param,
-                                dist_name,
-                                probabilistic_model
-                                )
+    specs = [parameter_fit_overview_spec(dim_index,
+                                         parent_var_name,
+                                         param_name,
+                                         param_at,
+                                         param_value,
+                                         param,
+                                         dist_name)]
 
     if do_dependent_plot:
         for j in range(len(param_at)):
@@ -340,30 +229,41 @@ def plot_var_dependent(fit,
             interval_limits = calculate_intervals(param_at, dim_index, j)
             parent_index = fit.mul_var_dist.dependencies[dim_index][param_index]
             symbol_parent_var = var_symbols[parent_index]
-            plot_pdf_with_raw_data(dim_index,
-                                   parent_index,
-                                   j,
-                                   basic_fit.shape,
-                                   basic_fit.loc,
-                                   basic_fit.scale,
-                                   fit.mul_var_dist.distributions[
-                                       dim_index].name,
-                                   basic_fit.samples,
-                                   interval_limits,
-                                   var_names[dim_index],
-                                   symbol_parent_var,
-                                   probabilistic_model)
-
-
-def plot_var_independent(param_name,
-                         dim_index,
-                         var_names,
-                         fit_inspection_data,
-                         fit,
-                         probabilistic_model):
+            # The samples of the interval are selected like in viroconcom's
+            # Fit. This is only possible for intervals of constant width.
+            width = fit.dist_descriptions[parent_index].get(
+                'width_of_intervals')
+            if width:
+                samples_slice = {'column': dim_index,
+                                 'parent_column': parent_index,
+                                 'lower': param_at[j] - 0.5 * width,
+                                 'upper': param_at[j] + 0.5 * width}
+            else:
+                samples_slice = None
+            specs.append(pdf_with_raw_data_spec(
+                dim_index,
+                parent_index,
+                j,
+                basic_fit.shape,
+                basic_fit.loc,
+                basic_fit.scale,
+                fit.mul_var_dist.distributions[dim_index].name,
+                basic_fit.samples,
+                interval_limits,
+                var_names[dim_index],
+                symbol_parent_var,
+                samples_slice))
+    return specs
+
+
+def var_independent_specs(param_name,
+                          dim_index,
+                          var_names,
+                          fit_inspection_data,
+                          fit):
     """
-    Plots the fitted distribution of a independent parameter
-    (e.g. shape, loc or scale).
+    Creates the render spec of the fitted distribution of a independent
+    parameter (e.g. shape, loc or scale).
 
     Parameters
     ----------
@@ -377,31 +277,36 @@ def plot_var_independent(param_name,
         Information for plotting the fits of a single dimension.
     fit : Fit
         Holds data and information about the fit.
-    probabilistic_model : ProbabilisticModel
-        Probabilistic model that was created based on that fit.
+
+    Returns
+    -------
+    specs : list of dict
     """
+    from viroconcom.distributions import ParametricDistribution
+
     basic_fit = fit_inspection_data.get_basic_fit(param_name, 0)
     interval_limits = []
     param_index = ParametricDistribution.param_name_to_index(param_name)
     parent_index = fit.mul_var_dist.dependencies[dim_index][param_index]
     symbol_parent_var = None
-    plot_pdf_with_raw_data(dim_index,
-                           parent_index,
-                           0,
-                           basic_fit.shape,
-                           basic_fit.loc,
-                           basic_fit.scale,
-                           fit.mul_var_dist.distributions[dim_index].name,
-                           basic_fit.samples,
-                           interval_limits,
-                           var_names[dim_index],
-                           symbol_parent_var,
-                           probabilistic_model)
-
-
-def plot_fit(fit, var_names, var_symbols, directory, probabilistic_model):
+    return [pdf_with_raw_data_spec(
+        dim_index,
+        parent_index,
+        0,
+        basic_fit.shape,
+        basic_fit.loc,
+        basic_fit.scale,
+        fit.mul_var_dist.distributions[dim_index].name,
+        basic_fit.samples,
+        interval_limits,
+        var_names[dim_index],
+        symbol_parent_var,
+        {'column': dim_index, 'parent_column': None})]
+
+
+def fit_render_specs(fit, var_names, var_symbols):
     """
-    Visualize a fit generated by the virconcom package.
+    Creates the render specs of all images, which visualize a fit.
 
     Parameters
     ----------
@@ -411,80 +316,149 @@ def plot_fit(fit, var_names, var_symbols, directory, probabilistic_model):
         The list contains the names of distributions
     var_symbols : list of str
         The symbols of the distribution.
-    directory : str
-        Path to the directory where the images will be stored.
-    probabilistic_model : ProbabilisticModel
-       Model for a multivariate distribution, e.g. a sea state description.
-    """
-    directory = directory + '/' + str(probabilistic_model.pk)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
 
+    Returns
+    -------
+    specs : list of dict,
+        The render specs in the order the images are shown.
+    """
+    specs = []
     for i, fit_inspection_data in enumerate(fit.multiple_fit_inspection_data):
         do_independent_plot = True
         do_dependent_plot = True
 
         # Scale
         if fit_inspection_data.scale_at is not None:
-            plot_var_dependent(fit,
-                               'scale',
-                               i,
-                               var_names,
-                               var_symbols,
-                               probabilistic_model,
-                               do_dependent_plot
-                               )
+            specs += var_dependent_specs(fit,
+                                         'scale',
+                                         i,
+                                         var_names,
+                                         var_symbols,
+                                         do_dependent_plot)
             do_dependent_plot = False
         else:
-            plot_var_independent('scale',
-                                 i,
-                                 var_names,
-                                 fit_inspection_data,
-                                 fit,
-                                 probabilistic_model)
+            specs += var_independent_specs('scale',
+                                           i,
+                                           var_names,
+                                           fit_inspection_data,
+                                           fit)
             do_independent_plot = False
 
         # Shape
         if fit.mul_var_dist.distributions[i].name != 'Normal':
             if fit_inspection_data.shape_at is not None:
-                plot_var_dependent(fit,
-                                   'shape',
-                                   i,
-                                   var_names,
-                                   var_symbols,
-                                   probabilistic_model,
-                                   do_dependent_plot
-                                   )
+                specs += var_dependent_specs(fit,
+                                             'shape',
+                                             i,
+                                             var_names,
+                                             var_symbols,
+                                             do_dependent_plot)
                 do_dependent_plot = False
             elif do_independent_plot:
-                plot_var_independent('shape',
-                                     i,
-                                     var_names,
-                                     fit_inspection_data,
-                                     fit,
-                                     probabilistic_model
-                )
+                specs += var_independent_specs('shape',
+                                               i,
+                                               var_names,
+                                               fit_inspection_data,
+                                               fit)
                 do_independent_plot = False
 
         # Location
         if fit.mul_var_dist.distributions[i].name != 'Lognormal':
             if fit_inspection_data.loc_at is not None:
-                plot_var_dependent(fit,
-                                   'loc',
-                                   i,
-                                   var_names,
-                                   var_symbols,
-                                   probabilistic_model,
-                                   do_dependent_plot
-                )
+                specs += var_dependent_specs(fit,
+                                             'loc',
+                                             i,
+                                             var_names,
+                                             var_symbols,
+                                             do_dependent_plot)
             elif do_independent_plot:
-                plot_var_independent('loc',
-                                     i,
-                                     var_names,
-                                     fit_inspection_data,
-                                     fit,
-                                     probabilistic_model
-                                     )
+                specs += var_independent_specs('loc',
+                                               i,
+                                               var_names,
+                                               fit_inspection_data,
+                                               fit)
+    return specs
+
+
+@timed_stage('plot_fit')
+def plot_fit(fit, var_names, var_symbols, directory, probabilistic_model):
+    """
+    Visualize a fit generated by the virconcom package.
+
+    First, the render specs of all images are collected. Then, the images are
+    rendered in parallel (see figure_rendering.py) and finally, all
+    PlottedFigure objects are created with a single query.
+
+    If LAZY_FIGURES is True, the images are not rendered here. Instead, the
+    PlottedFigure objects hold the render specs and the images are rendered
+    on first access (see lazy_figures.py).
+
+    Parameters
+    ----------
+    fit : Fit
+        Holds data and information about the fit.
+    var_names : list of str
+        The list contains the names of distributions
+    var_symbols : list of str
+        The symbols of the distribution.
+    directory : str
+        Path to the directory where the images will be stored.
+    probabilistic_model : ProbabilisticModel
+       Model for a multivariate distribution, e.g. a sea state description.
+    """
+    directory = directory + '/' + str(probabilistic_model.pk)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    specs = fit_render_specs(fit, var_names, var_symbols)
+
+    dists_models = list(DistributionModel.objects.filter(
+        probabilistic_model=probabilistic_model).order_by('pk'))
+    param_models = {}
+    for param_model in ParameterModel.objects.filter(
+            distribution__in=dists_models):
+        param_models[(param_model.distribution_id, param_model.name)] = \
+            param_model
+
+    if settings.LAZY_FIGURES:
+        pngs = [None] * len(specs)
+    else:
+        pngs = render_figures(specs)
+        increment('viroconweb_figures_rendered_total', len(pngs))
+        increment('viroconweb_media_written_bytes_total',
+                  sum(len(png) for png in pngs), kind='figure')
+
+    plotted_figures = []
+    for spec, png in zip(specs, pngs):
+        distribution_model = dists_models[spec['dim_index']]
+        if spec['param_name'] is not None:
+            parameter_model = param_models[
+                (distribution_model.pk, spec['param_name'])]
+        else:
+            parameter_model = None
+        if png is None:
+            samples_slice = spec.pop('samples_slice', None)
+            if samples_slice is not None:
+                # Store a reference to the data instead of the data itself.
+                del spec['dist_points']
+                spec['samples_ref'] = dict(
+                    samples_slice,
+                    measure_file_model=probabilistic_model.measure_file_model_id)
+            plotted_figure = lazy_plotted_figure(
+                spec,
+                probabilistic_model=probabilistic_model,
+                distribution_model=distribution_model,
+                parameter_model=parameter_model)
+        else:
+            plotted_figure = PlottedFigure(
+                probabilistic_model=probabilistic_model,
+                distribution_model=distribution_model,
+                parameter_model=parameter_model)
+            # Uploads the image, the object itself is saved below.
+            plotted_figure.image.save(spec['file_name'], ContentFile(png),
+                                      save=False)
+        plotted_figures.append(plotted_figure)
+    PlottedFigure.objects.bulk_create(plotted_figures)
 
 
 def calculate_intervals(interval_centers, dimension_index,
@@ -546,9 +520,12 @@ def is_legit_distribution_parameter_index(distribution_name, index):
         return False
 
 
+@timed_stage('plot_contour')
 def plot_contour(contour_coordinates, user, environmental_contour, var_names):
     """
-    The function plots a png image of a contour.
+    Creates the PlottedFigure, which shows a contour.
+
+    The image is rendered on first access, see lazy_figures.py.
 
     Parameters
     ----------
@@ -560,81 +537,33 @@ def plot_contour(contour_coordinates, user, environmental_contour, var_names):
         The model object contains all information about a environmental contour.
     var_names: list of str
       Name of the variables of the probabilistic model
+
+    Returns
+    -------
+    plotted_figure : PlottedFigure,
+        The saved figure.
     """
     probabilistic_model = environmental_contour.probabilistic_model
 
-    path = settings.PATH_MEDIA + settings.PATH_USER_GENERATED + str(user)
-    if not os.path.exists(path):
-        os.makedirs(path)
-
-    fig = plt.figure()
-
-    if len(contour_coordinates[0]) == 2:
-        ax = fig.add_subplot(111)
-
-        # Plot raw data
-        if (probabilistic_model.measure_file_model):
-            data_path = probabilistic_model.measure_file_model.measure_file.url
-            if data_path[0] == '/':
-                data_path = data_path[1:]
-            data = pd.read_csv(data_path, sep=';', header=NR_LINES_HEADER-1).as_matrix()
-            ax.scatter(data[:, 0], data[:, 1], s=5, c='k',
-                       label='measured/simulated data')
-
-        # Plot the contour as a scatter plot and a line connecting the dots
-        alpha = .1
-        for i in range(len(contour_coordinates)):
-            ax.scatter(contour_coordinates[i][0], contour_coordinates[i][1],
-                       s=15, c='b',
-                       label='extreme env. design condition')
-            try:
-                concave_hull, edge_points = alpha_shape(
-                    convert_ndarray_list_to_multipoint(contour_coordinates[i]),
-                    alpha=alpha)
-                patch_design_region = PolygonPatch(
-                    concave_hull, fc='#999999', linestyle='None', fill=True,
-                    zorder=-2, label='design region')
-                patch_environmental_contour = PolygonPatch(
-                    concave_hull, ec='b', fill=False, zorder=-1,
-                    label='environmental contour')
-                ax.add_patch(patch_design_region)
-                ax.add_patch(patch_environmental_contour)
-            except(ZeroDivisionError): # alpha_shape() can throw these
-                print('Encountered a ZeroDivisionError when using alpha_shape.'
-                      'Consequently no contour is plotted.')
-
-        plt.legend(loc='lower right')
-        plt.xlabel('{}'.format(var_names[0]))
-        plt.ylabel('{}'.format(var_names[1]))
-    elif len(contour_coordinates[0]) == 3:
-        ax = fig.add_subplot(1, 1, 1, projection='3d')
-        ax.scatter(contour_coordinates[0][0], contour_coordinates[0][1],
-                   contour_coordinates[0][2], marker='o', c='r')
-        ax.set_xlabel('{}'.format(var_names[0]))
-        ax.set_ylabel('{}'.format(var_names[1]))
-        ax.set_zlabel('{}'.format(var_names[2]))
-    else:
-        ax = fig.add_subplot(111)
-        plt.figtext(0.5, 0.5, '4-Dim plot is not supported')
-        warnings.warn("4-Dim plot or higher is not supported",
-                      DeprecationWarning, stacklevel=2)
-
-    ax.grid(True)
-
     directory = settings.PATH_MEDIA + settings.PATH_USER_GENERATED + user + \
         '/contour/' + str(environmental_contour.pk) + '/'
     if not os.path.exists(directory):
         os.makedirs(directory)
-    # For the following block thanks to: https://stackoverflow.com/questions/
-    # 20580179/saving-a-matplotlib-graph-as-an-image-field-in-database
-    f = BytesIO()
-    plt.savefig(f, bbox_inches='tight')
-    plt.close(fig)
-    content_file = ContentFile(f.getvalue())
-    plotted_figure = PlottedFigure(environmental_contour=environmental_contour)
-    file_name = 'contour.png'
-    plotted_figure.image.save(file_name, content_file)
+
+    spec = {'kind': 'contour',
+            'file_name': 'contour.png',
+            'var_names': var_names,
+            'data_ref': {'measure_file_model':
+                             probabilistic_model.measure_file_model_id}}
+    if settings.DO_SAVE_CONTOUR_COORDINATES_IN_DB:
+        spec['contour_ref'] = {'environmental_contour':
+                                   environmental_contour.pk}
+    else:
+        spec['contour_coordinates'] = contour_coordinates
+    plotted_figure = lazy_plotted_figure(
+        spec, environmental_contour=environmental_contour)
     plotted_figure.save()
+    return plotted_figure
 
 
 def plot_data_set_as_scatter(measure_file_model, var_names):
@@ -652,34 +581,41 @@ def plot_data_set_as_scatter(measure_file_model, var_names):
         The names of the variables (each column in the measurement file
         represents one environmental variable).
     """
-    fig = plt.figure(figsize=(7.5, 5.5*(len(var_names)-1)))
-    data_path = measure_file_model.measure_file.url
-    if data_path[0] == '/':
-        data_path = data_path[1:]
-
-    # For some reason here the header parameter must be the number of lines
-    # of the header - 1, consequently 1. There was a bug related to this,
-    # as the first data row was ignored, see issue #20.
-    data = pd.read_csv(data_path, sep=';', header=NR_LINES_HEADER-1).as_matrix()
-
-    # Plot all variables against the first variable. This is done in subplots
-    # such that only a single figure is generated.
-    for i in range(len(var_names) - 1):
-        ax = fig.add_subplot(len(var_names) - 1, 1, i + 1)
-        ax.scatter(data[:, 0], data[:, i + 1], s=5, c='k')
-        ax.set_xlabel('{}'.format(var_names[0]))
-        ax.set_ylabel('{}'.format(var_names[i + 1]))
-        if i == 0:
-            plt.title('measurement file: ' + measure_file_model.title)
-
-    # For the following block thanks to: https://stackoverflow.com/questions/
-    # 20580179/saving-a-matplotlib-graph-as-an-image-field-in-database
-    f = BytesIO()
-    plt.savefig(f, bbox_inches='tight')
-    plt.close(fig)
-    content_file = ContentFile(f.getvalue())
+    # All variables are plotted against the first variable. This is done in
+    # subplots such that only a single figure is generated.
+    png = render_figure({'kind': 'data_set_scatter',
+                         'columns': load_columns(measure_file_model),
+                         'var_names': var_names,
+                         'title': 'measurement file: ' +
+                                  measure_file_model.title})
+    content_file = ContentFile(png)
     measure_file_model.scatter_plot.save('scatter_plot.png', content_file)
     measure_file_model.save()
+    increment('viroconweb_figures_rendered_total')
+    increment('viroconweb_media_written_bytes_total', len(png),
+              kind='figure')
+
+
+def local_figure_path(plotted_figure, directory):
+    """
+    Returns a path on the local file system, where the image of a
+    PlottedFigure can be read, e.g. by pdflatex.
+
+    Parameters
+    ----------
+    plotted_figure : PlottedFigure,
+        The figure, its image must be rendered.
+    directory : str,
+        The directory the image is copied to if it is stored on Amazon S3.
+
+    Returns
+    -------
+    path : str
+    """
+    image = plotted_figure.image
+    return local_media_path(image.name,
+                            directory + os.path.basename(image.name),
+                            image.storage)
 
 
 def create_latex_report(contour_coordinates, user, environmental_contour,
@@ -728,16 +664,19 @@ def create_latex_report(contour_coordinates, user, environmental_contour,
     full_file_path_report = settings.PATH_MEDIA + short_file_path_report
 
 
-    plot_contour(contour_coordinates, user, environmental_contour, var_names)
-
+    # The figure is created when the contour is calculated (see jobs.py).
     pf_contour = PlottedFigure.objects.filter(
         environmental_contour=environmental_contour).first()
-    # Download the image from Amazon S3 since latex needs a local version
-    url_contour_image = pf_contour.image.url
-    local_path_contour_image = full_directory_contour + \
-                               os.path.split(url_contour_image)[1]
-    if USE_S3:
-        request.urlretrieve(url_contour_image, local_path_contour_image)
+    if pf_contour is None:
+        pf_contour = plot_contour(contour_coordinates, user,
+                                  environmental_contour, var_names)
+    # The images are evicted when the report is compiled, otherwise an image,
+    # which was rendered for the report, could be deleted before it is read.
+    report_figures = [pf_contour]
+    ensure_rendered(pf_contour, evict=False)
+    # latex needs a local version of images, which are stored on Amazon S3.
+    local_path_contour_image = local_figure_path(pf_contour,
+                                                 full_directory_contour)
 
     latex_content = r"\section{Results} " \
                     r"\subsection{Environmental contour}" \
@@ -756,31 +695,25 @@ def create_latex_report(contour_coordinates, user, environmental_contour,
                          probabilistic_model.measure_file_model.title + \
                          r"|' \subsection{Fitting}"
 
+        for plotted_figure in PlottedFigure.objects.filter(
+                probabilistic_model=probabilistic_model):
+            ensure_rendered(plotted_figure, evict=False)
+            report_figures.append(plotted_figure)
         figure_collections = sort_plotted_figures(probabilistic_model)
 
         for figure_collection in figure_collections:
             latex_content += str(figure_collection.var_number) + r". Variable "
             latex_content += adjust_param_name_latex(figure_collection.param_name)
-            url_plotted_figure = figure_collection.param_image.image.url
-            local_path_plotted_figure = full_directory_prob_model + \
-                                        os.path.split(url_plotted_figure)[1]
-            if USE_S3:
-                request.urlretrieve(url_plotted_figure,
-                                    local_path_plotted_figure
-                                    )
+            local_path_plotted_figure = local_figure_path(
+                figure_collection.param_image, full_directory_prob_model)
             latex_content += r"\begin{figure}[H]"
             latex_content += r"\includegraphics[width=\textwidth]{" + \
                              local_path_plotted_figure + r"}"
             latex_content += r"\end{figure}"
 
             for pdf_image in figure_collection.pdf_images:
-                url_plotted_figure = pdf_image.image.url
-                local_path_plotted_figure = full_directory_prob_model + \
-                                            os.path.split(url_plotted_figure)[1]
-                if USE_S3:
-                    request.urlretrieve(url_plotted_figure,
-                                        local_path_plotted_figure
-                                        )
+                local_path_plotted_figure = local_figure_path(
+                    pdf_image, full_directory_prob_model)
                 latex_content += r"\begin{figure}[H]"
                 latex_content += r"\includegraphics[width=\textwidth]{" + \
                                  local_path_plotted_figure + r"}"
@@ -837,19 +770,12 @@ def create_latex_report(contour_coordinates, user, environmental_contour,
     )
     template = get_template('contour/latex_report.tex')
     rendered_tpl = template.render(render_dict).encode('utf-8')
-    with tempfile.TemporaryDirectory() as tempdir:
-        # Create subprocess, supress output with PIPE and
-        # run latex twice to generate the TOC properly.
-        # Finally read the generated pdf.
-        for i in range(2):
-            process = Popen(
-                ['pdflatex', '--shell-escape', '-output-directory', tempdir],
-                stdin=PIPE,
-                stdout=PIPE,
-            )
-            process.communicate(rendered_tpl)
-        with open(os.path.join(tempdir, 'texput.pdf'), 'rb') as f:
-            pdf = f.read()
+    try:
+        pdf = compile_latex(rendered_tpl)
+    finally:
+        for owner in set(figure_owner(plotted_figure)
+                         for plotted_figure in report_figures):
+            evict_rendered_figures(owner)
 
     if not os.path.exists(full_directory_contour):
         os.makedirs(full_directory_contour)
@@ -859,8 +785,8 @@ def create_latex_report(contour_coordinates, user, environmental_contour,
         environmental_contour.latex_report.save(
             settings.LATEX_REPORT_NAME, djangofile)
         environmental_contour.save()
-
-    create_design_conditions_csv(contour_coordinates, environmental_contour)
+    increment('viroconweb_media_written_bytes_total', len(pdf),
+              kind='report')
 
     return short_file_path_report
 
@@ -985,19 +911,13 @@ def create_design_conditions_csv(contour_coordinates, environmental_contour):
         The django model of the environmental contour.
 
     """
-    file_content_as_string = ""
-    for i in range(len(contour_coordinates)):
-        for j in range(len(contour_coordinates[0][0])):
-            for k in range(len(contour_coordinates[0])):
-                file_content_as_string += str(contour_coordinates[i][k][j])
-                if k < (len(contour_coordinates[0]) - 1):
-                    file_content_as_string += ";"
-            file_content_as_string += "\n"
-    content_bytes = file_content_as_string.encode('utf-8')
+    content_bytes = b''.join(iter_csv(contour_coordinates))
     content_file = ContentFile(content_bytes)
     environmental_contour.design_conditions_csv.save(
         settings.EEDC_FILE_NAME, content_file)
     environmental_contour.save()
+    increment('viroconweb_media_written_bytes_total', len(content_bytes),
+              kind='design_conditions')
 
 
 def assign_parameter_name(dist_name, param_name):
@@ -1113,7 +1033,8 @@ def sort_plotted_figures(probabilistic_model):
                 # image url includes the String 'None' then the image shows
                 # fitted distribution of all independent parameters. Both types
                 # of images will be appended to the param_images list.
-                if plotted_figure.parameter_model or 'None' in plotted_figure.image.url:
+                if plotted_figure.parameter_model or \
+                        'None' in plotted_figure.figure_name():
                     param_images.append(plotted_figure)
                 else:
                     pdf_images.append(plotted_figure)
@@ -1124,7 +1045,7 @@ def sort_plotted_figures(probabilistic_model):
                 figure_collection.param_image = param
                 # Filter the independent distribution plot of the fitted
                 # parameters.
-                if 'None' in param.image.url:
+                if 'None' in param.figure_name():
                     figure_collection.param_name = 'independent parameter'
                 else:
                     figure_collection.pdf_images = pdf_images
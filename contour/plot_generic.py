@@ -1,13 +1,11 @@
 """
 Generic plotting methods.
 """
-from shapely.ops import cascaded_union, polygonize
+from shapely.ops import unary_union, polygonize
 from scipy.spatial import Delaunay
 import shapely.geometry as geometry
 import numpy as np
-import math
 from shapely.geometry import MultiPoint
-from shapely.geometry import Point
 import warnings
 
 # Based on: http://blog.thehumangeo.com/2014/05/12/drawing-boundaries-in-python
@@ -15,10 +13,16 @@ def alpha_shape(points, alpha):
     """
     Computes the alpha shape (concave hull) of a set of points
 
+    The alpha shape is the union of all Delaunay triangles whose circumradius
+    is smaller than 1 / alpha. Holes in this union are filled. All triangles
+    are evaluated at once with numpy. Only the boundary of the union, i.e.
+    the edges which belong to exactly one of these triangles, is converted to
+    shapely objects.
+
     Parameters
     ----------
-    points : MultiPoint,
-        Iterable container of points.
+    points : MultiPoint or array_like,
+        The points, either as a MultiPoint or as an array with shape (n, 2).
     alpha : float,
         Alpha value to influence the gooeyness of the border. Smaller numbers
         don't fall inward as much as larger numbers. Too large and you lose
@@ -26,57 +30,87 @@ def alpha_shape(points, alpha):
 
     Returns
     -------
-
+    concave_hull : Polygon or MultiPolygon,
+        The alpha shape. If less than 4 points are given, it is the convex
+        hull of the points.
+    edge_points : ndarray,
+        The boundary edges of the alpha shape with shape (m, 2, 2), i.e.
+        the coordinates of the two end points of each edge.
     """
-    if len(points) < 4:
+    if isinstance(points, MultiPoint):
+        coords = np.array([point.coords[0] for point in points.geoms])
+    else:
+        coords = np.asarray(points, dtype=float)
+    if len(coords) < 4:
         # When you have a triangle, there is no sense
         # in computing an alpha shape.
-        return geometry.MultiPoint(list(points)).convex_hull
-
-    def add_edge(edges, edge_points, coords, i, j):
-        """
-        Add a line between the i-th and j-th points,
-        if not in the list already
-        """
-        if (i, j) in edges or (j, i) in edges:
-            # already added
-            return
-        edges.add( (i, j) )
-        edge_points.append(coords[ [i, j] ])
-    coords = np.array([point.coords[0]
-                       for point in points])
+        return geometry.MultiPoint(coords.tolist()).convex_hull, \
+               np.empty((0, 2, 2))
+
     tri = Delaunay(coords)
-    edges = set()
-    edge_points = []
-    # loop over triangles:
-    # ia, ib, ic = indices of corner points of the
-    # triangle
-    for ia, ib, ic in tri.vertices:
-        pa = coords[ia]
-        pb = coords[ib]
-        pc = coords[ic]
-        # Lengths of sides of triangle
-        a = math.sqrt((pa[0]-pb[0])**2 + (pa[1]-pb[1])**2)
-        b = math.sqrt((pb[0]-pc[0])**2 + (pb[1]-pc[1])**2)
-        c = math.sqrt((pc[0]-pa[0])**2 + (pc[1]-pa[1])**2)
-        # Semiperimeter of triangle
-        s = (a + b + c)/2.0
-        # Area of triangle by Heron's formula
-        area = math.sqrt(s*(s-a)*(s-b)*(s-c))
-        circum_r = a*b*c/(4.0*area)
-        # Here's the radius filter.
-        #print circum_r
-        if circum_r < 1.0/alpha:
-            add_edge(edges, edge_points, coords, ia, ib)
-            add_edge(edges, edge_points, coords, ib, ic)
-            add_edge(edges, edge_points, coords, ic, ia)
-    m = geometry.MultiLineString(edge_points)
-    triangles = list(polygonize(m))
-    return cascaded_union(triangles), edge_points
+    simplices = tri.simplices
+    pa = coords[simplices[:, 0]]
+    pb = coords[simplices[:, 1]]
+    pc = coords[simplices[:, 2]]
+    # Lengths of sides of the triangles
+    a = np.hypot(*(pa - pb).T)
+    b = np.hypot(*(pb - pc).T)
+    c = np.hypot(*(pc - pa).T)
+    # Area of the triangles based on the cross product, which, in contrast to
+    # Heron's formula, is not affected by cancellation for flat triangles.
+    area = 0.5 * np.abs((pb[:, 0] - pa[:, 0]) * (pc[:, 1] - pa[:, 1]) -
+                        (pb[:, 1] - pa[:, 1]) * (pc[:, 0] - pa[:, 0]))
+    # Degenerated triangles have an infinite circumradius.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        circum_r = a * b * c / (4.0 * area)
+    # Here's the radius filter.
+    is_in_shape = circum_r < 1.0 / alpha
+    kept = simplices[is_in_shape]
+    if len(kept) == 0:
+        return geometry.GeometryCollection(), np.empty((0, 2, 2))
+
+    # An edge belongs to the boundary if it is part of exactly one triangle.
+    edges = np.concatenate((kept[:, [0, 1]], kept[:, [1, 2]],
+                            kept[:, [2, 0]]))
+    edges = np.sort(edges, axis=1)
+    # Each edge is encoded as a single integer, which is much faster to
+    # de-duplicate than pairs of indices.
+    keys = edges[:, 0].astype(np.int64) * len(coords) + edges[:, 1]
+    keys, counts = np.unique(keys, return_counts=True)
+    boundary_keys = keys[counts == 1]
+    boundary_edges = np.column_stack((boundary_keys // len(coords),
+                                      boundary_keys % len(coords)))
+    edge_points = coords[boundary_edges]
+
+    # Polygonizing the boundary gives the faces of the alpha shape and of its
+    # holes. Their union is the alpha shape with filled holes.
+    faces = polygonize(geometry.MultiLineString(edge_points.tolist()))
+    return unary_union(list(faces)), edge_points
+
+
+def contour_path_to_points(ndarray_list):
+    """
+    Converts the coordinates of a contour path to an array of points.
+
+    Parameters
+    ----------
+    ndarray_list : list of ndarray,
+        One array per dimension, as returned by compute_interface.iform().
+
+    Returns
+    -------
+    points : ndarray,
+        The points with shape (n, number of dimensions), which can be passed
+        to alpha_shape.
+    """
+    return np.column_stack(ndarray_list)
+
 
 def convert_ndarray_list_to_multipoint(ndarray_list):
     """
-    Converts an array list to a MultiPoint, which is required by alpha_shape
+    Converts an array list to a MultiPoint.
+
+    alpha_shape accepts arrays directly, see contour_path_to_points.
 
     Parameters
     ----------
@@ -91,14 +125,8 @@ def convert_ndarray_list_to_multipoint(ndarray_list):
         The data points as an MultiPoint object such that the method
         alpha_shape can work with it.
     """
-    points_list = []
     data_dimension = len(ndarray_list)
-    for i in range(len(ndarray_list[0])):
-        if data_dimension == 2:
-            points_list.append(Point(ndarray_list[0][i], ndarray_list[1][i]))
-        elif data_dimension == 3:
-            points_list.append(Point(ndarray_list[0][i], ndarray_list[1][i], ndarray_list[2][i]))
-        else:
-            warnings.warn("4-Dim plot or higher is not supported", DeprecationWarning)
-    points = MultiPoint(points_list)
-    return points
+    if data_dimension > 3:
+        warnings.warn("4-Dim plot or higher is not supported", DeprecationWarning)
+        return MultiPoint()
+    return MultiPoint(contour_path_to_points(ndarray_list).tolist())
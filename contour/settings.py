@@ -3,11 +3,19 @@ Settings for the contour app.
 
 These constants are used in different modules of the contour package.
 """
+import os
+
 from viroconweb.settings import RUN_MODE
 
 PATH_MEDIA = 'contour/media/'
 PATH_USER_GENERATED = 'user_generated/'
 PATH_MEASUREMENT = 'measurement/'
+# Uploaded measurement files are stored once per content, named by their
+# SHA-256, in PATH_MEASUREMENT_BLOBS (see measure_file_blobs.py). The columnar
+# caches of these files are stored in MEASURE_FILE_BLOB_CACHE_DIRECTORY and are
+# shared by all MeasureFileModels of the same content.
+PATH_MEASUREMENT_BLOBS = 'measurement_blobs/'
+MEASURE_FILE_BLOB_CACHE_DIRECTORY = PATH_MEDIA + 'cache/measurement_blobs/'
 PATH_PROB_MODEL = 'prob_model/'
 PATH_CONTOUR = 'contour/'
 LATEX_REPORT_NAME = 'latex_report.pdf'
@@ -25,12 +33,177 @@ if RUN_MODE == 'production':
 else:
     MAX_COMPUTING_TIME = 120.0
 
-# Saving all coordinates to the database is slow since a lot of operations
-# might be necessary. Consequenetly, this can be turned off.
-DO_SAVE_CONTOUR_COORDINATES_IN_DB = False
+# Fits and contour calculations are run as ComputeJobs. If USE_COMPUTE_WORKER is
+# True, a separate worker process (python manage.py compute_worker) executes
+# them and no web request has to wait for a computation. Otherwise, the job is
+# executed directly within the request, which is convenient for local
+# development and for the tests.
+USE_COMPUTE_WORKER = RUN_MODE != 'local-dev'
+
+# Jobs executed by the worker are not bound to Heroku's request timeout and
+# can consequently be given more time.
+MAX_COMPUTING_TIME_QUEUED = 600.0
+
+# If USE_PARALLEL_FIT is True, the single distribution fits of a fit, i.e.
+# per dimension and per interval, are spread across a pool of FIT_N_WORKERS
+# processes, which is created once per process (see parallel_fit.py). None
+# uses one process per CPU. It is only used with the viroconcom version it was
+# checked against, otherwise viroconcom's Fit is used.
+USE_PARALLEL_FIT = False
+FIT_N_WORKERS = None
+
+# Number of MultivariateDistribution objects, which every process keeps in
+# memory such that they are not built again from the data base (see
+# compute_interface.setup_mul_dist()).
+MUL_DIST_CACHE_SIZE = 64
+
+# If LAZY_FIGURES is False, the figures, which visualize a fit, are rendered
+# when the fit is saved, in a pool of FIGURE_RENDER_N_WORKERS processes, which
+# is created once per process (see figure_rendering.py). 1 renders the figures
+# in the current process.
+FIGURE_RENDER_N_WORKERS = 4
+
+# Measured data with more than SCATTER_MAX_POINTS points is not drawn as
+# scatter plot, but as image of the number of points in each cell of a grid
+# with DENSITY_RASTER_N_BINS cells per axis (see figure_rendering.py).
+SCATTER_MAX_POINTS = 100000
+DENSITY_RASTER_N_BINS = 300
+
+# Figures are rendered without a display, thus matplotlib's backend is pinned
+# instead of probing the available GUI backends.
+MATPLOTLIB_BACKEND = 'Agg'
+
+# Modules, whose import time is measured by "python manage.py import_time".
+# The web workers import them on boot.
+IMPORT_TIME_MODULES = ['viroconweb.wsgi', 'viroconweb.urls']
+
+# Modules, which are slow to import and should only be imported when they are
+# used, i.e. not when a web worker boots.
+HEAVY_MODULES = ['matplotlib', 'scipy', 'pandas', 'shapely', 'statsmodels',
+                 'viroconcom.fitting', 'viroconcom.distributions']
+
+# Sizes of the synthetic data sets "python manage.py benchmark" runs the fit,
+# contour and report pipeline on. The objects it creates belong to the user
+# BENCHMARK_USER_NAME and are deleted afterwards.
+BENCHMARK_N_ROWS = [10000, 1000000, 10000000]
+BENCHMARK_N_DIMENSIONS = [2, 3, 4]
+BENCHMARK_USER_NAME = 'benchmark'
+BENCHMARK_IFORM_N_STEPS = 50
+BENCHMARK_HDC_N_CELLS = 100000
+
+# The durations of the stages of requests and jobs are saved if
+# SAVE_STAGE_TIMINGS is True (see timing.py). The admin page of StageTiming
+# shows the STAGE_TIMING_PERCENTILES of the last STAGE_TIMING_WINDOW_IN_DAYS.
+SAVE_STAGE_TIMINGS = True
+STAGE_TIMING_PERCENTILES = [50, 90, 99]
+STAGE_TIMING_WINDOW_IN_DAYS = 7
+
+# If COLLECT_METRICS is True, metrics are stored in the data base and are
+# exported at /metrics (see metrics.py). If METRICS_TOKEN is set, the
+# request needs the header 'Authorization: Bearer <METRICS_TOKEN>'.
+COLLECT_METRICS = True
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Upper bounds of the buckets of the duration histograms in seconds and of
+# the histogram of data base queries per request.
+METRICS_DURATION_BUCKETS = [0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300]
+METRICS_QUERY_COUNT_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Synthetic measurement files are sampled from a probabilistic model in
+# batches of SYNTHETIC_DATA_BATCH_SIZE samples (see synthetic_data.py).
+SYNTHETIC_DATA_BATCH_SIZE = 100000
+
+# A benchmark stage, which takes more than (1 + BENCHMARK_REGRESSION_TOLERANCE)
+# times as long as in the baseline run, is reported as a regression.
+BENCHMARK_REGRESSION_TOLERANCE = 0.2
+
+# If True, the figures of fits and contours are rendered when they are
+# requested for the first time (see lazy_figures.py).
+LAZY_FIGURES = True
+
+# Maximum disk space the rendered figures of a single user may take. If it is
+# exceeded, the least recently used figures are deleted and rendered again on
+# their next request.
+MAX_RENDERED_FIGURES_SIZE_PER_USER_IN_MIB = 100
+
+# Seconds the worker waits before it looks for a new job if the queue is empty.
+COMPUTE_WORKER_POLL_INTERVAL = 1.0
+
+# Seconds after which the status page of a queued job is reloaded.
+COMPUTE_JOB_REFRESH_INTERVAL = 2
+
+# Seconds after which a running job is considered abandoned, e.g. because its
+# worker was killed. It is then queued again unless it was claimed
+# COMPUTE_JOB_MAX_ATTEMPTS times already; in that case it fails.
+COMPUTE_JOB_CLAIM_TIMEOUT = 6 * MAX_COMPUTING_TIME_QUEUED
+COMPUTE_JOB_MAX_ATTEMPTS = 2
+
+# The coordinates of a contour are saved to the data base as one binary array
+# per contour path such that the contour can be loaded again without
+# recomputing it (see persistence.load_contour_coordinates()).
+DO_SAVE_CONTOUR_COORDINATES_IN_DB = True
+
+# Number of points, which are written at once when the design conditions are
+# exported (see design_conditions.py).
+DESIGN_CONDITIONS_CHUNK_ROWS = 10000
+
+# Number of objects, which are shown per page of an overview. The pages are
+# ordered from the newest to the oldest object.
+OVERVIEW_PAGE_SIZE = 50
 
 # Maximum file size in MiB of a measurement file that is allowed to be uploaded.
-MAX_FILE_SIZE_M_IN_MIB = 100
+MAX_FILE_SIZE_M_IN_MIB = 500
+
+# Uploaded measurement files are validated while they are read in chunks of
+# this size (in bytes). Lines must not be longer than MAX_LENGTH_CSV_LINE
+# characters.
+CSV_VALIDATION_CHUNK_SIZE = 64 * 1024
+MAX_LENGTH_CSV_LINE = 1024
 
 NR_LINES_HEADER = 2
+# Number of bytes, which are read to get the header of a measurement file,
+# whose metadata is not stored. The header's lines are not longer than
+# MAX_LENGTH_CSV_LINE characters.
+HEADER_READ_SIZE = 4 * 1024
 MAX_LENGTH_FILE_NAME = 120
+
+# At upload, each column of a measurement file is converted to a float64 .npy
+# file, which is memory-mapped by fits and plots (see measurement_data.py).
+COLUMNAR_CACHE_DIRECTORY_NAME = 'columns'
+COLUMNAR_CACHE_MANIFEST_NAME = 'manifest.json'
+# Number of rows, which are parsed at once when a measurement file is
+# converted.
+CSV_READ_CHUNK_SIZE = 100000
+
+# At upload, statistics of each measurement file are computed (see
+# column_statistics.py): Its columns' histograms have STATISTICS_N_BINS bins,
+# the 2-D histograms of each pair of columns have STATISTICS_N_BINS_2D bins
+# per axis. The quantiles are interpolated from histograms with
+# STATISTICS_N_BINS_QUANTILES bins.
+STATISTICS_N_BINS = 50
+STATISTICS_N_BINS_2D = 20
+STATISTICS_N_BINS_QUANTILES = 1000
+STATISTICS_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+# The default upper limit of a highest density contour's grid is the measured
+# maximum times HDC_DEFAULT_LIMIT_FACTOR. The grid has HDC_DEFAULT_N_STEPS
+# steps per variable.
+HDC_DEFAULT_LIMIT_FACTOR = 2
+HDC_DEFAULT_N_STEPS = 40
+# The default width of a fit's intervals divides the range between the 1 %
+# and the 99 % quantile in FIT_DEFAULT_N_INTERVALS intervals.
+FIT_DEFAULT_N_INTERVALS = 10
+
+# Fits are cached by the hash of the measured data and the fit settings (see
+# fit_cache.py). If the cache grows larger than FIT_CACHE_MAX_SIZE_IN_MIB, the
+# least recently used fits are deleted.
+FIT_CACHE_DIRECTORY = PATH_MEDIA + 'cache/fits/'
+FIT_CACHE_MAX_SIZE_IN_MIB = 500
+
+# Files of a remote storage, e.g. Amazon S3, are downloaded once and then
+# read from this cache (see media.py). If the cache grows larger than
+# MEDIA_CACHE_MAX_SIZE_IN_MIB, the least recently used files are deleted.
+MEDIA_CACHE_DIRECTORY = PATH_MEDIA + 'cache/media/'
+MEDIA_CACHE_MAX_SIZE_IN_MIB = 1000
+
+# The preamble of the latex report is compiled once into a format file, which
+# is stored here (see latex.py).
+LATEX_FORMAT_DIRECTORY = PATH_MEDIA + 'cache/latex/'
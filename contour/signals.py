@@ -1,9 +1,16 @@
 """
-Signals to correctly delete models and associated files.
+Signals to correctly delete models and associated files and to keep the
+specifications of probabilistic models up to date.
+
+The file of a MeasureFileModel, whose content is shared (see
+measure_file_blobs.py), is only deleted together with the content's last
+MeasureFileModel.
 """
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import MeasureFileModel, ProbabilisticModel, EnvironmentalContour
+from .models import MeasureFileModel, ProbabilisticModel, \
+    EnvironmentalContour, DistributionModel, ParameterModel
+from .measure_file_blobs import release_blob
 import os
 import shutil
 import warnings
@@ -65,7 +72,11 @@ def delete_file(sender, instance=None, **kwargs):
     if sender.__name__ in list_of_models:
         if hasattr(instance, 'path_of_statics') and instance.path_of_statics:
             _delete_file(instance, instance.path_of_statics)
-        if sender.__name__ == 'MeasureFileModel' and instance.measure_file:
+        if sender.__name__ == 'MeasureFileModel' and instance.blob_id:
+            release_blob(instance.blob_id)
+            if USE_S3 and instance.scatter_plot:
+                instance.scatter_plot.delete(save=False)
+        elif sender.__name__ == 'MeasureFileModel' and instance.measure_file:
             if USE_S3:
                 _delete_file(instance, path='S3')
             else:
@@ -80,3 +91,39 @@ def delete_file(sender, instance=None, **kwargs):
                 _delete_file(instance, path='S3')
             else:
                 _delete_file(instance, instance.latex_report.path)
+
+
+def _reset_spec(probabilistic_model_pk):
+    """
+    Empties the specification of a probabilistic model such that it is
+    created again from the changed distributions and parameters.
+
+    Parameters
+    ----------
+    probabilistic_model_pk : int,
+        Primary key of the probabilistic model.
+    """
+    ProbabilisticModel.objects.filter(pk=probabilistic_model_pk).update(
+        spec='', spec_hash='')
+
+
+@receiver(post_save, sender=DistributionModel)
+@receiver(post_delete, sender=DistributionModel)
+def distribution_model_changed(sender, instance=None, **kwargs):
+    """
+    Empties the specification of the distribution's probabilistic model.
+    """
+    _reset_spec(instance.probabilistic_model_id)
+
+
+@receiver(post_save, sender=ParameterModel)
+@receiver(post_delete, sender=ParameterModel)
+def parameter_model_changed(sender, instance=None, **kwargs):
+    """
+    Empties the specification of the parameter's probabilistic model.
+    """
+    probabilistic_model_pk = DistributionModel.objects.filter(
+        pk=instance.distribution_id).values_list(
+        'probabilistic_model_id', flat=True).first()
+    if probabilistic_model_pk is not None:
+        _reset_spec(probabilistic_model_pk)
@@ -0,0 +1,93 @@
+"""
+Generates synthetic measurement files by sampling from probabilistic models.
+
+The samples are drawn by inverse transform sampling along the model's chain
+of conditional distributions: The first variable is sampled from its
+marginal distribution, the following variables are sampled from their
+distributions conditioned on the already sampled variables. The samples are
+drawn and written in batches such that the memory needed does not depend on
+the number of samples.
+"""
+import numpy as np
+
+from .compute_interface import setup_mul_dist
+from .models import DistributionModel
+from .settings import SYNTHETIC_DATA_BATCH_SIZE
+
+# Number of decimal places of the written values.
+DECIMAL_PLACES = 6
+
+
+def iter_samples(probabilistic_model, n_samples, seed=0,
+                 batch_size=SYNTHETIC_DATA_BATCH_SIZE):
+    """
+    Draws samples from a probabilistic model in batches.
+
+    Parameters
+    ----------
+    probabilistic_model : ProbabilisticModel,
+        The probabilistic model to sample from.
+    n_samples : int,
+        Number of samples.
+    seed : int, optional
+        Seed of the random numbers. The same seed gives the same samples,
+        independent of the batch size. Defaults to 0.
+    batch_size : int, optional
+        Number of samples per batch. Defaults to SYNTHETIC_DATA_BATCH_SIZE.
+
+    Yields
+    ------
+    batch : numpy.ndarray,
+        Array of shape (number of samples in the batch, number of variables).
+    """
+    multivariate_distribution = setup_mul_dist(probabilistic_model)
+    distributions = multivariate_distribution.distributions
+    dependencies = multivariate_distribution.dependencies
+    random_state = np.random.RandomState(seed)
+    for start in range(0, n_samples, batch_size):
+        n = min(batch_size, n_samples - start)
+        # A probability of exactly 0 or 1 can lead to infinite values. The
+        # numbers are drawn row by row such that the batches together are
+        # the same as a single batch.
+        probabilities = random_state.uniform(np.finfo(float).tiny, 1,
+                                             (n, len(distributions))).T
+        rv_values = np.zeros((len(distributions), n))
+        # A distribution only depends on distributions with a lower index.
+        for i, distribution in enumerate(distributions):
+            rv_values[i] = distribution.i_cdf(probabilities[i], rv_values,
+                                              dependencies[i])
+        yield rv_values.T
+
+
+def write_measurement_file(f, probabilistic_model, n_samples, seed=0,
+                           batch_size=SYNTHETIC_DATA_BATCH_SIZE):
+    """
+    Writes samples of a probabilistic model as measurement file.
+
+    The file has the format, which validators.validate_csv_upload()
+    accepts: The first line holds the variable names, the second line the
+    variable symbols and every following line one sample, all separated by
+    ';'. As the format only allows non-negative numbers, negative samples,
+    e.g. of a normal distribution, are written as 0.
+
+    Parameters
+    ----------
+    f : file-like object,
+        The file, opened in text mode.
+    probabilistic_model : ProbabilisticModel,
+        The probabilistic model to sample from.
+    n_samples : int,
+        Number of samples.
+    seed : int, optional
+        Seed of the random numbers. Defaults to 0.
+    batch_size : int, optional
+        Number of samples per batch. Defaults to SYNTHETIC_DATA_BATCH_SIZE.
+    """
+    distribution_models = DistributionModel.objects.filter(
+        probabilistic_model=probabilistic_model)
+    f.write(';'.join(dist.name for dist in distribution_models) + '\n')
+    f.write(';'.join(dist.symbol for dist in distribution_models) + '\n')
+    for batch in iter_samples(probabilistic_model, n_samples, seed,
+                              batch_size):
+        np.savetxt(f, np.maximum(batch, 0),
+                   fmt='%.{}f'.format(DECIMAL_PLACES), delimiter=';')
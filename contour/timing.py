@@ -0,0 +1,224 @@
+"""
+Measures how long the stages of a request or a background job take.
+
+Stages, e.g. the contour calculation or pdflatex, are timed with the context
+manager stage() or the decorator timed_stage(). The timings are collected
+per request by StageTimingMiddleware and per job by jobs.run_job(). They are
+written as JSON log lines and saved as StageTiming objects, whose admin page
+shows percentiles per stage. Responses get a Server-Timing header, which
+browsers show in their developer tools.
+
+Outside of a request or a job, stages are not recorded.
+"""
+import datetime
+import functools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from django.utils import timezone
+
+from .models import StageTiming
+from .settings import SAVE_STAGE_TIMINGS, STAGE_TIMING_PERCENTILES, \
+    STAGE_TIMING_WINDOW_IN_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Holds the timings of the current thread's request or job.
+_local = threading.local()
+
+
+@contextmanager
+def stage(name):
+    """
+    Times a stage.
+
+    Parameters
+    ----------
+    name : str,
+        Name of the stage, e.g. 'pdflatex'. It must not contain spaces,
+        commas or semicolons as it is used in the Server-Timing header.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings.append((name, time.perf_counter() - start))
+
+
+def timed_stage(name):
+    """
+    Returns a decorator, which times each call of a function as stage.
+
+    Parameters
+    ----------
+    name : str,
+        Name of the stage, see stage().
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_timings():
+    """
+    Collects the timings of the stages, which run in the current thread.
+
+    If timings are collected already, e.g. if a job is executed within a
+    request, the outer collection records the stages and None is yielded.
+
+    Yields
+    ------
+    timings : list of tuple or None,
+        The stages' names and durations in seconds.
+    """
+    if getattr(_local, 'timings', None) is not None:
+        yield None
+        return
+    _local.timings = []
+    try:
+        yield _local.timings
+    finally:
+        _local.timings = None
+
+
+def sum_by_stage(timings):
+    """
+    Sums the durations of stages with the same name.
+
+    Parameters
+    ----------
+    timings : list of tuple,
+        The stages' names and durations in seconds.
+
+    Returns
+    -------
+    durations : OrderedDict,
+        The total duration per stage in seconds, in order of first
+        occurrence.
+    """
+    durations = OrderedDict()
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0) + seconds
+    return durations
+
+
+def server_timing_header(timings, total):
+    """
+    Formats timings as value of a Server-Timing header.
+
+    Parameters
+    ----------
+    timings : list of tuple,
+        The stages' names and durations in seconds.
+    total : float,
+        The duration of the whole request in seconds.
+
+    Returns
+    -------
+    header : str,
+        E.g. 'pdflatex;dur=812.4, total;dur=1003.2'. Durations are given in
+        milliseconds.
+    """
+    durations = sum_by_stage(timings)
+    durations['total'] = total
+    return ', '.join('{};dur={:.1f}'.format(name, seconds * 1000)
+                     for name, seconds in durations.items())
+
+
+def report_timings(source, timings, total, **fields):
+    """
+    Writes timings as JSON log line and saves them if SAVE_STAGE_TIMINGS is
+    True.
+
+    Parameters
+    ----------
+    source : str,
+        The request's path or the job, e.g. 'job:iform'.
+    timings : list of tuple,
+        The stages' names and durations in seconds.
+    total : float,
+        The duration of the whole request or job in seconds.
+    **fields
+        Further fields of the log line, e.g. the response's status.
+    """
+    durations = sum_by_stage(timings)
+    line = OrderedDict(source=source, total=total, stages=durations)
+    line.update(fields)
+    logger.info(json.dumps(line))
+    if SAVE_STAGE_TIMINGS:
+        StageTiming.objects.bulk_create(
+            [StageTiming(stage=name, seconds=seconds, source=source[:200])
+             for name, seconds in durations.items()])
+
+
+def stage_statistics(percentiles=STAGE_TIMING_PERCENTILES,
+                     window_in_days=STAGE_TIMING_WINDOW_IN_DAYS):
+    """
+    Computes percentiles of the saved timings per stage.
+
+    Parameters
+    ----------
+    percentiles : list of float, optional
+        The percentiles, e.g. [50, 90, 99]. Defaults to
+        STAGE_TIMING_PERCENTILES.
+    window_in_days : float, optional
+        Only timings of the last days are evaluated. Defaults to
+        STAGE_TIMING_WINDOW_IN_DAYS.
+
+    Returns
+    -------
+    statistics : list of dict,
+        One dict per stage with the keys 'stage', 'count', 'mean' and
+        'percentiles' (list of seconds), sorted by the stage's name.
+    """
+    since = timezone.now() - datetime.timedelta(days=window_in_days)
+    seconds_per_stage = OrderedDict()
+    for name, seconds in StageTiming.objects.filter(
+            created__gte=since).order_by('stage').values_list('stage',
+                                                              'seconds'):
+        seconds_per_stage.setdefault(name, []).append(seconds)
+    statistics = []
+    for name, seconds in seconds_per_stage.items():
+        statistics.append({'stage': name,
+                           'count': len(seconds),
+                           'mean': float(np.mean(seconds)),
+                           'percentiles': [float(value) for value in
+                                           np.percentile(seconds,
+                                                         percentiles)]})
+    return statistics
+
+
+class StageTimingMiddleware:
+    """
+    Collects the timings of a request's stages.
+
+    If stages were timed, the timings are reported (see report_timings()).
+    The Server-Timing header is added to every response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect_timings() as timings:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        response['Server-Timing'] = server_timing_header(timings, total)
+        if timings:
+            report_timings(request.path, timings, total,
+                           method=request.method,
+                           status=response.status_code)
+        return response
@@ -13,6 +13,7 @@ app_name = 'contour'
 
 urlpatterns = [
     url(r'^$', views.index, name='index'),
+    url(r'^metrics$', views.metrics, name='metrics'),
 
     # --------------------------------------------------------------------------
     # EnvironmentalContour
@@ -28,6 +29,15 @@ urlpatterns = [
         views.EnvironmentalContourHandler.delete,
         name='environmental_contour_delete'),
 
+    url(r'^contours/(?P<pk>[0-9]+)/design_conditions\.'
+        r'(?P<file_format>csv|csv\.gz|npy|json)$',
+        views.EnvironmentalContourHandler.design_conditions,
+        name='environmental_contour_design_conditions'),
+
+    url(r'^contours/(?P<pk>[0-9]+)/report\.pdf$',
+        views.EnvironmentalContourHandler.report,
+        name='environmental_contour_report'),
+
     url(r'^contours/overview$',
         views.EnvironmentalContourHandler.overview,
         name='environmental_contour_overview'),
@@ -99,4 +109,16 @@ urlpatterns = [
     url(r'^measurefiles/(?P<pk>[0-9]+)/plot$',
         views.MeasureFileHandler.plot_file,
         name='measure_file_model_plot'),
+
+    # --------------------------------------------------------------------------
+    # ComputeJob
+    url(r'^jobs/(?P<pk>[0-9]+)/$',
+        views.ComputeJobHandler.show,
+        name='compute_job_show'),
+
+    # --------------------------------------------------------------------------
+    # PlottedFigure
+    url(r'^figures/(?P<pk>[0-9]+)/image.png$',
+        views.PlottedFigureHandler.image,
+        name='plotted_figure_image'),
 ]
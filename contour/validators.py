@@ -1,12 +1,14 @@
 """
 Validators to check e.g. uploaded data or calculated contours.
 """
+import codecs
 import re
 
 import numpy as np
 from django.core.exceptions import ValidationError
 
-from .settings import MAX_FILE_SIZE_M_IN_MIB, MAX_LENGTH_FILE_NAME
+from .settings import MAX_FILE_SIZE_M_IN_MIB, MAX_LENGTH_FILE_NAME, \
+    MAX_LENGTH_CSV_LINE, CSV_VALIDATION_CHUNK_SIZE
 
 
 def validate_contour_coordinates(contour_coordinates):
@@ -41,8 +43,73 @@ def validate_contour_coordinates(contour_coordinates):
                                           'values, which are set to inf '
                                           '(Infinity).')
 
+
+def iterate_csv_lines(value, chunk_size=CSV_VALIDATION_CHUNK_SIZE):
+    """
+    Iterates over the lines of an uploaded file without reading it at once.
+
+    The file is read in chunks of chunk_size bytes and decoded incrementally,
+    such that the memory needed does not depend on the file's size.
+
+    Parameters
+    ----------
+    value : django.core.files.File,
+        The file that the user wants to upload.
+    chunk_size : int, optional
+        Number of bytes, which are read at once.
+
+    Yields
+    ------
+    line_number : int,
+        The line's number, starting at 1.
+    line : str,
+        The line without its line break.
+
+    Raises
+    ------
+    ValidationError,
+        If the file is not a UTF-8 text file or if a line is too long.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    remainder = ''
+    line_number = 0
+    try:
+        for chunk in value.chunks(chunk_size):
+            lines = (remainder + decoder.decode(chunk)).split('\n')
+            # The last element is an incomplete line, which is continued in
+            # the next chunk.
+            remainder = lines.pop()
+            for line in lines:
+                line_number += 1
+                yield line_number, _check_line_length(line_number, line)
+            _check_line_length(line_number + 1, remainder)
+        remainder += decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        raise ValidationError("Only plain text files are allowed.")
+    if remainder:
+        yield line_number + 1, _check_line_length(line_number + 1, remainder)
+
+
+def _check_line_length(line_number, line):
+    """
+    Returns a line without its carriage return. Raises a ValidationError if
+    the line is longer than MAX_LENGTH_CSV_LINE, such that no long line
+    reaches the regular expressions.
+    """
+    line = line.rstrip('\r')
+    if len(line) > MAX_LENGTH_CSV_LINE:
+        raise ValidationError(
+            "Line %(line_number)s is too long.", code="invalid",
+            params={"line_number": line_number})
+    return line
+
+
 def validate_csv_upload(value):
     """
+    Validates an uploaded measurement file.
+
+    The file is validated line by line while it is read in chunks. Thus, the
+    memory needed does not depend on the file's size.
 
     Parameters
     ----------
@@ -70,37 +137,21 @@ def validate_csv_upload(value):
     elif value.size == 0:
         raise ValidationError("File is empty.")
 
-    # Validate if it is a text file.
-    try:
-        input_str = value.read().decode("utf-8")
-    except UnicodeDecodeError:
-        raise ValidationError("Only plain text files are allowed.")
-
-
-    input_lines = input_str.splitlines()
-    header_line_1 = input_lines[0]
-    header_line_2 = input_lines[1]
-    body = "\n".join(input_lines[2:]) + "\n"
+    lines = iterate_csv_lines(value)
 
     # Validate the header and start with the first line, which should contain
     # the variable names.
+    header_line_1 = next(lines, (1, ''))[1]
     header_parts = header_line_1.split(";")
-    if len(header_parts) == 0:
-        raise ValidationError("Empty header.", code="invalid")
     var_num = int(len(header_parts))
 
     h_pattern_str = r"^(?:[^;]{1,50};){1,9}[^;]{1,50}$"
     h_pattern = re.compile(h_pattern_str, re.ASCII)
-
-    header_is_ok = False
-    result = h_pattern.match(header_line_1)
-    if result:
-        header_is_ok = (result.end()-result.start() == len(header_line_1))
-
-    if not header_is_ok:
+    if not h_pattern.fullmatch(header_line_1):
         raise ValidationError("Error in header's first line.", code="invalid")
 
     # Valide the second line, which should contain the variable symbols.
+    header_line_2 = next(lines, (2, ''))[1]
     header_parts = header_line_2.split(";")
     if int(len(header_parts)) != var_num:
         raise ValidationError("Error in the header's second line. "
@@ -109,41 +160,31 @@ def validate_csv_upload(value):
 
     h_pattern_str = r"^(?:[^,\s]{1,5};){1,9}[^;\s]{1,5}$"
     h_pattern = re.compile(h_pattern_str, re.ASCII)
-
-    header_is_ok = False
-    result = h_pattern.match(header_line_2)
-    if result:
-        header_is_ok = (result.end()-result.start() == len(header_line_2))
-
-    if not header_is_ok:
+    if not h_pattern.fullmatch(header_line_2):
         raise ValidationError("Error in header's second line.", code="invalid")
 
-    # Validate the body.
-    if len(body) == 0:
-        raise ValidationError("Empty body.", code="invalid")
-
-    b_pattern_str = (r"(?:(?:\s*\d+[\.,]?\d*\s*;){1," + str(var_num-1)
-                     + r"}\s*\d+[\.,]?\d*\s*\n)+")
+    # Validate the body row by row. Lines, which only contain white space are
+    # ignored.
+    # The decimal separator and the fraction are optional as a group, such
+    # that a run of digits can only be matched in one way.
+    b_pattern_str = (r"(?:\s*\d+(?:[\.,]\d*)?\s*;){1," + str(var_num-1)
+                     + r"}\s*\d+(?:[\.,]\d*)?\s*")
     b_pattern = re.compile(b_pattern_str, re.ASCII)
-
-    body_is_ok = False
-    result = b_pattern.match(body)
-    if result:
-        body_is_ok = result.end()-result.start() == len(body)
-        if not body_is_ok:
-            end_of_line = body.find("\n", result.end())
-            start_of_line = body.rfind("\n", 0, result.end())
-            if end_of_line == -1:
-                end_of_line = len(body)
-            if start_of_line == -1:
-                start_of_line = 0
-            error_line = body[start_of_line : end_of_line].strip()
+    n_rows = 0
+    for line_number, line in lines:
+        if not line.strip():
+            continue
+        if not b_pattern.fullmatch(line):
+            error_line = line.strip()
             if len(error_line) > 50:
                 error_line = error_line[0:50] + "..."
-            raise ValidationError("Error in the following line: %(err_line)s",
+            raise ValidationError("Error in line %(line_number)s: "
+                                  "%(err_line)s",
                                   code="invalid",
-                                  params={"err_line" : error_line})
-    else:
-        if not body_is_ok:
-            raise ValidationError("Error in body.", code="invalid")
+                                  params={"line_number": line_number,
+                                          "err_line": error_line})
+        n_rows += 1
+
+    if n_rows == 0:
+        raise ValidationError("Empty body.", code="invalid")
     value.seek(0)
@@ -2,9 +2,7 @@
 Handles requests and outputs rendered html.
 """
 import os
-import csv
-import warnings
-import codecs
+import json
 import time
 # These imports and the setup() call is recuired for multiprocessing, see
 # https://stackoverflow.com/questions/46908035/apps-arent-loaded-yet-
@@ -14,11 +12,12 @@ django.setup()
 
 from django.shortcuts import redirect
 from django.shortcuts import render, get_object_or_404, HttpResponseRedirect
+from django.http import HttpResponse, Http404, StreamingHttpResponse
 from django.core.exceptions import ValidationError
+from django.db.models import Q
 from django.contrib import messages
 from django.urls import reverse
-from multiprocessing import TimeoutError
-from urllib import request
+import numpy as np
 from abc import abstractmethod
 
 from . import forms
@@ -27,14 +26,21 @@ from . import plot
 from . import settings
 
 from viroconweb.settings import RUN_MODE
-from .models import User, MeasureFileModel, EnvironmentalContour, ContourPath, \
-    ExtremeEnvDesignCondition, EEDCScalar, AdditionalContourOption, \
-    ProbabilisticModel, DistributionModel, ParameterModel, PlottedFigure
-
-from .compute_interface import ComputeInterface
-from .validators import validate_contour_coordinates
-from viroconcom import distributions, params
-from .settings import MAX_COMPUTING_TIME, DO_SAVE_CONTOUR_COORDINATES_IN_DB
+from .models import User, MeasureFileModel, EnvironmentalContour, \
+    ProbabilisticModel, DistributionModel, ParameterModel, PlottedFigure, \
+    ComputeJob
+
+from .jobs import enqueue_job, enqueue_report
+from .lazy_figures import read_image
+from .design_conditions import FILE_FORMATS, iter_design_conditions, read_csv
+from .persistence import load_contour_coordinates, \
+    save_probabilistic_model
+from .measurement_data import write_columnar_cache, read_metadata
+from .measure_file_blobs import save_measure_file_model, copy_derived_data
+from .column_statistics import update_statistics, read_statistics, \
+    hdc_defaults, fit_interval_widths, statistics_table
+from .media import open_media
+from .metrics import increment, render_metrics
 
 
 CONTOUR_CALCULATION_ERROR_MSG = 'Please consider different settings for the ' \
@@ -60,12 +66,32 @@ def index(request):
     return render(request, 'contour/home.html')
 
 
+def metrics(request):
+    """
+    Exports the metrics in the Prometheus text format, see metrics.py.
+
+    If METRICS_TOKEN is set, the request must send it as bearer token.
+    """
+    if settings.METRICS_TOKEN and request.META.get('HTTP_AUTHORIZATION') != \
+            'Bearer ' + settings.METRICS_TOKEN:
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
+
+
 class Handler:
     @staticmethod
-    def overview(request, model_class):
+    def overview(request, model_class, select_related=()):
         """
-        Renders an overview about all objects of a Django Model (all data base
-        entries).
+        Renders an overview about the objects of a Django Model, which the user
+        owns or which are shared with the user.
+
+        The objects are loaded with a constant number of queries, independent
+        of the number of objects. They are shown from the newest to the oldest
+        object in pages of OVERVIEW_PAGE_SIZE objects. The next page starts
+        after the primary key given by the query parameter 'before' (keyset
+        pagination).
 
         Parameters
         ----------
@@ -74,6 +100,9 @@ class Handler:
         model_class : class of models.Model,
             The class of a Django Model as defined in models.py, e.g.
             MeasurementFileModel or EnvironmentalContour.
+        select_related : tuple of str, optional
+            Foreign keys, which are shown in the overview, e.g.
+            ('probabilistic_model', ).
 
         Returns
         -------
@@ -83,17 +112,10 @@ class Handler:
         if request.user.is_anonymous:
             return redirect('contour:index')
         else:
-            objects = model_class.objects.all()
-            context = set()
-            for object in objects:
-                bool_ = False
-                for secUser in object.secondary_user.all():
-                    if secUser == request.user:
-                        bool_ = True
-                if bool_:
-                    context.add(object)
-                elif object.primary_user == request.user:
-                    context.add(object)
+            context, next_before = Handler.page(
+                request, model_class.objects.select_related(
+                    'primary_user', *select_related).prefetch_related(
+                    'secondary_user'))
 
             base = 'contour:' + model_class.url_str()
             html = 'contour/' + model_class.url_str() + '_overview.html'
@@ -103,12 +125,49 @@ class Handler:
             calc = base + '_calc'
 
             return render(request, html, {'context': context,
+                                          'next_before': next_before,
                                           'name': model_class,
                                           'update': update,
                                           'delete': delete,
                                           'add': add,
                                           'calc': calc})
 
+    @staticmethod
+    def page(request, objects):
+        """
+        Returns a page of the objects, which the user owns or which are
+        shared with the user, see overview().
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to show the objects. Its query parameter 'before' is the
+            primary key the page starts after.
+        objects : QuerySet,
+            The objects of a Django Model, e.g. with select_related() applied.
+
+        Returns
+        -------
+        context : list of models.Model,
+            At most OVERVIEW_PAGE_SIZE objects from the newest to the oldest.
+        next_before : int or None,
+            The primary key the next page starts after or None if this is the
+            last page.
+        """
+        objects = objects.filter(
+            Q(primary_user=request.user) |
+            Q(secondary_user=request.user)).distinct().order_by('-pk')
+        before = request.GET.get('before', '')
+        if before.isdigit():
+            objects = objects.filter(pk__lt=int(before))
+        # One more object is loaded to know whether there is a next page.
+        context = list(objects[:settings.OVERVIEW_PAGE_SIZE + 1])
+        next_before = None
+        if len(context) > settings.OVERVIEW_PAGE_SIZE:
+            context = context[:settings.OVERVIEW_PAGE_SIZE]
+            next_before = context[-1].pk
+        return context, next_before
+
     @staticmethod
     def delete(request, pk, model_class):
         """
@@ -254,25 +313,32 @@ class MeasureFileHandler(Handler):
 
     @staticmethod
     def select(request):
+        """
+        Renders an overview of the measurement files with the option to
+        select one to fit a probabilistic model.
+
+        Like the overview, the files are loaded with a constant number of
+        queries and are shown in pages (see Handler.page()).
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to select a measurement file to fit.
+
+        Returns
+        -------
+        HttpResponse,
+            Renders an overview of the measurement files.
+        """
         if request.user.is_anonymous:
             return redirect('contour:index')
         else:
-            model_class = MeasureFileModel
-            objects = model_class.objects.all()
-            context = set()
-            for object in objects:
-                bool_ = False
-                for secUser in object.secondary_user.all():
-                    if secUser == request.user:
-                        bool_ = True
-                if bool_:
-                    context.add(object)
-                elif object.primary_user == request.user:
-                    context.add(object)
-
+            context, next_before = Handler.page(
+                request, MeasureFileModel.objects.only('pk', 'title'))
             return render(request,
                           'contour/measure_file_model_select.html',
-                          {'context': context}
+                          {'context': context,
+                           'next_before': next_before}
                           )
 
     @staticmethod
@@ -301,23 +367,40 @@ class MeasureFileHandler(Handler):
                     files=request.FILES
                 )
                 if measure_file_form.is_valid():
+                    # Each content is stored only once, see
+                    # measure_file_blobs.py.
                     measure_model = MeasureFileModel(
                         primary_user=request.user,
                         title=measure_file_form.cleaned_data['title']
                     )
-                    measure_model.save()
-                    measure_model.measure_file.save(
-                        measure_file_form.cleaned_data['measure_file'].name,
-                        measure_file_form.cleaned_data['measure_file'].file
-                    )
-                    measure_model.save()
-                    path = settings.PATH_MEDIA + \
-                           settings.PATH_USER_GENERATED + \
-                           str(request.user) + \
-                           '/measurement/' + str(measure_model.pk)
-                    measure_model.path_of_statics = path
-                    measure_model.save(
-                        update_fields=['path_of_statics'])
+                    created = save_measure_file_model(
+                        measure_model,
+                        measure_file_form.cleaned_data['measure_file'])
+                    if created:
+                        increment('viroconweb_media_written_bytes_total',
+                                  measure_model.blob.size,
+                                  kind='measurement_file')
+                    try:
+                        path = settings.PATH_MEDIA + \
+                               settings.PATH_USER_GENERATED + \
+                               str(request.user) + \
+                               '/measurement/' + str(measure_model.pk)
+                        measure_model.path_of_statics = path
+                        measure_model.save(
+                            update_fields=['path_of_statics'])
+                        # Convert the file to the binary columnar format,
+                        # which is read by fits and plots, and store its
+                        # statistics, which are shown and suggest the settings
+                        # of fits and contours. Both are shared by uploads of
+                        # the same content.
+                        if created or not copy_derived_data(measure_model):
+                            write_columnar_cache(measure_model)
+                            update_statistics(measure_model)
+                    except BaseException:
+                        # Deleting the half-initialised model releases its
+                        # blob (see signals.py).
+                        measure_model.delete()
+                        raise
 
                     return redirect(
                         'contour:measure_file_model_plot',
@@ -357,11 +440,13 @@ class MeasureFileHandler(Handler):
             return redirect('contour:index')
         else:
             mfm_item = MeasureFileModel.objects.get(pk=pk)
-            var_names, var_symbols = get_info_from_file(mfm_item.measure_file.url)
+            var_names, var_symbols = read_metadata(mfm_item)
             var_number = len(var_names)
             fit_form = forms.MeasureFileFitForm(
                 variable_count=var_number,
-                variable_names=var_names
+                variable_names=var_names,
+                widths_of_intervals=fit_interval_widths(
+                    read_statistics(mfm_item))
             )
             if request.method == 'POST':
                 fit_form = forms.MeasureFileFitForm(
@@ -370,63 +455,13 @@ class MeasureFileHandler(Handler):
                     variable_names=var_names
                 )
                 if fit_form.is_valid():
-                    ci = ComputeInterface()
-                    try:
-                        fit = ci.fit_curves(mfm_item=mfm_item,
-                                            fit_settings=fit_form.cleaned_data,
-                                            var_number=var_number
-                                            )
-                    except (ValueError, RuntimeError, IndexError, TypeError,
-                            NameError, KeyError, TimeoutError) as err:
-                        if RUN_MODE == 'production' and err.__class__.__name__ == 'TimeoutError':
-                            fitting_error_message = \
-                                '<p>Consider running a copy of ViroCon locally ' \
-                                'to allow a longer computation time. See the ' \
-                                'instruction at <a href="https://github.com/' \
-                                'virocon-organization/viroconweb#how-to-use-virocon">' \
-                                'https://github.com/' \
-                                'virocon-organization/viroconweb#how-to-use-virocon' \
-                                '</a> on ' \
-                                'how to do that.</p>' + FITTING_ERROR_MSG
-                        else:
-                            fitting_error_message = FITTING_ERROR_MSG
-                        return render(
-                            request,
-                            'contour/error.html',
-                            {'error_message': err,
-                             'text': fitting_error_message,
-                               'header': 'Fit measurement file to probabilistic '
-                                         'model',
-                               'return_url': 'contour:measure_file_model_select'
-                             }
-                        )
-                    directory_prefix = settings.PATH_MEDIA
-                    directory_after_static = settings.PATH_USER_GENERATED + \
-                                             str(request.user) + '/prob_model/'
-                    directory = directory_prefix + directory_after_static
-                    prob_model = save_fitted_prob_model(fit,
-                                                        fit_form.cleaned_data[
-                                                            'title'],
-                                                        var_names,
-                                                        var_symbols,
-                                                        request.user,
-                                                        mfm_item)
-                    plot.plot_fit(fit, var_names, var_symbols, directory,
-                                  prob_model)
-                    multivariate_distribution = plot.setup_mul_dist(
-                        prob_model
-                    )
-                    latex_string_list = multivariate_distribution.latex_repr(
-                        var_symbols
-                    )
-                    figure_collections = plot.sort_plotted_figures(prob_model)
-                    return render(request,
-                                  'contour/fit_results.html',
-                                  {'pk': prob_model.pk,
-                                   'figure_collections': figure_collections,
-                                   'latex_string_list': latex_string_list
-                                   }
-                                  )
+                    job = enqueue_job(ComputeJob.FIT,
+                                      request.user,
+                                      {'fit_settings': fit_form.cleaned_data,
+                                       'var_names': var_names,
+                                       'var_symbols': var_symbols},
+                                      measure_file_model=mfm_item)
+                    return redirect('contour:compute_job_show', job.pk)
                 else:
                     return render(request,
                                   'contour/measure_file_model_fit.html',
@@ -488,19 +523,20 @@ class MeasureFileHandler(Handler):
             return redirect('contour:index')
         else:
             measure_file_model = MeasureFileModel.objects.get(pk=pk)
-            var_names, var_symbols = get_info_from_file(
-                measure_file_model.measure_file.url
-            )
+            var_names, var_symbols = read_metadata(measure_file_model)
             directory_prefix = settings.PATH_MEDIA
             directory_after_static = settings.PATH_USER_GENERATED + \
                                      str(request.user) + \
                                      '/measurement/' + str(pk)
             plot.plot_data_set_as_scatter(measure_file_model, var_names)
+            statistics = statistics_table(read_statistics(measure_file_model),
+                                          var_names)
             return render(request,
                           'contour/measure_file_model_plot.html',
                           {'user': request.user,
                            'measure_file_model':measure_file_model,
-                           'directory': directory_after_static}
+                           'directory': directory_after_static,
+                           'statistics': statistics}
                           )
 
 
@@ -576,77 +612,52 @@ class ProbabilisticModelHandler(Handler):
                 variable_form = forms.VariablesForm(data=request.POST,
                                                     variable_count=var_num_int)
                 if variable_form.is_valid():
-                    is_valid_probabilistic_model = True
+                    data = variable_form.cleaned_data
                     probabilistic_model = models.ProbabilisticModel(
                         primary_user=request.user,
-                        collection_name=variable_form.cleaned_data[
-                            'collection_name'],
+                        collection_name=data['collection_name'],
                         measure_file_model=None)
-                    probabilistic_model.save()
+                    distributions = []
+                    parameters = []
                     for i in range(var_num_int):
                         distribution = models.DistributionModel(
-                            name=variable_form.cleaned_data[
-                                'variable_name_' + str(i)
-                            ],
-                            distribution=variable_form.cleaned_data[
-                                'distribution_' + str(i)
-                            ],
-                            symbol=variable_form.cleaned_data[
-                                'variable_symbol_' + str(i)
-                            ],
-                            probabilistic_model=probabilistic_model
+                            name=data['variable_name_' + str(i)],
+                            distribution=data['distribution_' + str(i)],
+                            symbol=data['variable_symbol_' + str(i)]
                         )
-                        distribution.save()
+                        distributions.append(distribution)
                         params = ['shape', 'location', 'scale']
                         if i == 0:
-                            for param in params:
-                                parameter = models.ParameterModel(
+                            parameters.append([
+                                models.ParameterModel(
                                     function='None',
-                                    x0=variable_form.cleaned_data[
-                                        param + '_' + str(i) + '_0'
-                                    ],
+                                    x0=data[param + '_' + str(i) + '_0'],
                                     dependency='!',
                                     name=param,
-                                    distribution=distribution
-                                )
-                                try:
-                                    parameter.clean()
-                                except ValidationError as e:
-                                    messages.add_message(request,
-                                                         messages.ERROR,
-                                                         e.message)
-                                    is_valid_probabilistic_model = False
-                                else:
-                                    parameter.save()
-
+                                    distribution=distribution)
+                                for param in params])
                         else:
-                            for param in params:
-                                parameter = models.ParameterModel(
-                                    function=variable_form.cleaned_data[param + '_dependency_' + str(i)][1:],
-                                    x0=variable_form.cleaned_data[param + '_' + str(i) + '_0'],
-                                    x1=variable_form.cleaned_data[param + '_' + str(i) + '_1'],
-                                    x2=variable_form.cleaned_data[param + '_' + str(i) + '_2'],
-                                    dependency=variable_form.cleaned_data[param + '_dependency_' + str(i)][0],
+                            parameters.append([
+                                models.ParameterModel(
+                                    function=data[param + '_dependency_' + str(i)][1:],
+                                    x0=data[param + '_' + str(i) + '_0'],
+                                    x1=data[param + '_' + str(i) + '_1'],
+                                    x2=data[param + '_' + str(i) + '_2'],
+                                    dependency=data[param + '_dependency_' + str(i)][0],
                                     name=param, distribution=distribution)
-                                try:
-                                    parameter.clean()
-                                except ValidationError as e:
-                                    messages.add_message(
-                                        request,
-                                        messages.ERROR,
-                                        e.message
-                                    )
-                                    is_valid_probabilistic_model = False
-                                else:
-                                    parameter.save()
-                    if is_valid_probabilistic_model:
-                        return redirect('contour:probabilistic_model_select')
-                    else:
-                        probabilistic_model.delete()
+                                for param in params])
+                    try:
+                        save_probabilistic_model(probabilistic_model,
+                                                 distributions, parameters)
+                    except ValidationError as e:
+                        for message in e.messages:
+                            messages.add_message(request, messages.ERROR,
+                                                 message)
                         return render(request,
                                       'contour/probabilistic_model_add.html',
                                       {'form': variable_form,
                                        'var_num_form': var_num_form})
+                    return redirect('contour:probabilistic_model_select')
                 else:
                     return render(request,
                                   'contour/probabilistic_model_add.html',
@@ -738,74 +749,21 @@ class ProbabilisticModelHandler(Handler):
             return redirect('contour:index')
         else:
             iform_form = forms.IFormForm()
-            cs = ComputeInterface
             if request.method == 'POST':
                 iform_form = forms.IFormForm(data=request.POST)
                 if iform_form.is_valid():
-                    try:
-                        with warnings.catch_warnings(record=True) as warn:
-                            contour_coordinates = cs.iform(
-                                probabilistic_model,
-                                float(iform_form.cleaned_data['return_period']),
-                                float(iform_form.cleaned_data['sea_state']),
-                                iform_form.cleaned_data['n_steps'])
-                            validate_contour_coordinates(contour_coordinates)
-                            environmental_contour = EnvironmentalContour(
-                                primary_user=request.user,
-                                fitting_method="",
-                                contour_method="Inverse first order reliability "
-                                               "method (IFORM)",
-                                return_period=float(
-                                    iform_form.cleaned_data['return_period']),
-                                state_duration=float(
-                                    iform_form.cleaned_data['sea_state']),
-                                probabilistic_model=probabilistic_model
-                            )
-                            # Save the environmental contour here that it gets
-                            # a primary key.
-                            environmental_contour.save()
-                            additional_contour_options = []
-                            additional_contour_option = AdditionalContourOption(
-                                option_key="Number of points on the contour",
-                                option_value=iform_form.cleaned_data['n_steps'],
-                                environmental_contour=environmental_contour
-                            )
-                            additional_contour_options.append(
-                                additional_contour_option)
-                            save_environmental_contour(
-                                environmental_contour,
-                                additional_contour_options,
-                                contour_coordinates,
-                                str(request.user))
-                    # Catch and allocate errors caused by calculating iform.
-                    except (ValidationError, RuntimeError, IndexError, TypeError,
-                            NameError, KeyError, Exception) as err:
-                        return render(
-                            request,
-                            'contour/error.html',
-                            {'error_message': err,
-                             'text': CONTOUR_CALCULATION_ERROR_MSG,
-                             'header': 'Calculate contour',
-                             'return_url': 'contour:probabilistic_model_select'})
-                    try:
-                        plot.create_latex_report(contour_coordinates,
-                                                 str(request.user),
-                                                 environmental_contour,
-                                                 var_names,
-                                                 var_symbols)
-                    except (ValueError) as err:
-                        return render(
-                            request,
-                            'contour/error.html',
-                            {'error_message': err,
-                             'text': CONTOUR_REPORT_ERROR_MSG,
-                             'header': 'Report of the contour',
-                             'return_url': 'contour:probabilistic_model_select'}
-                        )
-                    response = ProbabilisticModelHandler.render_calculated_contour(
-                        request, environmental_contour, contour_coordinates,
-                        probabilistic_model, warn)
-                    return response
+                    job = enqueue_job(
+                        ComputeJob.IFORM,
+                        request.user,
+                        {'return_period': float(
+                            iform_form.cleaned_data['return_period']),
+                         'state_duration': float(
+                             iform_form.cleaned_data['sea_state']),
+                         'n_steps': iform_form.cleaned_data['n_steps'],
+                         'var_names': var_names,
+                         'var_symbols': var_symbols},
+                        probabilistic_model=probabilistic_model)
+                    return redirect('contour:compute_job_show', job.pk)
                 else:
                     return render(request,
                                   'contour/contour_settings.html',
@@ -843,93 +801,40 @@ class ProbabilisticModelHandler(Handler):
         if request.user.is_anonymous:
             return redirect('contour:index')
         else:
-            hdc_form = forms.HDCForm(var_names=var_names)
-            cs = ComputeInterface()
+            # If the model was fitted, the grid is suggested by the
+            # measurement file's statistics.
+            limits = None
+            deltas = None
+            if probabilistic_model.measure_file_model_id is not None:
+                statistics = read_statistics(
+                    probabilistic_model.measure_file_model)
+                if len(statistics['columns']) == len(var_names):
+                    limits, deltas = hdc_defaults(statistics)
+            hdc_form = forms.HDCForm(var_names=var_names, limits=limits,
+                                     deltas=deltas)
             if request.method == 'POST':
                 hdc_form = forms.HDCForm(data=request.POST, var_names=var_names)
                 if hdc_form.is_valid():
                     limits = []
                     deltas = []
-                    warn = None
-                    contour_coordinates = None
                     for i in range(len(var_names)):
                         limits.append(
                             (float(hdc_form.cleaned_data['limit_%s' % i + '_1']),
                              float(hdc_form.cleaned_data['limit_%s' % i + '_2'])))
                         deltas.append(float(hdc_form.cleaned_data['delta_%s' % i]))
-                    try:
-                        with warnings.catch_warnings(record=True) as warn:
-                            contour_coordinates = cs.hdc(
-                                probabilistic_model,
-                                float(hdc_form.cleaned_data['n_years']),
-                                float(hdc_form.cleaned_data['sea_state']),
-                                limits, deltas)
-                            validate_contour_coordinates(contour_coordinates)
-                            environmental_contour = EnvironmentalContour(
-                                primary_user=request.user,
-                                fitting_method="",
-                                contour_method="Highest density contour (HDC) "
-                                               "method",
-                                return_period=float(
-                                    hdc_form.cleaned_data['n_years']),
-                                state_duration=float(
-                                    hdc_form.cleaned_data['sea_state']),
-                                probabilistic_model=probabilistic_model
-                            )
-                            # Save the environmental contour here that it gets
-                            # a primary key.
-                            environmental_contour.save()
-                            additional_contour_options = []
-                            additional_contour_option = AdditionalContourOption(
-                                option_key="Limits of the grid",
-                                option_value=" ".join(map(str, limits)),
-                                environmental_contour=environmental_contour
-                            )
-                            additional_contour_options.append(
-                                additional_contour_option)
-                            additional_contour_option = AdditionalContourOption(
-                                option_key="Grid cell size ($\Delta x_i$)",
-                                option_value=" ".join(map(str, deltas)),
-                                environmental_contour=environmental_contour
-                            )
-                            additional_contour_options.append(
-                                additional_contour_option)
-                            save_environmental_contour(
-                                environmental_contour,
-                                additional_contour_options,
-                                contour_coordinates,
-                                str(request.user))
-                    # Catch and allocate errors caused by calculating a HDC.
-                    except (TimeoutError, ValidationError, RuntimeError,
-                            IndexError, TypeError, NameError, KeyError) as err:
-                        return render(
-                            request,
-                            'contour/error.html',
-                            {'error_message': err,
-                             'text': CONTOUR_CALCULATION_ERROR_MSG,
-                             'header': 'Calculate contour',
-                             'return_url': 'contour:probabilistic_model_select'}
-                        )
-
-                    try:
-                        plot.create_latex_report(contour_coordinates,
-                                                 str(request.user),
-                                                 environmental_contour,
-                                                 var_names,
-                                                 var_symbols)
-                    except (ValueError) as err:
-                        return render(
-                            request,
-                            'contour/error.html',
-                            {'error_message': err,
-                             'text': CONTOUR_REPORT_ERROR_MSG,
-                             'header': 'Report of the contour',
-                             'return_url': 'contour:probabilistic_model_select'}
-                        )
-                    response = ProbabilisticModelHandler.render_calculated_contour(
-                        request, environmental_contour, contour_coordinates,
-                        probabilistic_model, warn)
-                    return response
+                    job = enqueue_job(
+                        ComputeJob.HDC,
+                        request.user,
+                        {'return_period': float(
+                            hdc_form.cleaned_data['n_years']),
+                         'state_duration': float(
+                             hdc_form.cleaned_data['sea_state']),
+                         'limits': limits,
+                         'deltas': deltas,
+                         'var_names': var_names,
+                         'var_symbols': var_symbols},
+                        probabilistic_model=probabilistic_model)
+                    return redirect('contour:compute_job_show', job.pk)
                 else:
                     return render(request, 'contour/contour_settings.html',
                                   {'form': hdc_form}
@@ -979,6 +884,9 @@ class ProbabilisticModelHandler(Handler):
             response = render(request,
                           'contour/environmental_contour_show.html',
                           {'object': environmental_contour,
+                           'report_error_message': CONTOUR_REPORT_ERROR_MSG,
+                           'refresh_interval':
+                               settings.COMPUTE_JOB_REFRESH_INTERVAL,
                            'x': contour_coordinates[0][0].tolist(),
                            'y': contour_coordinates[0][1].tolist(),
                            'z': contour_coordinates[0][2].tolist(),
@@ -998,6 +906,9 @@ class ProbabilisticModelHandler(Handler):
             response = render(request,
                           'contour/environmental_contour_show.html',
                           {'object': environmental_contour,
+                           'report_error_message': CONTOUR_REPORT_ERROR_MSG,
+                           'refresh_interval':
+                               settings.COMPUTE_JOB_REFRESH_INTERVAL,
                            'x': contour_coordinates[0][0].tolist(),
                            'y': contour_coordinates[0][1].tolist(),
                            'z': contour_coordinates[0][2].tolist(),
@@ -1007,7 +918,11 @@ class ProbabilisticModelHandler(Handler):
         elif len(contour_coordinates) < 3:
             response = render(request,
                           'contour/environmental_contour_show.html',
-                          {'object': environmental_contour, 'dim': 2}
+                          {'object': environmental_contour,
+                           'report_error_message': CONTOUR_REPORT_ERROR_MSG,
+                           'refresh_interval':
+                               settings.COMPUTE_JOB_REFRESH_INTERVAL,
+                           'dim': 2}
                           )
         return response
 
@@ -1097,7 +1012,8 @@ class EnvironmentalContourHandler(Handler):
 
     @staticmethod
     def overview(request, model_class=models.EnvironmentalContour):
-        return Handler.overview(request, model_class)
+        return Handler.overview(request, model_class,
+                                select_related=('probabilistic_model', ))
 
     @staticmethod
     def delete(request, pk, model_class=models.EnvironmentalContour):
@@ -1109,254 +1025,265 @@ class EnvironmentalContourHandler(Handler):
 
     @staticmethod
     def show(request, pk, model_class=models.EnvironmentalContour):
-        return Handler.show(request, pk, model_class)
+        """
+        Shows an environmental contour.
+
+        The contour's report is created in the background when it is
+        requested for the first time (see report()). While it is being
+        created, the page reloads itself.
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            The HttpRequest to show the contour.
+        pk : int,
+            Primary key of the EnvironmentalContour.
+        model_class : models.Model, optional
+            Defaults to models.EnvironmentalContour.
+
+        Returns
+        -------
+        response : HttpResponse,
+            Renders the contour.
+        """
+        if request.user.is_anonymous:
+            return HttpResponseRedirect(reverse('contour:index'))
+        environmental_contour = get_object_or_404(model_class, pk=pk)
+        return render(request,
+                      'contour/environmental_contour_show.html',
+                      {'object': environmental_contour,
+                       'report_error_message': CONTOUR_REPORT_ERROR_MSG,
+                       'refresh_interval':
+                           settings.COMPUTE_JOB_REFRESH_INTERVAL})
 
     @staticmethod
     def delete(request, pk, collection=models.EnvironmentalContour):
         return Handler.delete(request, pk, collection)
 
+    @staticmethod
+    def design_conditions(request, pk, file_format):
+        """
+        Streams the extreme environmental design conditions of a contour.
 
-def save_fitted_prob_model(fit, model_title, var_names, var_symbols, user,
-                           measure_file):
-    """
-    Saves a probabilistic model which was fitted to measurement data.
-
-    Parameters
-    ----------
-    fit : Fit,
-        Calculated fit results of a measurement file.
-    model_title : str,
-        Title of the probabilistic model.
-    var_names : list of str,
-        Names of the variables.
-    var_symbols : list of str,
-        Names of the symbols of the probabilistic model's variables.
-    user : str,
-        Name of a user.
-    measure_file : MeasureFileModel,
-        MeasureFileModel object linked to the probabilistic model.
-
-    Returns
-    -------
-    ProbabilisticModel
-        ProbabilisticModel that was fitted to the measurement file.
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to download the design conditions.
+        pk : int,
+            Primary key of the EnvironmentalContour.
+        file_format : str,
+            'csv', 'csv.gz', 'npy' or 'json', see design_conditions.py.
 
-    """
-    probabilistic_model = ProbabilisticModel(primary_user=user,
-                                             collection_name=model_title,
-                                             measure_file_model=measure_file)
-    probabilistic_model.save()
-
-    for i, dist in enumerate(fit.mul_var_dist.distributions):
-        if dist.name == 'Lognormal':
-            dist_name = 'Lognormal_SigmaMu'
-
-            distribution_model = DistributionModel(name=var_names[i],
-                                                   symbol=var_symbols[i],
-                                                   probabilistic_model=probabilistic_model,
-                                                   distribution=dist_name)
-            distribution_model.save()
-            save_parameter(dist.shape, distribution_model,
-                           fit.mul_var_dist.dependencies[i][0], 'shape')
-            save_parameter(dist.loc, distribution_model,
-                           fit.mul_var_dist.dependencies[i][1], 'loc')
-            save_parameter(dist.mu, distribution_model,
-                           fit.mul_var_dist.dependencies[i][2], 'scale')
-        else:
-            distribution_model = DistributionModel(
-                name=var_names[i],
-                symbol=var_symbols[i],
-                probabilistic_model=probabilistic_model,
-                distribution=dist.name
-            )
-            distribution_model.save()
-            save_parameter(dist.shape, distribution_model,
-                           fit.mul_var_dist.dependencies[i][0], 'shape')
-            save_parameter(dist.loc, distribution_model,
-                           fit.mul_var_dist.dependencies[i][1], 'loc')
-            save_parameter(dist.scale, distribution_model,
-                           fit.mul_var_dist.dependencies[i][2], 'scale')
+        Returns
+        -------
+        StreamingHttpResponse,
+            The design conditions as file download.
+        """
+        if request.user.is_anonymous:
+            return redirect('contour:index')
+        environmental_contour = get_object_or_404(EnvironmentalContour, pk=pk)
+        if environmental_contour.primary_user != request.user and not \
+                environmental_contour.secondary_user.filter(
+                    pk=request.user.pk).exists():
+            raise Http404
+        contour_coordinates = load_contour_coordinates(environmental_contour)
+        if not contour_coordinates:
+            # The coordinates were not saved in the data base.
+            if not environmental_contour.design_conditions_csv:
+                raise Http404
+            csv_file = environmental_contour.design_conditions_csv
+            with open_media(csv_file.name, csv_file.storage) as f:
+                contour_coordinates = read_csv(f)
+        response = StreamingHttpResponse(
+            iter_design_conditions(contour_coordinates, file_format),
+            content_type=FILE_FORMATS[file_format])
+        response['Content-Disposition'] = \
+            'attachment; filename="design_conditions.' + file_format + '"'
+        return response
 
-    return probabilistic_model
 
+    @staticmethod
+    def report(request, pk):
+        """
+        Downloads the report of a contour.
 
-def save_environmental_contour(environmental_contour,
-                               additional_contour_options,
-                               contour_coordinates,
-                               user):
-    """
-    Saves an EnvironmentalContour object and its depending models to the data
-    base.
-
-
-    Parameters
-    ----------
-    environmental_contour : EnvironmentalContour,
-        The environmental contour obect that should be saved.
-    additional_contour_options : list of AdditionalContourOption,
-        Options, whch are specific to the contour and are not general
-        environmental contour options.
-    contour_coordinates : list of list of numpy.ndarray,
-        Contains the coordinates of points on the contour.
-        The outer list contains can hold multiple contour paths if the
-        distribution is multimodal. The inner list contains multiple
-        numpy arrays of the same length, one per dimension.
-        The values of the arrays are the coordinates in the corresponding
-        dimension.
-    user : str,
-        The user who should own the environmental contour.
-
-    Returns
-    -------
-    EnvironmentalContour,
-        The saved environmental contour object.
-    """
-    # Only save the object if it has not been saved yet.
-    if environmental_contour.pk is None:
-        environmental_contour.save()
-    path = settings.PATH_MEDIA + \
-           settings.PATH_USER_GENERATED + \
-           user + \
-           '/contour/' + str(environmental_contour.pk)
-    environmental_contour.path_of_statics = path
-    environmental_contour.save(
-        update_fields=['path_of_statics'])
-    for additional_contour_option in additional_contour_options:
-        # It is necessary to create a new AdditionalContourObject because the
-        # original object was created with an environmental contour, which has
-        # been saved yet and consequently does not have a primary key.
-        additional_contour_option_w_pk = AdditionalContourOption(
-            option_key=additional_contour_option.option_key,
-            option_value=additional_contour_option.option_value,
-            environmental_contour=environmental_contour)
-        additional_contour_option_w_pk.save()
-    # Saving all coordinates to the database is slow since a lot of operations
-    # might be necessary. Consequenetly, this can be turned off.
-    if DO_SAVE_CONTOUR_COORDINATES_IN_DB:
-        for i in range(len(contour_coordinates)):
-            contour_path = ContourPath(
-                environmental_contour=environmental_contour)
-            contour_path.save()
-            for j in range(len(contour_coordinates[i])):
-                EEDC = ExtremeEnvDesignCondition(
-                    contour_path=contour_path)
-                EEDC.save()
-                for k in range(len(contour_coordinates[i][j])):
-                    eedc_scalar = EEDCScalar(
-                        x=float(contour_coordinates[i][j][k]),
-                        EEDC=EEDC)
-                    eedc_scalar.save()
-    return environmental_contour
-
-
-def save_parameter(parameter, distribution_model, dependency, name):
-    """
-    Saves a fitted parameter and links it to a DistributionModel.
-
-    Parameters
-    ----------
-    parameter : ConstantParam or FunctionParam
-        ConstantParam is a float value. FunctionParam contains a whole function
-        like power function or exponential.
-    distribution_model : DistributionModel
-        The parameter will be linked to this DistributionModel.
-    dependency : int
-        The dimension the dependency is based on.
-    name : str
-        Name of the parameter ('shape', 'loc' or 'scale')
+        The report is created when it is requested for the first time. Until
+        it is ready, the contour is shown, whose page reloads itself.
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to download the report.
+        pk : int,
+            Primary key of the EnvironmentalContour.
+
+        Returns
+        -------
+        HttpResponse,
+            Redirects to the report or to the contour.
+        """
+        if request.user.is_anonymous:
+            return redirect('contour:index')
+        environmental_contour = get_object_or_404(EnvironmentalContour, pk=pk)
+        if environmental_contour.primary_user != request.user and not \
+                environmental_contour.secondary_user.filter(
+                    pk=request.user.pk).exists():
+            raise Http404
+        # Without worker, the report is created here.
+        if enqueue_report(environmental_contour, request.user) is not None:
+            environmental_contour.refresh_from_db()
+        if environmental_contour.latex_report:
+            return redirect(environmental_contour.latex_report.url)
+        return redirect('contour:environmental_contour_show', pk)
+
+
+class ComputeJobHandler:
     """
-    if type(parameter) == params.ConstantParam:
-        parameter_model = ParameterModel(function='None',
-                                         x0=parameter(0),
-                                         dependency='!',
-                                         distribution=distribution_model,
-                                         name=name)
-        parameter_model.save()
-    elif type(parameter) == params.FunctionParam:
-        parameter_model = ParameterModel(function=parameter.func_name,
-                                         x0=parameter.a,
-                                         x1=parameter.b,
-                                         x2=parameter.c,
-                                         dependency=dependency,
-                                         distribution=distribution_model,
-                                         name=name)
-        parameter_model.save()
-    else:
-        parameter_model = ParameterModel(function='None',
-                                         x0=0,
-                                         dependency='!',
-                                         distribution=distribution_model,
-                                         name=name)
-        parameter_model.save()
-
-
-def get_info_from_file(url):
-    """	
-    Reads the variable names and symbols form a csv file.
-    
-    Parameters
-    ----------
-    url : str,
-        Path to the csv file.
-
-    Returns
-    -------
-    var_names : list of str,
-        Names of the environmental variables used in csv file,
-        e.g. ['wind speed [m/s]', 'significant wave height [m]']
-    var_symbols : list of str,
-        Symbols of the environental variables used in the csv file,
-        e.g. ['V', 'Hs']
+    Handler for ComputeJob objects, i.e. fits and contour calculations, which
+    run in the background.
     """
-    if url[0] == '/':
-        url = url[1:]
-    if url[0:8] == 'https://':
-        req = request.Request(url)
-        print('Trying to urlopen the url: ' + str(url))
-        with request.urlopen(req) as response:
-            reader = csv.reader(codecs.iterdecode(response, 'utf-8'), delimiter=';')
-            var_names, var_symbols = get_header_info_from_reader(reader)
-    else:
-        with open(url, 'r') as file:
-            reader = csv.reader(file, delimiter=';')
-            var_names, var_symbols = get_header_info_from_reader(reader)
-
-    return var_names, var_symbols
-
-
-def get_header_info_from_reader(reader):
+
+    @staticmethod
+    def show(request, pk):
+        """
+        Shows the status of a job and renders its result when it is finished.
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to show the job.
+        pk : int,
+            Primary key of the ComputeJob.
+
+        Returns
+        -------
+        HttpResponse,
+            Renders either the job's status (the page reloads itself until the
+            job is finished), the fit or the contour or the error message.
+        """
+        if request.user.is_anonymous:
+            return redirect('contour:index')
+        job = get_object_or_404(ComputeJob, pk=pk, primary_user=request.user)
+        if not job.is_finished():
+            return render(request,
+                          'contour/compute_job_show.html',
+                          {'job': job,
+                           'refresh_interval':
+                               settings.COMPUTE_JOB_REFRESH_INTERVAL})
+        if job.status == ComputeJob.FAILED:
+            return ComputeJobHandler.render_error(request, job)
+        result = json.loads(job.result)
+        if job.kind == ComputeJob.FIT:
+            prob_model = job.probabilistic_model
+            multivariate_distribution = plot.setup_mul_dist(prob_model)
+            latex_string_list = multivariate_distribution.latex_repr(
+                result['var_symbols'])
+            figure_collections = plot.sort_plotted_figures(prob_model)
+            return render(request,
+                          'contour/fit_results.html',
+                          {'pk': prob_model.pk,
+                           'figure_collections': figure_collections,
+                           'latex_string_list': latex_string_list
+                           }
+                          )
+        if job.environmental_contour is None:
+            # The contour was deleted in the mean time.
+            return redirect('contour:environmental_contour_overview')
+        if job.kind == ComputeJob.REPORT:
+            return redirect('contour:environmental_contour_show',
+                            job.environmental_contour.pk)
+        if 'contour_coordinates' in result:
+            contour_coordinates = [[np.array(coordinates)
+                                    for coordinates in contour_path]
+                                   for contour_path in
+                                   result['contour_coordinates']]
+        else:
+            contour_coordinates = load_contour_coordinates(
+                job.environmental_contour)
+        warn = [{'message': message} for message in result['warnings']]
+        return ProbabilisticModelHandler.render_calculated_contour(
+            request, job.environmental_contour, contour_coordinates,
+            job.probabilistic_model, warn)
+
+    @staticmethod
+    def render_error(request, job):
+        """
+        Renders the error message of a failed job.
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to show the job.
+        job : ComputeJob,
+            The failed job.
+
+        Returns
+        -------
+        HttpResponse,
+            Renders the error message.
+        """
+        if job.kind == ComputeJob.FIT:
+            if RUN_MODE == 'production' and job.error_class == 'TimeoutError':
+                text = \
+                    '<p>Consider running a copy of ViroCon locally ' \
+                    'to allow a longer computation time. See the ' \
+                    'instruction at <a href="https://github.com/' \
+                    'virocon-organization/viroconweb#how-to-use-virocon">' \
+                    'https://github.com/' \
+                    'virocon-organization/viroconweb#how-to-use-virocon' \
+                    '</a> on ' \
+                    'how to do that.</p>' + FITTING_ERROR_MSG
+            else:
+                text = FITTING_ERROR_MSG
+            header = 'Fit measurement file to probabilistic model'
+            return_url = 'contour:measure_file_model_select'
+        elif job.kind == ComputeJob.REPORT:
+            text = CONTOUR_REPORT_ERROR_MSG
+            header = 'Report of the contour'
+            return_url = 'contour:probabilistic_model_select'
+        else:
+            text = CONTOUR_CALCULATION_ERROR_MSG
+            header = 'Calculate contour'
+            return_url = 'contour:probabilistic_model_select'
+        return render(request,
+                      'contour/error.html',
+                      {'error_message': job.error_message,
+                       'text': text,
+                       'header': header,
+                       'return_url': return_url})
+
+
+class PlottedFigureHandler:
     """
-    Reads the variable names and symbols form a reader.
-
-    Parameters
-    ----------
-    reader : csv.Reader
-        A Reader object that can read a file line by line.
-        See https://docs.python.org/2/library/csv.html#reader-objects for
-        a proper documentation.
-
-    Returns
-    -------
-    var_names : list of str,
-        Names of the environmental variables used in csv file,
-        e.g. ['wind speed [m/s]', 'significant wave height [m]']
-    var_symbols : list of str,
-        Symbols of the environental variables used in the csv file,
-        e.g. ['V', 'Hs']
+    Handler for PlottedFigure objects, i.e. the images of fits and contours.
     """
-    var_names = []
-    var_symbols = []
-    for i, row in enumerate(reader):
-        j = 0
-        while j < (len(row)):
-            # The first row contains the variable names.
-            if i == 0:
-                var_names.append(row[j])
-            # The second row contains the variable symbols.
-            elif i == 1:
-                var_symbols.append(row[j])
-            # The body starts at line 3, consequently we can stop here.
-            elif i == 2:
-                return var_names, var_symbols
-            j += 1
-    return var_names, var_symbols
+
+    @staticmethod
+    def image(request, pk):
+        """
+        Serves the image of a figure. It is rendered if necessary.
+
+        Parameters
+        ----------
+        request : HttpRequest,
+            Request to get the image.
+        pk : int,
+            Primary key of the PlottedFigure.
+
+        Returns
+        -------
+        HttpResponse,
+            The png image.
+        """
+        if request.user.is_anonymous:
+            return redirect('contour:index')
+        plotted_figure = get_object_or_404(PlottedFigure, pk=pk)
+        if plotted_figure.probabilistic_model_id:
+            owner_model = plotted_figure.probabilistic_model
+        else:
+            owner_model = plotted_figure.environmental_contour
+        if owner_model.primary_user != request.user and not \
+                owner_model.secondary_user.filter(pk=request.user.pk).exists():
+            raise Http404
+        return HttpResponse(read_image(plotted_figure),
+                            content_type='image/png')
@@ -0,0 +1,34 @@
+from django.test import TestCase
+import numpy as np
+from contour.plot_generic import alpha_shape, \
+    convert_ndarray_list_to_multipoint
+
+
+class AlphaShapeTestCase(TestCase):
+
+    def test_ellipse_on_grid(self):
+        # Highest density contours lie on a grid, which leads to many
+        # degenerated Delaunay triangles.
+        x, y = np.meshgrid(np.arange(0, 10, 0.1), np.arange(0, 20, 0.1))
+        on_ellipse = np.abs(((x - 5) / 4) ** 2 + ((y - 10) / 8) ** 2 - 1) \
+                     < 0.03
+        points = np.column_stack((x[on_ellipse], y[on_ellipse]))
+        concave_hull, edge_points = alpha_shape(points, alpha=0.1)
+        self.assertEqual(concave_hull.geom_type, 'Polygon')
+        self.assertAlmostEqual(concave_hull.area, np.pi * 4 * 8, delta=5)
+        self.assertEqual(edge_points.shape[1:], (2, 2))
+
+    def test_multipoint_and_array_give_same_shape(self):
+        angles = np.linspace(0, 2 * np.pi, 50, endpoint=False)
+        coordinates = [3 * np.cos(angles), np.sin(angles)]
+        from_array, _ = alpha_shape(np.column_stack(coordinates), alpha=0.1)
+        from_multipoint, _ = alpha_shape(
+            convert_ndarray_list_to_multipoint(coordinates), alpha=0.1)
+        self.assertAlmostEqual(
+            from_array.symmetric_difference(from_multipoint).area, 0)
+
+    def test_less_than_four_points(self):
+        concave_hull, edge_points = alpha_shape(
+            np.array([[0, 0], [1, 0], [0, 1]]), alpha=0.1)
+        self.assertAlmostEqual(concave_hull.area, 0.5)
+        self.assertEqual(len(edge_points), 0)
@@ -0,0 +1,25 @@
+from django.test import TestCase
+from contour.management.commands.benchmark import run_benchmark, \
+    find_regressions
+
+
+class BenchmarkTestCase(TestCase):
+
+    def test_run_benchmark(self):
+        run = run_benchmark(n_rows=[2000], n_dimensions=[2])
+        self.assertEqual(len(run['results']), 1)
+        stages = {stage['stage']: stage['seconds']
+                  for stage in run['results'][0]['stages']}
+        for stage in ['validate_csv_upload', 'fit_curves', 'iform', 'hdc',
+                      'plot_fit', 'plot_contour',
+                      'save_environmental_contour']:
+            self.assertGreater(stages[stage], 0)
+        self.assertIn('create_latex_report', stages)
+
+        # Comparing a run with itself finds no regression.
+        self.assertEqual(find_regressions(run, run), [])
+        baseline = {'results': [{'n_rows': 2000, 'n_dimensions': 2,
+                                 'stages': [{'stage': 'fit_curves',
+                                             'seconds': 0}]}]}
+        regressions = find_regressions(run, baseline)
+        self.assertEqual([r['stage'] for r in regressions], ['fit_curves'])
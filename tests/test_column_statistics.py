@@ -0,0 +1,83 @@
+from django.test import TestCase, Client, override_settings
+from django.core.urlresolvers import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+import json
+import os
+import numpy as np
+from contour.models import MeasureFileModel
+from contour.column_statistics import compute_statistics, hdc_defaults, \
+    fit_interval_widths, read_statistics
+
+
+class ColumnStatisticsTestCase(TestCase):
+
+    def test_compute_statistics(self):
+        random_state = np.random.RandomState(0)
+        x = random_state.weibull(1.5, 10000) * 3
+        y = random_state.lognormal(1.5, 0.3, 10000)
+        y[5] = np.nan
+        # Small chunks test merging the chunks' moments.
+        statistics = compute_statistics([x, y], chunk_size=999)
+        self.assertEqual(statistics['n_rows'], 10000)
+        finite_y = y[np.isfinite(y)]
+        for column, values in zip(statistics['columns'], [x, finite_y]):
+            self.assertEqual(column['count'], len(values))
+            self.assertEqual(column['min'], values.min())
+            self.assertEqual(column['max'], values.max())
+            self.assertAlmostEqual(column['mean'], values.mean())
+            self.assertAlmostEqual(column['variance'], values.var(ddof=1))
+            self.assertEqual(sum(column['histogram']), len(values))
+            # The quantiles are exact up to the width of the fine bins.
+            bin_width = (values.max() - values.min()) / 1000
+            np.testing.assert_allclose(
+                column['quantiles'],
+                np.percentile(values, [100 * level for level in
+                                       statistics['quantile_levels']]),
+                atol=bin_width)
+        histogram_2d = statistics['histograms_2d'][0]
+        self.assertEqual(histogram_2d['columns'], [0, 1])
+        self.assertEqual(np.sum(histogram_2d['counts']), len(finite_y))
+
+        limits, deltas = hdc_defaults(statistics)
+        self.assertEqual(limits[0][0], 0)
+        self.assertGreater(limits[0][1], x.max())
+        self.assertGreater(deltas[0], 0)
+        self.assertEqual(len(fit_interval_widths(statistics)), 2)
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_statistics_are_stored_at_upload(self):
+        client = Client()
+        client.post(reverse('user:authentication'),
+                    {'username': 'max_mustermann',
+                     'password': 'Musterpasswort2018'})
+        file_name = '1yeardata_vanem2012pdf_withHeader.csv'
+        path = os.path.join(os.path.dirname(__file__), 'test_files', file_name)
+        with open(path, 'rb') as f:
+            uploaded_file = SimpleUploadedFile(file_name, f.read())
+        response = client.post(reverse('contour:measure_file_model_add'),
+                               {'title': 'statistics',
+                                'measure_file': uploaded_file},
+                               follow=True)
+        self.assertContains(response, '50 % quantile')
+        measure_file_model = MeasureFileModel.objects.get(title='statistics')
+        statistics = json.loads(measure_file_model.statistics)
+        self.assertEqual(statistics['n_rows'], 70128)
+        self.assertEqual(len(statistics['columns']), 2)
+
+        # The fit form suggests the width of intervals.
+        width = fit_interval_widths(statistics)[0]
+        response = client.get(reverse('contour:measure_file_model_fit',
+                                      kwargs={'pk': measure_file_model.pk}))
+        self.assertContains(response, 'value="{}"'.format(width))
+
+        # Files of older versions get their statistics on first access.
+        MeasureFileModel.objects.filter(pk=measure_file_model.pk).update(
+            statistics='')
+        measure_file_model = MeasureFileModel.objects.get(
+            pk=measure_file_model.pk)
+        self.assertEqual(read_statistics(measure_file_model), statistics)
+        with self.assertNumQueries(0):
+            read_statistics(measure_file_model)
+
+        client.get(reverse('contour:measure_file_model_delete',
+                           kwargs={'pk': measure_file_model.pk}))
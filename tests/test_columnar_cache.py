@@ -0,0 +1,64 @@
+from django.test import TestCase, Client, override_settings
+from django.core.urlresolvers import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+import os
+import numpy as np
+from contour.models import MeasureFileModel
+from contour.measurement_data import columnar_cache_directory, \
+    load_columns, read_manifest, write_columnar_cache
+
+
+class ColumnarCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.post(reverse('user:authentication'),
+                         {'username': 'max_mustermann',
+                          'password': 'Musterpasswort2018'})
+
+    def upload(self, title, content):
+        uploaded_file = SimpleUploadedFile(title + '.csv', content)
+        self.client.post(reverse('contour:measure_file_model_add'),
+                         {'title': title, 'measure_file': uploaded_file})
+        return MeasureFileModel.objects.get(title=title)
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_decimal_comma(self):
+        # The validator accepts a comma as decimal separator, also mixed with
+        # points within a file.
+        measure_file_model = self.upload(
+            'decimal comma',
+            b'significant wave height [m];peak period [s]\nHs;Tp\n'
+            b'1,5;7.25\n2.0;8,5\n 3 ; 9, \n')
+        hs, tp = load_columns(measure_file_model)
+        np.testing.assert_allclose(hs, [1.5, 2.0, 3.0])
+        np.testing.assert_allclose(tp, [7.25, 8.5, 9.0])
+        self.assertEqual(measure_file_model.n_rows, 3)
+        self.client.get(reverse('contour:measure_file_model_delete',
+                                kwargs={'pk': measure_file_model.pk}))
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_rebuild_replaces_the_cache(self):
+        file_name = '1yeardata_vanem2012pdf_withHeader.csv'
+        path = os.path.join(os.path.dirname(__file__), 'test_files', file_name)
+        with open(path, 'rb') as f:
+            measure_file_model = self.upload('rebuild', f.read())
+        directory = columnar_cache_directory(measure_file_model)
+        columns = load_columns(measure_file_model)
+        self.assertEqual(len(columns[0]), 70128)
+
+        manifest = write_columnar_cache(measure_file_model)
+        self.assertEqual(manifest, read_manifest(measure_file_model))
+        self.assertEqual(sorted(os.listdir(directory)),
+                         sorted(manifest['columns'] + ['manifest.json']))
+        # No temporary directories are left behind.
+        self.assertEqual(os.listdir(os.path.dirname(directory)).count(
+            os.path.basename(directory)), 1)
+        self.assertFalse([name for name
+                          in os.listdir(os.path.dirname(directory))
+                          if name.startswith('.')])
+        # Arrays, which were memory-mapped before, stay readable.
+        np.testing.assert_array_equal(columns[0],
+                                      load_columns(measure_file_model)[0])
+        self.client.get(reverse('contour:measure_file_model_delete',
+                                kwargs={'pk': measure_file_model.pk}))
@@ -0,0 +1,94 @@
+from django.test import TestCase, Client
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+from datetime import timedelta
+from unittest import mock
+import json
+from user.models import User
+from contour.models import ComputeJob, ProbabilisticModel
+from contour.jobs import claim_next_job, requeue_stale_jobs, run_job
+
+
+class ComputeJobTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='job_owner',
+                                             email='job.owner@example.com',
+                                             password='Jobpasswort2018')
+        self.other_user = User.objects.create_user(
+            username='someone_else', email='someone.else@example.com',
+            password='Jobpasswort2018')
+
+    def test_claim_oldest_queued_job(self):
+        now = timezone.now()
+        newer = ComputeJob.objects.create(primary_user=self.user,
+                                          kind=ComputeJob.FIT,
+                                          created=now)
+        older = ComputeJob.objects.create(primary_user=self.user,
+                                          kind=ComputeJob.FIT,
+                                          created=now - timedelta(minutes=1))
+        job = claim_next_job()
+        self.assertEqual(job.pk, older.pk)
+        self.assertEqual(job.status, ComputeJob.RUNNING)
+        self.assertIsNotNone(job.started)
+        self.assertEqual(claim_next_job().pk, newer.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_requeue_stale_jobs(self):
+        job = ComputeJob.objects.create(primary_user=self.user,
+                                        kind=ComputeJob.FIT)
+        self.assertEqual(claim_next_job().pk, job.pk)
+        self.assertEqual(requeue_stale_jobs(claim_timeout=60), (0, 0))
+
+        # The worker stopped while it executed the job.
+        ComputeJob.objects.filter(pk=job.pk).update(
+            started=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(requeue_stale_jobs(claim_timeout=60), (1, 0))
+        job = claim_next_job()
+        self.assertEqual(job.attempts, 2)
+
+        # A job, which stopped its worker repeatedly, fails.
+        ComputeJob.objects.filter(pk=job.pk).update(
+            started=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(requeue_stale_jobs(claim_timeout=60), (0, 1))
+        job = ComputeJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, ComputeJob.FAILED)
+        self.assertIsNone(claim_next_job())
+
+    def test_failed_plot_deletes_the_model(self):
+        prob_model = ProbabilisticModel.objects.create(
+            primary_user=self.user, collection_name='half-built')
+        job = ComputeJob.objects.create(
+            primary_user=self.user, kind=ComputeJob.FIT,
+            parameters=json.dumps({'var_names': ['Hs'], 'var_symbols': ['Hs'],
+                                   'fit_settings': {'title': 'half-built'}}))
+        with mock.patch('contour.jobs.ComputeInterface.fit_curves'), \
+                mock.patch('contour.jobs.save_fitted_prob_model',
+                           return_value=prob_model), \
+                mock.patch('contour.jobs.plot.plot_fit',
+                           side_effect=ValueError('plot failed')):
+            job = run_job(job, timeout=60)
+        self.assertEqual(job.status, ComputeJob.FAILED)
+        self.assertEqual(job.error_message, 'plot failed')
+        self.assertFalse(ProbabilisticModel.objects.filter(
+            pk=prob_model.pk).exists())
+        self.assertTrue(ComputeJob.objects.filter(pk=job.pk).exists())
+
+    def test_show_queued_job(self):
+        job = ComputeJob.objects.create(primary_user=self.user,
+                                        kind=ComputeJob.IFORM)
+        client = Client()
+        client.login(username='job_owner', password='Jobpasswort2018')
+        response = client.get(reverse('contour:compute_job_show',
+                                      args=[job.pk]))
+        self.assertContains(response, 'waiting for a free worker',
+                            status_code=200)
+
+    def test_show_job_of_other_user(self):
+        job = ComputeJob.objects.create(primary_user=self.user,
+                                        kind=ComputeJob.IFORM)
+        client = Client()
+        client.login(username='someone_else', password='Jobpasswort2018')
+        response = client.get(reverse('contour:compute_job_show',
+                                      args=[job.pk]))
+        self.assertEqual(response.status_code, 404)
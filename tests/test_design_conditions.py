@@ -0,0 +1,37 @@
+import gzip
+import io
+import json
+
+from django.test import TestCase
+import numpy as np
+from contour.design_conditions import iter_design_conditions, read_csv
+
+
+class DesignConditionsTestCase(TestCase):
+
+    def setUp(self):
+        self.contour_coordinates = [[np.array([0.1, 1.5, 2.25]),
+                                     np.array([3.0, 4.125, 1e-05])]]
+
+    def test_csv(self):
+        csv = b''.join(iter_design_conditions(self.contour_coordinates,
+                                              'csv'))
+        self.assertEqual(csv, b'0.1;3.0\n1.5;4.125\n2.25;1e-05\n')
+        contour_coordinates = read_csv(io.BytesIO(csv))
+        np.testing.assert_array_equal(contour_coordinates[0][1],
+                                      self.contour_coordinates[0][1])
+        csv_gz = b''.join(iter_design_conditions(self.contour_coordinates,
+                                                 'csv.gz'))
+        self.assertEqual(gzip.decompress(csv_gz), csv)
+
+    def test_npy_and_json(self):
+        npy = b''.join(iter_design_conditions(self.contour_coordinates,
+                                              'npy'))
+        design_conditions = np.load(io.BytesIO(npy))
+        self.assertEqual(design_conditions.shape, (3, 2))
+        np.testing.assert_array_equal(design_conditions[:, 0],
+                                      self.contour_coordinates[0][0])
+        text = b''.join(iter_design_conditions(self.contour_coordinates,
+                                               'json'))
+        self.assertEqual(json.loads(text.decode('utf-8')),
+                         [[[0.1, 1.5, 2.25], [3.0, 4.125, 1e-05]]])
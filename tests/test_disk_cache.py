@@ -0,0 +1,38 @@
+from django.test import TestCase
+import os
+import shutil
+import tempfile
+from contour.disk_cache import DiskLRUCache
+
+
+class DiskLRUCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_and_set(self):
+        cache = DiskLRUCache(self.directory, max_size=100)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', b'value')
+        self.assertEqual(cache.get('a'), b'value')
+
+    def test_evicts_least_recently_used(self):
+        cache = DiskLRUCache(self.directory, max_size=25)
+        cache.set('a', b'0' * 10)
+        cache.set('b', b'1' * 10)
+        # Make 'b' older than 'a' independent of the file system's time
+        # resolution, then use 'a'.
+        os.utime(os.path.join(self.directory, 'b'), (0, 1))
+        cache.get('a')
+        cache.set('c', b'2' * 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), b'0' * 10)
+        self.assertEqual(cache.get('c'), b'2' * 10)
+
+    def test_value_larger_than_cache_is_not_stored(self):
+        cache = DiskLRUCache(self.directory, max_size=5)
+        cache.set('a', b'0' * 10)
+        self.assertIsNone(cache.get('a'))
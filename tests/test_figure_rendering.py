@@ -0,0 +1,50 @@
+from django.test import TestCase
+import numpy as np
+from contour.figure_rendering import render_figures, render_figure, \
+    density_grid
+from contour.settings import SCATTER_MAX_POINTS
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class FigureRenderingTestCase(TestCase):
+
+    def test_render_figures_in_worker_processes(self):
+        pdf_spec = {'kind': 'pdf_with_raw_data',
+                    'shape': 1.5,
+                    'loc': 0.1,
+                    'scale': 2.0,
+                    'distribution_type': 'Weibull',
+                    'dist_points': np.random.weibull(1.5, 500) * 2,
+                    'interval': [0, 1],
+                    'var_name': 'significant wave height [m]',
+                    'symbol_parent_var': 'V'}
+        overview_spec = {'kind': 'parameter_fit_overview',
+                         'x': np.linspace(0, 5, 100),
+                         'y': np.linspace(0, 5, 100) ** 2,
+                         'param_at': [1, 2, 3],
+                         'param_values': [1, 4, 9],
+                         'x_label': 'wind speed [m/s]',
+                         'y_label': 'α'}
+        pngs = render_figures([pdf_spec, overview_spec])
+        self.assertEqual(len(pngs), 2)
+        for png in pngs:
+            self.assertTrue(png.startswith(PNG_SIGNATURE))
+
+    def test_density_raster(self):
+        x = np.array([0, 1, 1, 2, np.nan])
+        y = np.array([0, 1, 1, 4, 1])
+        counts, extent = density_grid(x, y, n_bins=2, chunk_size=2)
+        self.assertEqual(extent, (0, 2, 0, 4))
+        np.testing.assert_array_equal(counts, [[1, 0], [2, 1]])
+
+        # Large measurement files are drawn as density raster.
+        random_state = np.random.RandomState(0)
+        n = SCATTER_MAX_POINTS + 1
+        png = render_figure({'kind': 'data_set_scatter',
+                             'columns': [random_state.weibull(1.5, n),
+                                         random_state.lognormal(1, 0.3, n)],
+                             'var_names': ['significant wave height [m]',
+                                           'peak period [s]'],
+                             'title': 'measurement file: large'})
+        self.assertTrue(png.startswith(PNG_SIGNATURE))
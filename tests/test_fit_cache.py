@@ -0,0 +1,74 @@
+from django.test import TestCase
+from unittest import mock
+import pickle
+import tempfile
+import uuid
+import warnings
+import numpy as np
+from viroconcom.fitting import Fit
+from contour import fit_cache
+from contour.disk_cache import DiskLRUCache
+from contour.fit_cache import load_fit, save_fit
+
+
+class FitCacheTestCase(TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        hs = 2 * random.weibull(1.5, 20000) + 0.5
+        tp = np.exp(0.3 * random.randn(20000) + 1 + 0.4 * np.log(hs))
+        self.columns = [hs, tp]
+        dists = [{'name': 'Weibull',
+                  'number_of_intervals': None,
+                  'width_of_intervals': 0.5,
+                  'dependency': [None, None, None]},
+                 {'name': 'Lognormal_SigmaMu',
+                  'number_of_intervals': None,
+                  'width_of_intervals': None,
+                  'dependency': [0, None, 0],
+                  'functions': ['exp3', None, 'power3']}]
+        self.fit = Fit(self.columns, dists, timeout=None)
+        self.key = uuid.uuid4().hex
+        # The entries are not written to the real cache.
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch.object(
+            fit_cache, '_cache',
+            DiskLRUCache(self.directory.name, 100 * 1024 * 1024))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_samples_are_not_stored(self):
+        save_fit(self.key, self.fit)
+        entry = fit_cache._cache.get(self.key)
+        self.assertLess(len(entry), len(pickle.dumps(self.columns)) / 10)
+
+        cached_fit = load_fit(self.key, self.columns)
+        self.assertEqual(len(cached_fit.mul_var_dist.distributions), 2)
+        for fit_data, cached_data in zip(
+                self.fit.multiple_fit_inspection_data,
+                cached_fit.multiple_fit_inspection_data):
+            for param_name in ('shape', 'loc', 'scale'):
+                param_at, param_values = \
+                    fit_data.get_dependent_param_points(param_name)
+                self.assertEqual(
+                    cached_data.get_dependent_param_points(param_name),
+                    (param_at, param_values))
+                for j in range(len(param_values)):
+                    basic_fit = fit_data.get_basic_fit(param_name, j)
+                    cached_basic_fit = cached_data.get_basic_fit(param_name,
+                                                                 j)
+                    self.assertEqual(cached_basic_fit.scale, basic_fit.scale)
+                    # viroconcom sorts the samples of an interval.
+                    np.testing.assert_array_equal(
+                        np.sort(cached_basic_fit.samples),
+                        np.sort(basic_fit.samples))
+
+    def test_failed_save_is_ignored(self):
+        with mock.patch.object(fit_cache._cache, 'set',
+                               side_effect=OSError('disk full')):
+            with warnings.catch_warnings(record=True) as warn:
+                warnings.simplefilter('always')
+                save_fit(self.key, self.fit)
+        self.assertIn('disk full', str(warn[0].message))
+        self.assertIsNone(load_fit(self.key, self.columns))
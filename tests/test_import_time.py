@@ -0,0 +1,10 @@
+from django.test import TestCase
+from contour.management.commands.import_time import measure_import_time
+
+
+class ImportTimeTestCase(TestCase):
+
+    def test_views_do_not_import_heavy_modules(self):
+        measurement = measure_import_time('contour.views')
+        self.assertGreater(measurement['seconds'], 0)
+        self.assertEqual(measurement['heavy_modules'], [])
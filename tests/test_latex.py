@@ -0,0 +1,55 @@
+import shutil
+import unittest
+
+from django.test import TestCase
+from user.models import User
+from contour.models import ProbabilisticModel, EnvironmentalContour, \
+    ComputeJob
+from contour.latex import compile_latex
+from contour.jobs import enqueue_report
+
+DOCUMENT = b'\\documentclass{article}\n' \
+           b'\\usepackage{lastpage}\n' \
+           b'\\begin{document}\n' \
+           b'Page 1 of \\pageref{LastPage}\n' \
+           b'\\end{document}\n'
+
+
+class LatexTestCase(TestCase):
+
+    @unittest.skipIf(shutil.which('pdflatex') is None,
+                     'pdflatex is not installed')
+    def test_compile_latex(self):
+        pdf = compile_latex(DOCUMENT)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+        # The second compilation uses the cached preamble.
+        pdf = compile_latex(DOCUMENT)
+        self.assertTrue(pdf.startswith(b'%PDF'))
+
+    def test_report_status(self):
+        user = User.objects.create_user(username='report_user',
+                                        password='Reportpasswort2018')
+        probabilistic_model = ProbabilisticModel.objects.create(
+            primary_user=user, collection_name='report')
+        environmental_contour = EnvironmentalContour.objects.create(
+            primary_user=user, fitting_method='', contour_method='IFORM',
+            return_period=1, state_duration=3,
+            probabilistic_model=probabilistic_model)
+        # Reports are only created when they are requested.
+        self.assertEqual(environmental_contour.report_status(), 'missing')
+        job = ComputeJob.objects.create(
+            primary_user=user, kind=ComputeJob.REPORT,
+            environmental_contour=environmental_contour)
+        self.assertEqual(environmental_contour.report_status(), 'pending')
+
+        # A second request does not enqueue a second job.
+        self.assertEqual(enqueue_report(environmental_contour, user), job)
+        self.assertEqual(environmental_contour.computejob_set.count(), 1)
+
+        job.status = ComputeJob.FAILED
+        job.save()
+        self.assertEqual(environmental_contour.report_status(), 'failed')
+        environmental_contour.latex_report.name = 'report.pdf'
+        self.assertEqual(environmental_contour.report_status(), 'ready')
+        self.assertIsNone(enqueue_report(environmental_contour, user))
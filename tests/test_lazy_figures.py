@@ -0,0 +1,108 @@
+from django.test import TestCase, Client
+from django.core.urlresolvers import reverse
+from unittest import mock
+import numpy as np
+from user.models import User
+from contour.models import ProbabilisticModel, PlottedFigure, \
+    EnvironmentalContour
+from contour.lazy_figures import lazy_plotted_figure, evict_rendered_figures, \
+    figure_owner, ensure_rendered
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class LazyFiguresTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='figure_owner',
+                                             email='figure.owner@example.com',
+                                             password='Figurepasswort2018')
+        self.other_user = User.objects.create_user(
+            username='someone_else', email='someone.else@example.com',
+            password='Figurepasswort2018')
+        self.probabilistic_model = ProbabilisticModel.objects.create(
+            primary_user=self.user, collection_name='lazy figures')
+        spec = {'kind': 'parameter_fit_overview',
+                'file_name': 'fit_1scale.png',
+                'x': np.linspace(0, 5, 100),
+                'y': np.linspace(0, 5, 100) ** 2,
+                'param_at': [1, 2, 3],
+                'param_values': [1, 4, 9],
+                'x_label': 'wind speed [m/s]',
+                'y_label': 'α'}
+        self.plotted_figure = lazy_plotted_figure(
+            spec, probabilistic_model=self.probabilistic_model)
+        self.plotted_figure.save()
+
+    def tearDown(self):
+        for plotted_figure in PlottedFigure.objects.all():
+            plotted_figure.image.delete(save=False)
+
+    def test_render_on_first_access(self):
+        self.assertFalse(self.plotted_figure.image)
+        client = Client()
+        client.login(username='figure_owner', password='Figurepasswort2018')
+        url = reverse('contour:plotted_figure_image',
+                      args=[self.plotted_figure.pk])
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(PNG_SIGNATURE))
+        plotted_figure = PlottedFigure.objects.get(pk=self.plotted_figure.pk)
+        self.assertTrue(plotted_figure.image)
+        self.assertEqual(plotted_figure.image_size, len(response.content))
+
+        # The second request serves the stored image.
+        response = client.get(url)
+        self.assertTrue(response.content.startswith(PNG_SIGNATURE))
+
+        evict_rendered_figures(self.user, max_size=0)
+        plotted_figure = PlottedFigure.objects.get(pk=self.plotted_figure.pk)
+        self.assertFalse(plotted_figure.image)
+        self.assertIsNone(plotted_figure.image_size)
+
+    def test_image_of_other_user(self):
+        client = Client()
+        client.login(username='someone_else', password='Figurepasswort2018')
+        response = client.get(reverse('contour:plotted_figure_image',
+                                      args=[self.plotted_figure.pk]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_contour_figure_belongs_to_contour_owner(self):
+        # The other user computes a contour on the shared model.
+        environmental_contour = EnvironmentalContour.objects.create(
+            primary_user=self.other_user,
+            fitting_method='',
+            contour_method='IFORM',
+            return_period=1,
+            state_duration=3,
+            probabilistic_model=self.probabilistic_model)
+        spec = {'kind': 'parameter_fit_overview',
+                'file_name': 'contour.png',
+                'x': np.linspace(0, 5, 100),
+                'y': np.linspace(0, 5, 100),
+                'param_at': [1, 2, 3],
+                'param_values': [1, 2, 3],
+                'x_label': 'x',
+                'y_label': 'y'}
+        plotted_figure = lazy_plotted_figure(
+            spec, environmental_contour=environmental_contour)
+        plotted_figure.save()
+        self.assertEqual(figure_owner(plotted_figure), self.other_user)
+
+        # It does not count against the quota of the model's owner.
+        PlottedFigure.objects.filter(pk=plotted_figure.pk).update(
+            image_size=10)
+        evict_rendered_figures(self.user, max_size=0)
+        self.assertEqual(
+            PlottedFigure.objects.get(pk=plotted_figure.pk).image_size, 10)
+
+    def test_render_without_eviction(self):
+        # Reports render all their images first and evict afterwards.
+        with mock.patch('contour.lazy_figures.evict_rendered_figures') \
+                as evict:
+            self.assertTrue(ensure_rendered(self.plotted_figure, evict=False))
+            evict.assert_not_called()
+            self.plotted_figure.image.delete(save=False)
+            ensure_rendered(self.plotted_figure)
+            evict.assert_called_once_with(self.user,
+                                          keep=self.plotted_figure.pk)
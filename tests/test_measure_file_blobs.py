@@ -0,0 +1,75 @@
+from django.test import TestCase, Client, override_settings
+from django.core.urlresolvers import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+import os
+from unittest import mock
+from contour.models import MeasureFileModel, MeasureFileBlob
+from contour.measurement_data import columnar_cache_directory
+
+
+class MeasureFileBlobTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.post(reverse('user:authentication'),
+                         {'username': 'max_mustermann',
+                          'password': 'Musterpasswort2018'})
+
+    def upload(self, title):
+        file_name = '1yeardata_vanem2012pdf_withHeader.csv'
+        path = os.path.join(os.path.dirname(__file__), 'test_files', file_name)
+        with open(path, 'rb') as f:
+            uploaded_file = SimpleUploadedFile(file_name, f.read())
+        self.client.post(reverse('contour:measure_file_model_add'),
+                         {'title': title, 'measure_file': uploaded_file})
+        return MeasureFileModel.objects.get(title=title)
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_identical_uploads_share_the_content(self):
+        first = self.upload('first upload')
+        second = self.upload('second upload')
+        self.assertEqual(MeasureFileBlob.objects.count(), 1)
+        blob = MeasureFileBlob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(first.blob_id, blob.pk)
+        self.assertEqual(second.blob_id, blob.pk)
+        self.assertEqual(first.measure_file.name, second.measure_file.name)
+        self.assertEqual(columnar_cache_directory(first),
+                         columnar_cache_directory(second))
+        # The derived data is copied instead of computed again.
+        self.assertEqual(second.statistics, first.statistics)
+        self.assertEqual(second.n_rows, 70128)
+
+        # The content is deleted together with its last measurement file.
+        file_path = blob.file.path
+        self.client.get(reverse('contour:measure_file_model_delete',
+                                kwargs={'pk': first.pk}))
+        self.assertEqual(MeasureFileBlob.objects.get().refcount, 1)
+        self.assertTrue(os.path.isfile(file_path))
+        self.client.get(reverse('contour:measure_file_model_delete',
+                                kwargs={'pk': second.pk}))
+        self.assertFalse(MeasureFileBlob.objects.exists())
+        self.assertFalse(os.path.isfile(file_path))
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_failed_upload_releases_the_content(self):
+        first = self.upload('first upload')
+        with mock.patch('contour.views.copy_derived_data',
+                        side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.upload('failed upload')
+        self.assertFalse(MeasureFileModel.objects.filter(
+            title='failed upload').exists())
+        self.assertEqual(MeasureFileBlob.objects.get().refcount, 1)
+
+        # Without other measurement file, the content is deleted.
+        file_path = first.blob.file.path
+        self.client.get(reverse('contour:measure_file_model_delete',
+                                kwargs={'pk': first.pk}))
+        with mock.patch('contour.views.write_columnar_cache',
+                        side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.upload('failed upload')
+        self.assertFalse(MeasureFileModel.objects.exists())
+        self.assertFalse(MeasureFileBlob.objects.exists())
+        self.assertFalse(os.path.isfile(file_path))
@@ -0,0 +1,89 @@
+from django.test import TestCase, Client, override_settings
+from django.core.urlresolvers import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+import json
+import os
+import shutil
+from contour.models import MeasureFileModel
+from contour.measurement_data import parse_header, read_metadata, \
+    columnar_cache_directory
+
+
+class MeasurementMetadataTestCase(TestCase):
+
+    def test_parse_header(self):
+        # The head can end within a row of the body.
+        head = b'significant wave height [m];peak period [s]\nHs;Tp\n3.59;7.7'
+        self.assertEqual(parse_header(head),
+                         (['significant wave height [m]', 'peak period [s]'],
+                          ['Hs', 'Tp']))
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_metadata_is_stored_at_upload(self):
+        client = Client()
+        client.post(reverse('user:authentication'),
+                    {'username': 'max_mustermann',
+                     'password': 'Musterpasswort2018'})
+        file_name = '1yeardata_vanem2012pdf_withHeader.csv'
+        path = os.path.join(os.path.dirname(__file__), 'test_files', file_name)
+        with open(path, 'rb') as f:
+            uploaded_file = SimpleUploadedFile(file_name, f.read())
+        client.post(reverse('contour:measure_file_model_add'),
+                    {'title': 'metadata', 'measure_file': uploaded_file})
+        measure_file_model = MeasureFileModel.objects.get(title='metadata')
+        self.assertEqual(json.loads(measure_file_model.var_symbols),
+                         ['Hs', 'Tp'])
+        self.assertEqual(measure_file_model.n_rows, 70128)
+        self.assertEqual(measure_file_model.n_columns, 2)
+        self.assertEqual(json.loads(measure_file_model.column_dtypes),
+                         ['float64', 'float64'])
+
+        # Files of older versions get their metadata from the columnar cache.
+        MeasureFileModel.objects.filter(pk=measure_file_model.pk).update(
+            var_names='', var_symbols='', n_rows=None, n_columns=None,
+            column_dtypes='')
+        measure_file_model = MeasureFileModel.objects.get(
+            pk=measure_file_model.pk)
+        read_metadata(measure_file_model)
+        measure_file_model = MeasureFileModel.objects.get(
+            pk=measure_file_model.pk)
+        self.assertEqual(measure_file_model.n_rows, 70128)
+        self.assertEqual(json.loads(measure_file_model.column_dtypes),
+                         ['float64', 'float64'])
+        with self.assertNumQueries(0):
+            read_metadata(measure_file_model)
+
+        # Without columnar cache, the header is read from the file's
+        # beginning.
+        shutil.rmtree(columnar_cache_directory(measure_file_model))
+        MeasureFileModel.objects.filter(pk=measure_file_model.pk).update(
+            var_names='', var_symbols='', n_rows=None, n_columns=None,
+            column_dtypes='')
+        measure_file_model = MeasureFileModel.objects.get(
+            pk=measure_file_model.pk)
+        var_names, var_symbols = read_metadata(measure_file_model)
+        self.assertEqual(var_names,
+                         ['significant wave height [m]', 'peak period [s]'])
+        with self.assertNumQueries(0):
+            self.assertEqual(read_metadata(measure_file_model)[1],
+                             ['Hs', 'Tp'])
+
+        client.get(reverse('contour:measure_file_model_delete',
+                           kwargs={'pk': measure_file_model.pk}))
+
+    @override_settings(STATICFILES_STORAGE=None)
+    def test_column_dtypes(self):
+        client = Client()
+        client.post(reverse('user:authentication'),
+                    {'username': 'max_mustermann',
+                     'password': 'Musterpasswort2018'})
+        uploaded_file = SimpleUploadedFile(
+            'dtypes.csv', b'year;significant wave height [m]\nY;Hs\n'
+                          b'2017;1\n2018;2,5\n')
+        client.post(reverse('contour:measure_file_model_add'),
+                    {'title': 'dtypes', 'measure_file': uploaded_file})
+        measure_file_model = MeasureFileModel.objects.get(title='dtypes')
+        self.assertEqual(json.loads(measure_file_model.column_dtypes),
+                         ['int64', 'float64'])
+        client.get(reverse('contour:measure_file_model_delete',
+                           kwargs={'pk': measure_file_model.pk}))
@@ -0,0 +1,52 @@
+from django.test import TestCase
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+import hashlib
+import os
+import shutil
+import tempfile
+from contour.media import read_media, open_media, local_media_path, \
+    RemoteFileSystemStorage
+
+
+class MediaTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = RemoteFileSystemStorage(self.directory)
+        self.content = b'significant wave height [m];zero-up-crossing ' \
+                       b'period [s]\nHs;Tz\n1.2;5.3\n'
+        self.name = self.storage.save('measurement.csv',
+                                      ContentFile(self.content))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_remote_file_is_downloaded_once(self):
+        self.assertEqual(read_media(self.name, self.storage), self.content)
+        # The cached copy is used, the storage is not read again.
+        os.remove(os.path.join(self.directory, self.name))
+        self.assertEqual(read_media(self.name, self.storage), self.content)
+        with open_media(self.name, self.storage) as f:
+            self.assertEqual(f.read(), self.content)
+        path = local_media_path(self.name,
+                                os.path.join(self.directory, 'copy.csv'),
+                                self.storage)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_expected_sha256(self):
+        sha256 = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(read_media(self.name, self.storage, sha256),
+                         self.content)
+        with self.assertRaises(IOError):
+            read_media(self.name, self.storage, sha256='0' * 64)
+
+    def test_local_file_is_not_copied(self):
+        storage = FileSystemStorage(self.directory)
+        path = local_media_path(self.name,
+                                os.path.join(self.directory, 'copy.csv'),
+                                storage)
+        self.assertEqual(path, storage.path(self.name))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.directory, 'copy.csv')))
@@ -0,0 +1,40 @@
+from django.test import TestCase, Client
+from django.core.urlresolvers import reverse
+from contour.metrics import increment, observe, render_metrics
+
+
+class MetricsTestCase(TestCase):
+
+    def test_render_metrics(self):
+        increment('viroconweb_figures_rendered_total')
+        increment('viroconweb_figures_rendered_total', 2)
+        observe('viroconweb_contour_duration_seconds', 0.3, method='IFORM',
+                dimensions=2)
+        observe('viroconweb_contour_duration_seconds', 400, method='IFORM',
+                dimensions=2)
+        lines = render_metrics().splitlines()
+        self.assertIn('# TYPE viroconweb_figures_rendered_total counter',
+                      lines)
+        self.assertIn('viroconweb_figures_rendered_total 3.0', lines)
+        labels = 'dimensions="2",method="IFORM"'
+        # The buckets are cumulative.
+        self.assertIn('viroconweb_contour_duration_seconds_bucket{' + labels +
+                      ',le="0.1"} 0.0', lines)
+        self.assertIn('viroconweb_contour_duration_seconds_bucket{' + labels +
+                      ',le="0.5"} 1.0', lines)
+        self.assertIn('viroconweb_contour_duration_seconds_bucket{' + labels +
+                      ',le="+Inf"} 2.0', lines)
+        self.assertIn('viroconweb_contour_duration_seconds_sum{' + labels +
+                      '} 400.3', lines)
+        self.assertIn('viroconweb_contour_duration_seconds_count{' + labels +
+                      '} 2.0', lines)
+
+    def test_metrics_view(self):
+        client = Client()
+        client.get(reverse('contour:index'))
+        response = client.get(reverse('contour:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('viroconweb_requests_total{status="200",'
+                      'view="contour:index"} 1.0',
+                      response.content.decode('utf-8'))
@@ -0,0 +1,67 @@
+from django.test import TestCase
+from contour.compute_interface import setup_mul_dist, \
+    clear_mul_dist_cache, load_model_spec
+from contour.models import User, ProbabilisticModel, DistributionModel, \
+    ParameterModel
+from contour.persistence import save_probabilistic_model
+
+
+class MultivariateDistributionCacheTestCase(TestCase):
+
+    def setUp(self):
+        clear_mul_dist_cache()
+        user = User.objects.get(username='max_mustermann')
+        probabilistic_model = ProbabilisticModel(primary_user=user,
+                                                 collection_name='Sea state')
+        distributions = [DistributionModel(name='significant wave height',
+                                           symbol='Hs',
+                                           distribution='Weibull'),
+                         DistributionModel(name='peak period', symbol='Tp',
+                                           distribution='Lognormal_SigmaMu')]
+        parameters = [
+            [ParameterModel(function='None', x0=1.5, name='shape'),
+             ParameterModel(function='None', x0=0.9, name='location'),
+             ParameterModel(function='None', x0=2.8, name='scale')],
+            [ParameterModel(function='exp3', x0=0.04, x1=0.17, x2=-0.22,
+                            dependency='0', name='shape'),
+             ParameterModel(function='None', x0=0, name='location'),
+             ParameterModel(function='power3', x0=0.1, x1=1.49, x2=0.19,
+                            dependency='0', name='scale')]]
+        self.probabilistic_model, _, self.parameters = \
+            save_probabilistic_model(probabilistic_model, distributions,
+                                     parameters)
+
+    def test_cached_until_changed(self):
+        # The model is built from its stored specification.
+        with self.assertNumQueries(0):
+            multivariate_distribution = setup_mul_dist(
+                self.probabilistic_model)
+            self.assertIs(setup_mul_dist(self.probabilistic_model),
+                          multivariate_distribution)
+        self.assertEqual(multivariate_distribution.dependencies[1],
+                         [0, None, 0])
+
+        scale = self.parameters[0][2]
+        scale.x0 = 3.1
+        scale.save()
+        probabilistic_model = ProbabilisticModel.objects.get(
+            pk=self.probabilistic_model.pk)
+        self.assertEqual(probabilistic_model.spec, '')
+        changed = setup_mul_dist(probabilistic_model)
+        self.assertIsNot(changed, multivariate_distribution)
+        self.assertAlmostEqual(changed.distributions[0].scale(0), 3.1)
+
+    def test_spec_from_rows(self):
+        spec = self.probabilistic_model.spec
+        spec_hash = self.probabilistic_model.spec_hash
+        ProbabilisticModel.objects.filter(
+            pk=self.probabilistic_model.pk).update(spec='', spec_hash='')
+        probabilistic_model = ProbabilisticModel.objects.get(
+            pk=self.probabilistic_model.pk)
+        # Distributions and parameters are loaded with one query each, then
+        # the specification is stored.
+        with self.assertNumQueries(3):
+            self.assertEqual(load_model_spec(probabilistic_model),
+                             (spec, spec_hash))
+        self.assertEqual(ProbabilisticModel.objects.get(
+            pk=self.probabilistic_model.pk).spec_hash, spec_hash)
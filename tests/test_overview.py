@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.core.urlresolvers import reverse
+from contour import settings
+from contour.models import User, MeasureFileModel
+
+
+class OverviewTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.client.post(reverse('user:authentication'),
+                         {'username': 'max_mustermann',
+                          'password': 'Musterpasswort2018'})
+        self.user = User.objects.get(username='max_mustermann')
+        self.other_user = User.objects.create_user('erika_musterfrau',
+                                                   password='Passwort2018')
+
+    def add_measure_files(self, n):
+        for i in range(n):
+            # Files of the user, files shared with the user and files of
+            # another user.
+            MeasureFileModel.objects.create(primary_user=self.user,
+                                            title='own ' + str(i))
+            shared = MeasureFileModel.objects.create(
+                primary_user=self.other_user, title='shared ' + str(i))
+            shared.secondary_user.add(self.user, self.other_user)
+            MeasureFileModel.objects.create(primary_user=self.other_user,
+                                            title='other ' + str(i))
+
+    def test_constant_number_of_queries(self):
+        url = reverse('contour:measure_file_model_overview')
+        self.add_measure_files(1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.add_measure_files(20)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['context']), 42)
+        self.assertNotContains(response, 'other 0')
+
+    def test_keyset_pagination(self):
+        url = reverse('contour:measure_file_model_overview')
+        self.add_measure_files(3)
+        with mock.patch.object(settings, 'OVERVIEW_PAGE_SIZE', 4):
+            response = self.client.get(url)
+            first_page = response.context['context']
+            self.assertEqual(len(first_page), 4)
+            response = self.client.get(
+                url, {'before': response.context['next_before']})
+            second_page = response.context['context']
+        self.assertEqual(len(second_page), 2)
+        self.assertIsNone(response.context['next_before'])
+        pks = [object.pk for object in first_page + second_page]
+        self.assertEqual(pks, sorted(pks, reverse=True))
+        self.assertEqual(len(set(pks)), 6)
+
+    def test_select_constant_number_of_queries(self):
+        url = reverse('contour:measure_file_model_select')
+        self.add_measure_files(1)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.add_measure_files(20)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['context']), 42)
+        self.assertContains(response, 'shared 19')
+        self.assertNotContains(response, 'other 0')
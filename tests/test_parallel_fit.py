@@ -0,0 +1,89 @@
+from django.test import TestCase
+import os
+import numpy as np
+import pandas as pd
+from multiprocessing import TimeoutError
+from viroconcom.fitting import Fit
+from contour import parallel_fit
+from contour.parallel_fit import ParallelFit
+
+
+class ParallelFitTestCase(TestCase):
+
+    def setUp(self):
+        file_path = os.path.join(os.path.dirname(__file__), 'test_files',
+                                 '1yeardata_vanem2012pdf_withHeader.csv')
+        data = pd.read_csv(file_path, sep=';', header=1).values
+        self.samples = [data[:, 0], data[:, 1]]
+
+    def dist_descriptions(self):
+        return [{'name': 'Weibull',
+                 'number_of_intervals': None,
+                 'width_of_intervals': 0.5,
+                 'dependency': [None, None, None]},
+                {'name': 'Lognormal_SigmaMu',
+                 'number_of_intervals': None,
+                 'width_of_intervals': None,
+                 'dependency': [0, None, 0],
+                 'functions': ['exp3', None, 'power3']}]
+
+    def test_same_result_as_fit(self):
+        fit = Fit(self.samples, self.dist_descriptions())
+        parallel_fit = ParallelFit(self.samples, self.dist_descriptions(),
+                                   timeout=60, n_workers=2)
+        self.assertEqual(parallel_fit.mul_var_dist.dependencies,
+                         fit.mul_var_dist.dependencies)
+        # Constant and dependent parameters are compared at the same points.
+        x = np.linspace(0.5, 10, 20)
+        for dimension, (dist, parallel_dist) in enumerate(zip(
+                fit.mul_var_dist.distributions,
+                parallel_fit.mul_var_dist.distributions)):
+            self.assertEqual(parallel_dist.name, dist.name)
+            for param_name in ('shape', 'loc', 'scale'):
+                param = getattr(dist, param_name)
+                parallel_param = getattr(parallel_dist, param_name)
+                if param is None:
+                    self.assertIsNone(parallel_param)
+                    continue
+                np.testing.assert_allclose(
+                    [parallel_param(value) for value in x],
+                    [param(value) for value in x], rtol=1e-5,
+                    err_msg='{} of dimension {}'.format(param_name,
+                                                        dimension))
+
+            inspection_data = fit.multiple_fit_inspection_data[dimension]
+            parallel_inspection_data = \
+                parallel_fit.multiple_fit_inspection_data[dimension]
+            for param_name in ('shape', 'loc', 'scale'):
+                param_at, param_values = \
+                    inspection_data.get_dependent_param_points(param_name)
+                parallel_param_at, parallel_param_values = \
+                    parallel_inspection_data.get_dependent_param_points(
+                        param_name)
+                if param_at is None:
+                    self.assertIsNone(parallel_param_at)
+                else:
+                    np.testing.assert_allclose(parallel_param_at, param_at)
+                np.testing.assert_allclose(parallel_param_values,
+                                           param_values, rtol=1e-5)
+                for j in range(len(param_values)):
+                    self.assertEqual(
+                        len(parallel_inspection_data.get_basic_fit(
+                            param_name, j).samples),
+                        len(inspection_data.get_basic_fit(
+                            param_name, j).samples))
+        for description, parallel_description in zip(
+                fit.dist_descriptions, parallel_fit.dist_descriptions):
+            self.assertEqual(
+                parallel_description.get('used_number_of_intervals'),
+                description.get('used_number_of_intervals'))
+
+    def test_timeout_terminates_the_workers(self):
+        with self.assertRaises(TimeoutError):
+            ParallelFit(self.samples, self.dist_descriptions(), timeout=0,
+                        n_workers=2)
+        self.assertIsNone(parallel_fit._pool)
+        # The next fit creates a new pool.
+        ParallelFit(self.samples, self.dist_descriptions(), timeout=60,
+                    n_workers=2)
+        self.assertIsNotNone(parallel_fit._pool)
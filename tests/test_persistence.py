@@ -0,0 +1,76 @@
+from django.test import TestCase
+from django.core.exceptions import ValidationError
+import numpy as np
+from contour.models import ContourPath, User, ProbabilisticModel, \
+    DistributionModel, ParameterModel
+from contour.persistence import encode_contour_path, decode_contour_path, \
+    save_probabilistic_model
+
+
+class ContourPathEncodingTestCase(TestCase):
+
+    def test_round_trip(self):
+        contour_path_coordinates = [np.linspace(0, 10, 7),
+                                    np.linspace(3, 5, 7),
+                                    np.arange(7)]
+        coordinates, shape, dtype = encode_contour_path(
+            contour_path_coordinates)
+        self.assertEqual(shape, (3, 7))
+        self.assertEqual(dtype, '<f8')
+        self.assertEqual(len(coordinates), 3 * 7 * 8)
+        contour_path = ContourPath(coordinates=coordinates,
+                                   n_dimensions=shape[0],
+                                   n_points=shape[1],
+                                   dtype=dtype)
+        decoded = decode_contour_path(contour_path)
+        self.assertEqual(len(decoded), 3)
+        for original, loaded in zip(contour_path_coordinates, decoded):
+            np.testing.assert_array_equal(original, loaded)
+
+
+class SaveProbabilisticModelTestCase(TestCase):
+
+    def model_graph(self, user, weibull_scale):
+        probabilistic_model = ProbabilisticModel(primary_user=user,
+                                                 collection_name='Sea state')
+        distributions = [DistributionModel(name='significant wave height',
+                                           symbol='Hs',
+                                           distribution='Weibull'),
+                         DistributionModel(name='peak period', symbol='Tp',
+                                           distribution='Lognormal_SigmaMu')]
+        parameters = [
+            [ParameterModel(function='None', x0=1.5, name='shape'),
+             ParameterModel(function='None', x0=0.9, name='location'),
+             ParameterModel(function='None', x0=weibull_scale, name='scale')],
+            [ParameterModel(function='exp3', x0=0.04, x1=0.17, x2=-0.22,
+                            dependency='0', name='shape'),
+             ParameterModel(function='None', x0=0, name='location'),
+             ParameterModel(function='power3', x0=0.1, x1=1.49, x2=0.19,
+                            dependency='0', name='scale')]]
+        return probabilistic_model, distributions, parameters
+
+    def test_save_graph(self):
+        # The user is looked up before, thus only the saving is counted.
+        model_graph = self.model_graph(
+            User.objects.get(username='max_mustermann'), 2.8)
+        with self.assertNumQueries(7):
+            probabilistic_model, distributions, parameters = \
+                save_probabilistic_model(*model_graph)
+        self.assertEqual([distribution.pk for distribution in distributions],
+                         list(DistributionModel.objects.filter(
+                             probabilistic_model=probabilistic_model).order_by(
+                             'pk').values_list('pk', flat=True)))
+        saved_scale = ParameterModel.objects.get(pk=parameters[1][2].pk)
+        self.assertEqual(saved_scale.function, 'power3')
+        self.assertEqual(saved_scale.distribution_id, distributions[1].pk)
+
+    def test_invalid_model_writes_nothing(self):
+        n_distributions = DistributionModel.objects.count()
+        n_parameters = ParameterModel.objects.count()
+        with self.assertRaises(ValidationError):
+            save_probabilistic_model(*self.model_graph(
+                User.objects.get(username='max_mustermann'), -1))
+        self.assertFalse(ProbabilisticModel.objects.filter(
+            collection_name='Sea state').exists())
+        self.assertEqual(DistributionModel.objects.count(), n_distributions)
+        self.assertEqual(ParameterModel.objects.count(), n_parameters)
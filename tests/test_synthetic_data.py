@@ -0,0 +1,64 @@
+import io
+
+from django.test import TestCase, Client
+from django.core.files.base import ContentFile
+from django.core.urlresolvers import reverse
+from contour.models import ProbabilisticModel
+from contour.synthetic_data import write_measurement_file
+from contour.validators import validate_csv_upload
+
+
+class SyntheticDataTestCase(TestCase):
+
+    def setUp(self):
+        client = Client()
+        client.post(reverse('user:authentication'),
+                    {'username': 'max_mustermann',
+                     'password': 'Musterpasswort2018'})
+        form_input_dict = {
+            'variable_name_0': 'significant wave height [m]',
+            'variable_symbol_0': 'Hs',
+            'distribution_0': 'Weibull',
+            'scale_0_0': '2.776',
+            'shape_0_0': '1.471',
+            'location_0_0': '0.888',
+            'variable_name_1': 'peak period [s]',
+            'variable_symbol_1': 'Tp',
+            'distribution_1': 'Lognormal_SigmaMu',
+            'scale_dependency_1': '0power3',
+            'scale_1_0': '0.1',
+            'scale_1_1': '1.489',
+            'scale_1_2': '0.1901',
+            'shape_dependency_1': '0exp3',
+            'shape_1_0': '0.04',
+            'shape_1_1': '0.1748',
+            'shape_1_2': '-0.2243',
+            'location_dependency_1': '!None',
+            'location_1_0': '0',
+            'location_1_1': '0',
+            'location_1_2': '0',
+            'collection_name': 'direct input Vanem2012'
+        }
+        client.post(reverse('contour:probabilistic_model_add', args=['02']),
+                    form_input_dict, follow=True)
+        self.probabilistic_model = ProbabilisticModel.objects.get(
+            collection_name='direct input Vanem2012')
+
+    def write(self, batch_size):
+        f = io.StringIO()
+        write_measurement_file(f, self.probabilistic_model, 1000, seed=1,
+                               batch_size=batch_size)
+        return f.getvalue()
+
+    def test_write_measurement_file(self):
+        text = self.write(batch_size=1000)
+        lines = text.splitlines()
+        self.assertEqual(lines[0], 'significant wave height [m];'
+                                   'peak period [s]')
+        self.assertEqual(lines[1], 'Hs;Tp')
+        self.assertEqual(len(lines), 1002)
+        validate_csv_upload(ContentFile(text.encode('utf-8'),
+                                        name='synthetic.csv'))
+
+        # The samples only depend on the seed.
+        self.assertEqual(self.write(batch_size=300), text)
@@ -0,0 +1,43 @@
+from django.test import TestCase, Client
+from django.core.urlresolvers import reverse
+from contour.models import StageTiming
+from contour.timing import stage, timed_stage, collect_timings, \
+    server_timing_header, report_timings, stage_statistics
+
+
+@timed_stage('double')
+def double(x):
+    return 2 * x
+
+
+class TimingTestCase(TestCase):
+
+    def test_collect_timings(self):
+        # Outside of a collection, stages are not recorded.
+        self.assertEqual(double(1), 2)
+        with collect_timings() as timings:
+            double(1)
+            with stage('outer'):
+                double(2)
+            with collect_timings() as nested_timings:
+                double(3)
+        self.assertIsNone(nested_timings)
+        self.assertEqual([name for name, seconds in timings],
+                         ['double', 'double', 'outer', 'double'])
+        header = server_timing_header(timings, 0.5)
+        self.assertIn('double;dur=', header)
+        self.assertTrue(header.endswith('total;dur=500.0'))
+
+    def test_stage_statistics(self):
+        for seconds in range(1, 101):
+            report_timings('/contours/1/', [('pdflatex', seconds / 100)],
+                           seconds / 100)
+        self.assertEqual(StageTiming.objects.count(), 100)
+        statistics = stage_statistics(percentiles=[50, 90])
+        self.assertEqual(statistics[0]['stage'], 'pdflatex')
+        self.assertEqual(statistics[0]['count'], 100)
+        self.assertAlmostEqual(statistics[0]['percentiles'][1], 0.901)
+
+    def test_server_timing_header(self):
+        response = Client().get(reverse('contour:index'))
+        self.assertIn('total;dur=', response['Server-Timing'])
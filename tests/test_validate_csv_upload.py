@@ -0,0 +1,57 @@
+from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+import os
+import time
+from contour.validators import validate_csv_upload
+from contour.settings import MAX_LENGTH_CSV_LINE
+
+
+class ValidateCsvUploadTestCase(TestCase):
+
+    def setUp(self):
+        self.test_files_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), r'test_files/'))
+
+    def test_valid_file(self):
+        file_name = '1yeardata_vanem2012pdf_withHeader.csv'
+        with open(os.path.join(self.test_files_path, file_name), 'rb') as f:
+            upload = SimpleUploadedFile(file_name, f.read())
+        # Raises a ValidationError if the file is not valid.
+        validate_csv_upload(upload)
+
+    def test_reports_first_bad_line(self):
+        content = b'significant wave height [m];peak period [s]\n' \
+                  b'Hs;Tp\n' \
+                  b'0.5;3.1\n' \
+                  b'0.7;abc\n' \
+                  b'0.9;x\n'
+        upload = SimpleUploadedFile('bad_line.csv', content)
+        with self.assertRaises(ValidationError) as context:
+            validate_csv_upload(upload)
+        self.assertIn('line 4', context.exception.messages[0])
+
+    def test_empty_body(self):
+        content = b'significant wave height [m];peak period [s]\nHs;Tp\n'
+        upload = SimpleUploadedFile('empty_body.csv', content)
+        with self.assertRaises(ValidationError) as context:
+            validate_csv_upload(upload)
+        self.assertIn('Empty body', context.exception.messages[0])
+
+    def test_long_digit_lines_are_rejected_quickly(self):
+        header = b'significant wave height [m];peak period [s]\nHs;Tp\n'
+        # A line within a chunk is as well checked for its length.
+        upload = SimpleUploadedFile('long_line.csv',
+                                    header + b'1' * 8000 + b'\n0.5;3.1\n')
+        with self.assertRaises(ValidationError) as context:
+            validate_csv_upload(upload)
+        self.assertIn('too long', context.exception.messages[0])
+
+        # A shorter line, which does not match, must not cause backtracking.
+        content = header + b'1' * (MAX_LENGTH_CSV_LINE - 1) + b'\n'
+        start = time.time()
+        for i in range(20):
+            with self.assertRaises(ValidationError) as context:
+                validate_csv_upload(SimpleUploadedFile('digits.csv', content))
+        self.assertIn('line 3', context.exception.messages[0])
+        self.assertLess(time.time() - start, 1)
@@ -293,8 +293,10 @@ def user_storage_space(user):
         environmental_contours = EnvironmentalContour.objects.filter(
             primary_user=user)
         for environmental_contour in environmental_contours:
-            total_size = total_size + \
-                            environmental_contour.latex_report.file.size
+            # The report is missing while it is created.
+            if environmental_contour.latex_report:
+                total_size = total_size + \
+                                environmental_contour.latex_report.file.size
     else:
         start_path = PATH_MEDIA + PATH_USER_GENERATED + str(user)
         for dirpath, dirnames, filenames in os.walk(start_path):
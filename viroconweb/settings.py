@@ -130,6 +130,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Times the stages of a request, see contour/timing.py.
+    'contour.timing.StageTimingMiddleware',
+    # Counts requests and data base queries per view, see contour/metrics.py.
+    'contour.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -142,6 +146,24 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'viroconweb.urls'
 
+# The timings of requests and jobs are written as JSON lines to the console.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'contour.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',